@@ -43,10 +43,20 @@ class AccessLink(object):
     def get_exercises(self, access_token):
         return self.oauth.get(endpoint="/exercises", access_token=access_token)
 
-    def get_sleep(self, access_token):
+    def get_sleep(self, access_token, typed=False):
+        """With `typed`, the "nights" are `accesslink.models.SleepNight` records"""
+        if typed:
+            from .models import SleepNight
+            return self.oauth.get(endpoint="/users/sleep/", access_token=access_token,
+                                  model=SleepNight, key="nights")
         return self.oauth.get(endpoint="/users/sleep/", access_token=access_token)
     
-    def get_recharge(self, access_token):
+    def get_recharge(self, access_token, typed=False):
+        """With `typed`, the "recharges" are `accesslink.models.NightlyRecharge` records"""
+        if typed:
+            from .models import NightlyRecharge
+            return self.oauth.get(endpoint="/users/nightly-recharge/", access_token=access_token,
+                                  model=NightlyRecharge, key="recharges")
         return self.oauth.get(endpoint="/users/nightly-recharge/", access_token=access_token)
 
     def get_userdata(self, user_id,access_token):
@@ -10,13 +10,16 @@ class DailyActivityTransaction(Transaction):
         return self._get(endpoint=None, url=self.transaction_url,
                          access_token=self.access_token)
 
-    def get_activity_summary(self, url):
+    def get_activity_summary(self, url, typed=False):
         """Get user's activity summary from the transaction
 
         :param url: url of the activity entity
+        :param typed: return an `accesslink.models.ActivitySummary` instead of a dict
         """
+        from ..models import ActivitySummary
         return self._get(endpoint=None, url=url,
-                         access_token=self.access_token)
+                         access_token=self.access_token,
+                         model=ActivitySummary if typed else None)
 
     def get_step_samples(self, url):
         """Get activity step samples
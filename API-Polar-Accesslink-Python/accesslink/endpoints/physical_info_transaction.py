@@ -10,10 +10,13 @@ class PhysicalInfoTransaction(Transaction):
         return self._get(endpoint=None, url=self.transaction_url,
                          access_token=self.access_token)
 
-    def get_physical_info(self, url):
+    def get_physical_info(self, url, typed=False):
         """Get user's physical information from the transaction
 
         :param url: url of the physical info entity
+        :param typed: return an `accesslink.models.PhysicalInfo` instead of a dict
         """
+        from ..models import PhysicalInfo
         return self._get(endpoint=None, url=url,
-                         access_token=self.access_token)
\ No newline at end of file
+                         access_token=self.access_token,
+                         model=PhysicalInfo if typed else None)
\ No newline at end of file
@@ -9,6 +9,9 @@ class Resource(object):
     def _get(self, *args, **kwargs):
         return self.oauth.get(*args, **kwargs)
 
+    def _get_raw(self, *args, **kwargs):
+        return self.oauth.get_raw(*args, **kwargs)
+
     def _post(self, *args, **kwargs):
         return self.oauth.post(*args, **kwargs)
 
@@ -14,31 +14,40 @@ class TrainingDataTransaction(Transaction):
         return self._get(endpoint=None, url=self.transaction_url,
                          access_token=self.access_token)
 
-    def get_exercise_summary(self, url):
+    def get_exercise_summary(self, url, typed=False):
         """Retrieve training session summary data
 
         :param url: url of the exercise entity
+        :param typed: return an `accesslink.models.ExerciseSummary` instead of a dict
         """
+        from ..models import ExerciseSummary
         return self._get(endpoint=None, url=url,
-                         access_token=self.access_token)
+                         access_token=self.access_token,
+                         model=ExerciseSummary if typed else None)
 
-    def get_gpx(self, url):
+    def get_gpx(self, url, stream=False):
         """Retrieve training session summary data in GPX format
 
         :param url: url of the exercise entity
+        :param stream: return a binary file-like object instead of the whole
+            document as a string (for `fragilidad.recorridos.leer_gpx`)
         """
-        return self._get(endpoint=None, url=url+"/gpx",
-                         access_token=self.access_token,
-                         headers={"Accept": "application/gpx+xml"})
+        get = self._get_raw if stream else self._get
+        return get(endpoint=None, url=url+"/gpx",
+                   access_token=self.access_token,
+                   headers={"Accept": "application/gpx+xml"})
 
-    def get_tcx(self, url):
+    def get_tcx(self, url, stream=False):
         """Retrieve training session summary data in TCX format
 
         :param url: url of the exercise entity
+        :param stream: return a binary file-like object instead of the whole
+            document as a string (for `fragilidad.recorridos.leer_tcx`)
         """
-        return self._get(endpoint=None, url=url+"/tcx",
-                         access_token=self.access_token,
-                         headers={"Accept": "application/vnd.garmin.tcx+xml"})
+        get = self._get_raw if stream else self._get
+        return get(endpoint=None, url=url+"/tcx",
+                   access_token=self.access_token,
+                   headers={"Accept": "application/vnd.garmin.tcx+xml"})
 
     def get_heart_rate_zones(self, url):
         """Retrieve heart rate zones in training session
@@ -2,6 +2,11 @@
 
 from .resource import Resource
 
+try:
+    from fragilidad import instrumentacion
+except ImportError:
+    instrumentacion = None
+
 
 class Transaction(Resource):
 
@@ -16,5 +21,10 @@ class Transaction(Resource):
 
         This should be done after retrieving data from the transaction.
         """
-        return self._put(endpoint=None, url=self.transaction_url,
-                         access_token=self.access_token)
+        if instrumentacion is None:
+            return self._put(endpoint=None, url=self.transaction_url,
+                             access_token=self.access_token)
+
+        with instrumentacion.medir("accesslink_commit", transaccion=type(self).__name__):
+            return self._put(endpoint=None, url=self.transaction_url,
+                             access_token=self.access_token)
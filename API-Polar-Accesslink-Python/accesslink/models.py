@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""Typed records for the AccessLink responses that are decoded in bulk
+
+Activity summaries, sleep nights, nightly recharges, physical info and exercise
+summaries are declared once, as (attribute, JSON key, type, default) tuples. Missing
+or null keys get their default at decode time, so callers read `summary.active_steps`
+instead of repeating `summary.get('active-steps', 0) or 0`.
+
+If msgspec is installed the records are `msgspec.Struct`s decoded straight from the
+response bytes (no intermediate dicts, values coerced to the declared types). Otherwise
+they are plain `__slots__` classes filled from orjson (or json) dicts. Both expose the
+same attributes, `from_dict()` and `to_dict()`, and use far less memory per record than
+dicts during large backfills.
+
+Usage:
+    summary = transaction.get_activity_summary(url, typed=True)
+    summary.active_steps, summary.to_dict()["active-steps"]
+"""
+
+from typing import List, Optional, Union
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
+try:
+    import msgspec
+    ValidationError = msgspec.ValidationError
+except ImportError:
+    msgspec = None
+
+    class ValidationError(ValueError):
+        """A JSON body that does not match its record type (only detected with msgspec)"""
+
+
+# Measurements keep the type they arrive with (AccessLink sends some as int, some as float)
+Number = Union[int, float]
+
+# attribute, JSON key, type, default (used when the key is missing or null)
+ACTIVITY_SUMMARY_FIELDS = (
+    ("id", "id", int, None),
+    ("polar_user", "polar-user", str, None),
+    ("transaction_id", "transaction-id", int, None),
+    ("date", "date", str, None),
+    ("created", "created", str, None),
+    ("calories", "calories", Number, 0),
+    ("active_calories", "active-calories", Number, 0),
+    ("duration", "duration", str, "PT0M"),
+    ("active_steps", "active-steps", Number, 0),
+)
+
+SLEEP_NIGHT_FIELDS = (
+    ("polar_user", "polar_user", str, None),
+    ("date", "date", str, None),
+    ("sleep_start_time", "sleep_start_time", str, None),
+    ("sleep_end_time", "sleep_end_time", str, None),
+    ("device_id", "device_id", str, None),
+    ("continuity", "continuity", Number, None),
+    ("light_sleep", "light_sleep", Number, 0),
+    ("deep_sleep", "deep_sleep", Number, 0),
+    ("rem_sleep", "rem_sleep", Number, 0),
+    ("unrecognized_sleep_stage", "unrecognized_sleep_stage", Number, 0),
+    ("sleep_score", "sleep_score", Number, None),
+    ("total_interruption_duration", "total_interruption_duration", Number, 0),
+    ("sleep_charge", "sleep_charge", Number, None),
+    ("sleep_goal", "sleep_goal", Number, None),
+    ("sleep_rating", "sleep_rating", Number, None),
+    ("short_interruption_duration", "short_interruption_duration", Number, 0),
+    ("long_interruption_duration", "long_interruption_duration", Number, 0),
+    ("sleep_cycles", "sleep_cycles", Number, None),
+)
+
+NIGHTLY_RECHARGE_FIELDS = (
+    ("polar_user", "polar_user", str, None),
+    ("date", "date", str, None),
+    ("heart_rate_avg", "heart_rate_avg", Number, None),
+    ("beat_to_beat_avg", "beat_to_beat_avg", Number, None),
+    ("heart_rate_variability_avg", "heart_rate_variability_avg", Number, None),
+    ("breathing_rate_avg", "breathing_rate_avg", Number, None),
+    ("nightly_recharge_status", "nightly_recharge_status", Number, None),
+    ("ans_charge", "ans_charge", Number, None),
+    ("ans_charge_status", "ans_charge_status", Number, None),
+)
+
+PHYSICAL_INFO_FIELDS = (
+    ("id", "id", int, None),
+    ("transaction_id", "transaction-id", int, None),
+    ("created", "created", str, None),
+    ("polar_user", "polar-user", str, None),
+    ("weight", "weight", Number, None),
+    ("height", "height", Number, None),
+    ("maximum_heart_rate", "maximum-heart-rate", Number, None),
+    ("resting_heart_rate", "resting-heart-rate", Number, None),
+    ("aerobic_threshold", "aerobic-threshold", Number, None),
+    ("anaerobic_threshold", "anaerobic-threshold", Number, None),
+    ("vo2_max", "vo2-max", Number, None),
+    ("weight_source", "weight-source", str, None),
+)
+
+EXERCISE_SUMMARY_FIELDS = (
+    ("id", "id", int, None),
+    ("upload_time", "upload-time", str, None),
+    ("polar_user", "polar-user", str, None),
+    ("transaction_id", "transaction-id", int, None),
+    ("device", "device", str, None),
+    ("start_time", "start-time", str, None),
+    ("duration", "duration", str, "PT0M"),
+    ("calories", "calories", Number, 0),
+    ("distance", "distance", Number, None),
+    ("heart_rate", "heart-rate", dict, None),
+    ("training_load", "training-load", Number, None),
+    ("sport", "sport", str, None),
+    ("has_route", "has-route", bool, False),
+    ("detailed_sport_info", "detailed-sport-info", str, None),
+)
+
+
+class Record(object):
+    """Base of the records used without msgspec: attributes in `__slots__`, defaults on decode"""
+
+    __slots__ = ()
+    _fields = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        for attribute, key, _, default in cls._fields:
+            value = data.get(key)
+            setattr(record, attribute, default if value is None else value)
+        return record
+
+    def to_dict(self):
+        return {key: getattr(self, attribute) for attribute, key, _, _ in self._fields}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(attribute, getattr(self, attribute)) for attribute, _, _, _ in self._fields))
+
+
+def _record_type(name, fields):
+    """Declare a record type from its field table (a msgspec Struct when available)"""
+    if msgspec is None:
+        return type(name, (Record,), {"__slots__": tuple(f[0] for f in fields), "_fields": fields,
+                                      "__module__": __name__})
+
+    defaults = {attribute: default for attribute, _, _, default in fields if default is not None}
+
+    def __post_init__(self):
+        # Null values in the response get the declared default as well
+        for attribute, default in defaults.items():
+            if getattr(self, attribute) is None:
+                setattr(self, attribute, default)
+
+    namespace = {
+        "_fields": fields,
+        "__post_init__": __post_init__,
+        "from_dict": classmethod(lambda cls, data: msgspec.convert(data, cls, strict=False)),
+        "to_dict": lambda self: msgspec.to_builtins(self),
+    }
+    return msgspec.defstruct(
+        name, [(attribute, Optional[kind], default) for attribute, _, kind, default in fields],
+        rename={attribute: key for attribute, key, _, _ in fields},
+        namespace=namespace, module=__name__, gc=False)
+
+
+ActivitySummary = _record_type("ActivitySummary", ACTIVITY_SUMMARY_FIELDS)
+SleepNight = _record_type("SleepNight", SLEEP_NIGHT_FIELDS)
+NightlyRecharge = _record_type("NightlyRecharge", NIGHTLY_RECHARGE_FIELDS)
+PhysicalInfo = _record_type("PhysicalInfo", PHYSICAL_INFO_FIELDS)
+ExerciseSummary = _record_type("ExerciseSummary", EXERCISE_SUMMARY_FIELDS)
+
+_envelopes = {}
+
+
+def decode(body, model, key=None):
+    """Decode a JSON response body into `model` records
+
+    With `key`, the body is an object whose `key` holds a list of records (e.g. the
+    "nights" of /users/sleep); the result keeps that shape: {key: [records]}.
+    """
+    if msgspec is None:
+        data = loads(body)
+        if key is None:
+            return model.from_dict(data)
+        return {key: [model.from_dict(item) for item in data.get(key) or []]}
+
+    if key is None:
+        return msgspec.json.decode(body, type=model, strict=False)
+    if (model, key) not in _envelopes:
+        _envelopes[model, key] = msgspec.defstruct(
+            model.__name__ + "List", [(key, Optional[List[model]], None)], gc=False)
+    envelope = msgspec.json.decode(body, type=_envelopes[model, key], strict=False)
+    return {key: getattr(envelope, key) or []}
@@ -1,13 +1,24 @@
 #!/usr/bin/env python
 
+import re
+import time
+
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.exceptions import HTTPError
 
 try:
-    from urllib.parse import urlencode
+    from urllib.parse import urlencode, urlparse
 except ImportError:
     from urllib import urlencode
+    from urlparse import urlparse
+
+try:
+    from fragilidad import instrumentacion
+except ImportError:
+    instrumentacion = None
+
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
 
 class OAuth2Client(object):
     """Wrapper class for OAuth2 requests"""
@@ -30,7 +41,7 @@ class OAuth2Client(object):
             "Accept": "application/json"
         }
 
-    def get_authorization_url(self, response_type="code"):
+    def get_authorization_url(self, response_type="code", scope=None):
         """Build authorization url for the client"""
 
         params = {
@@ -38,6 +49,9 @@ class OAuth2Client(object):
             "response_type": response_type,
         }
 
+        if scope:
+            params["scope"] = scope
+
         if self.redirect_url:
             params["redirect_uri"] = self.redirect_url
 
@@ -104,7 +118,13 @@ class OAuth2Client(object):
         kwargs = self.__build_auth_kwargs(**kwargs)
         return kwargs
 
-    def __parse_response(self, response):
+    def __parse_response(self, response, model=None, key=None):
+        """Decode a response body
+
+        With `model` (a type from `accesslink.models`) the JSON body is decoded straight
+        into typed records; `key` names the list holding them (e.g. "nights"). Otherwise
+        the body is parsed into dicts, with orjson when it is installed.
+        """
         if response.status_code >= 400:
             message = "{code} {reason}: {body}".format(code=response.status_code,
                                                        reason=response.reason,
@@ -114,19 +134,66 @@ class OAuth2Client(object):
         if response.status_code is 204:
             return {}
 
+        # Imported on the first response: msgspec/orjson are not needed to start the tools
+        from . import models
         try:
-            return response.json()
+            if model is not None:
+                return models.decode(response.content, model, key)
+            return models.loads(response.content)
+        except models.ValidationError:
+            # Valid JSON that does not match `model`: returning the text would hand callers
+            # a string where they expect records
+            raise
         except ValueError:
+            # Not JSON at all (e.g. an empty or plain-text body)
             return response.text
 
-    def __request(self, method, **kwargs):
+    def __request(self, method, model=None, key=None, **kwargs):
         kwargs = self.__build_request_kwargs(**kwargs)
+        if instrumentacion is not None and instrumentacion.ACTIVA:
+            return self.__instrumented_request(method, model, key, **kwargs)
         response = requests.request(method, **kwargs)
-        return self.__parse_response(response)
+        return self.__parse_response(response, model, key)
+
+    def __instrumented_request(self, method, model=None, key=None, **kwargs):
+        """Same as `__request`, recording HTTP latency, response size, status and decode time
+
+        User and transaction ids are replaced by `{id}` so that metrics are grouped per endpoint.
+        """
+        endpoint = ID_SEGMENT.sub("/{id}", urlparse(kwargs["url"]).path)
+        start = time.perf_counter()
+        response = requests.request(method, **kwargs)
+        instrumentacion.registrar_tiempo("accesslink_http", time.perf_counter() - start,
+                                         metodo=method, endpoint=endpoint,
+                                         estado=response.status_code)
+        instrumentacion.incrementar("accesslink_bytes", len(response.content),
+                                    metodo=method, endpoint=endpoint)
+        with instrumentacion.medir("accesslink_decodificacion", endpoint=endpoint):
+            return self.__parse_response(response, model, key)
 
     def get(self, endpoint, **kwargs):
         return self.__request("get", endpoint=endpoint, **kwargs)
 
+    def get_raw(self, endpoint, **kwargs):
+        """GET whose body is returned as a binary file-like object, read as it arrives
+
+        Used for large documents (GPX/TCX) that are parsed incrementally instead of being
+        loaded into one string. Returns None for 204 No Content.
+        """
+        kwargs = self.__build_request_kwargs(endpoint=endpoint, **kwargs)
+        start = time.perf_counter()
+        response = requests.get(stream=True, **kwargs)
+        if instrumentacion is not None and instrumentacion.ACTIVA:
+            path = ID_SEGMENT.sub("/{id}", urlparse(kwargs["url"]).path)
+            instrumentacion.registrar_tiempo("accesslink_http", time.perf_counter() - start,
+                                             metodo="get", endpoint=path,
+                                             estado=response.status_code)
+        if response.status_code >= 400 or response.status_code == 204:
+            # Error bodies are small: parse them as usual
+            return self.__parse_response(response) or None
+        response.raw.decode_content = True
+        return response.raw
+
     def post(self, endpoint, **kwargs):
         return self.__request("post", endpoint=endpoint, **kwargs)
 
@@ -1,12 +1,24 @@
+import os
+import sys
 import pandas as pd
 
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fragilidad.caracteristicas import VENTANAS, calcular_caracteristicas
+from fragilidad.esquemas import leer_export
+from fragilidad.reduccion import maximo_por_dia_en_bloques
+from fragilidad.perfil_fisico import COLUMNAS_PERFIL, leer_perfiles, unir_perfil_fisico
+
 # --- CONFIGURACIÓN ---
 
 # 1. Nombres de los archivos de datos y su columna de fecha
+#    'maximo_diario': el archivo trae varias capturas intradía por fecha; se lee por bloques
+#    quedándose solo con la de mayor 'valor' (a igualdad, la más reciente según 'orden').
 ARCHIVOS_DATOS = {
     'actividades': {
         'path': 'polar_daily_activities_util.csv', 
-        'date_col': 'date'
+        'date_col': 'date',
+        'maximo_diario': {'valor': 'active-steps', 'orden': 'created'}
     },
     'recarga': {
         'path': 'polar_recharge_summary.csv',
@@ -26,6 +38,7 @@ ARCHIVOS_DATOS = {
 ARCHIVO_USUARIOS = {
     'path': 'usuarios.csv',
     'user_col': 'id_usuario',
+    'polar_col': 'user_id_polar',
     'birth_col': 'fecha_nacimiento',
     'start_date_col': 'fecha_inicio',
     'end_date_col': 'fecha_fin'
@@ -40,11 +53,18 @@ COLUMNAS_RELEVANTES = [
     'sleep_score', 'light_sleep_min', 'deep_sleep_min', 'rem_sleep_min',
     'interruptions_min', 'breathing_rate_avg',
     'temp_mean', 'temp_std', 'temp_amplitude'
-]
+] + list(VENTANAS)
 
 # 4. Nombre del archivo de salida
 ARCHIVO_SALIDA = 'datos_smartwatch.csv'
 
+# 5. Filas por bloque al leer los archivos con capturas intradía
+CHUNKSIZE = 100_000
+
+# 6. Historial de información física (altura, peso, VO2max...); a cada día se le une el
+#    último perfil registrado hasta esa fecha
+ARCHIVO_PERFIL = 'polar_physical_info.csv'
+
 # --- FUNCIONES ---
 
 def calcular_edad(fecha_nacimiento, fecha_registro):
@@ -55,21 +75,25 @@ def calcular_edad(fecha_nacimiento, fecha_registro):
 
 # --- PROCESAMIENTO PRINCIPAL ---
 
-if __name__ == "__main__":
+def unir_bases_de_datos(archivos_datos=ARCHIVOS_DATOS, archivo_usuarios=ARCHIVO_USUARIOS, archivo_salida=ARCHIVO_SALIDA,
+                        archivo_perfil=ARCHIVO_PERFIL):
+    """
+    Une los archivos de datos con la tabla de usuarios y agrega una fila por día y usuario.
+    """
     print("🚀 Iniciando el proceso de unión y agregación...")
 
     try:
         # --- PASO 1 y 2: Lectura y enriquecimiento de datos (sin cambios) ---
-        df_usuarios = pd.read_csv(ARCHIVO_USUARIOS['path'])
-        user_date_cols = [ARCHIVO_USUARIOS['start_date_col'], ARCHIVO_USUARIOS['end_date_col']]
+        df_usuarios = pd.read_csv(archivo_usuarios['path'])
+        user_date_cols = [archivo_usuarios['start_date_col'], archivo_usuarios['end_date_col']]
         for col in user_date_cols:
             df_usuarios[col] = pd.to_datetime(df_usuarios[col], errors='coerce')
 
         date_to_user_map_list = []
         for _, row in df_usuarios.iterrows():
-            user_id = row[ARCHIVO_USUARIOS['user_col']]
-            start_date = row[ARCHIVO_USUARIOS['start_date_col']]
-            end_date = row[ARCHIVO_USUARIOS['end_date_col']]
+            user_id = row[archivo_usuarios['user_col']]
+            start_date = row[archivo_usuarios['start_date_col']]
+            end_date = row[archivo_usuarios['end_date_col']]
             if pd.notna(start_date) and pd.notna(end_date):
                 date_range = pd.date_range(start=start_date, end=end_date, freq='D')
                 temp_df = pd.DataFrame({'fecha_comun': date_range, 'id_usuario': user_id})
@@ -78,9 +102,13 @@ if __name__ == "__main__":
         print(f"✅ Tabla de consulta creada: {len(df_lookup)} registros.")
 
         processed_dataframes = []
-        for nombre, config in ARCHIVOS_DATOS.items():
+        for nombre, config in archivos_datos.items():
             print(f"🔄 Procesando '{config['path']}'...")
-            df_data = pd.read_csv(config['path'])
+            if 'maximo_diario' in config:
+                df_data = maximo_por_dia_en_bloques(leer_export(config['path'], chunksize=CHUNKSIZE),
+                                                    fecha=config['date_col'], **config['maximo_diario'])
+            else:
+                df_data = leer_export(config['path'])
             df_data = df_data.rename(columns={config['date_col']: 'fecha_comun'})
             df_data['fecha_comun'] = pd.to_datetime(df_data['fecha_comun'], errors='coerce')
             df_data = df_data.dropna(subset=['fecha_comun'])
@@ -97,9 +125,9 @@ if __name__ == "__main__":
         print("\n🔗 Todos los archivos de datos han sido unidos.")
 
         # --- PASO 4: Añadir edad (sin cambios) ---
-        df_usuarios[ARCHIVO_USUARIOS['birth_col']] = pd.to_datetime(df_usuarios[ARCHIVO_USUARIOS['birth_col']], errors='coerce')
-        df_usuarios_info = df_usuarios[[ARCHIVO_USUARIOS['user_col'], ARCHIVO_USUARIOS['birth_col']]].rename(columns={
-            ARCHIVO_USUARIOS['user_col']: 'id_usuario', ARCHIVO_USUARIOS['birth_col']: 'fecha_nacimiento'})
+        df_usuarios[archivo_usuarios['birth_col']] = pd.to_datetime(df_usuarios[archivo_usuarios['birth_col']], errors='coerce')
+        df_usuarios_info = df_usuarios[[archivo_usuarios['user_col'], archivo_usuarios['birth_col']]].rename(columns={
+            archivo_usuarios['user_col']: 'id_usuario', archivo_usuarios['birth_col']: 'fecha_nacimiento'})
         df_final = pd.merge(df_final, df_usuarios_info, on='id_usuario', how='left')
         df_final['edad'] = df_final.apply(lambda row: calcular_edad(row['fecha_nacimiento'], row['fecha_comun']), axis=1)
         df_final = df_final.drop(columns=['fecha_nacimiento'])
@@ -119,8 +147,7 @@ if __name__ == "__main__":
             'duration_minutes': 'max',
             'calories': 'max',             
             
-            # Columnas de ratios o promedios: calcular la media
-            'steps_per_minute': 'mean',
+            # Columnas de promedios: calcular la media (los cocientes se recalculan en el PASO 4.7)
             'breathing_rate_avg': 'mean',
             
             # El resto de columnas son constantes para un día, así que cogemos el primer valor
@@ -145,17 +172,37 @@ if __name__ == "__main__":
         df_agregado = df_final.groupby(['id_usuario', 'fecha_comun']).agg(agg_rules).reset_index()
         print("  -> ¡Agregación completada!")
 
+        # --- PASO 4.6: Añadir el perfil físico vigente cada día (merge_asof) ---
+        if archivo_perfil and os.path.exists(archivo_perfil):
+            perfiles = leer_perfiles(archivo_perfil)
+            por = None
+            if archivo_usuarios['polar_col'] in df_usuarios.columns:
+                ids_polar = df_usuarios.set_index(archivo_usuarios['user_col'])[archivo_usuarios['polar_col']]
+                df_agregado['user_id_polar'] = pd.to_numeric(df_agregado['id_usuario'].map(ids_polar), errors='coerce')
+                perfiles['user_id_polar'] = perfiles['user_id_polar'].astype(df_agregado['user_id_polar'].dtype)
+                por = 'user_id_polar'
+            df_agregado = unir_perfil_fisico(df_agregado, perfiles, fecha='fecha_comun', por=por)
+            print(f"🩺 Perfil físico añadido desde '{archivo_perfil}'.")
+
+        # --- PASO 4.7: Métricas derivadas y ventanas móviles por usuario (fragilidad/caracteristicas.py) ---
+        df_agregado = calcular_caracteristicas(df_agregado, usuario='id_usuario', fecha='fecha_comun', recalcular=True)
+        print("📈 Características derivadas y móviles calculadas.")
+
         # --- PASO 5: Filtrar columnas finales y guardar ---
-        columnas_finales = ['id_usuario', 'edad'] + COLUMNAS_RELEVANTES
+        columnas_finales = ['id_usuario', 'edad'] + COLUMNAS_RELEVANTES + COLUMNAS_PERFIL
         columnas_a_mantener = [col for col in columnas_finales if col in df_agregado.columns]
         df_resultado = df_agregado[columnas_a_mantener].copy()
         
         df_resultado['fecha_comun'] = pd.to_datetime(df_resultado['fecha_comun']).dt.date
         df_resultado = df_resultado.sort_values(by=['id_usuario', 'fecha_comun']).reset_index(drop=True)
 
-        df_resultado.to_csv(ARCHIVO_SALIDA, index=False, encoding='utf-8-sig')
-        print(f"\n🎉 ¡Proceso completado! Se ha creado el archivo '{ARCHIVO_SALIDA}' con {len(df_resultado)} filas (una por día y usuario).")
+        df_resultado.to_csv(archivo_salida, index=False, encoding='utf-8-sig')
+        print(f"\n🎉 ¡Proceso completado! Se ha creado el archivo '{archivo_salida}' con {len(df_resultado)} filas (una por día y usuario).")
 
     except (FileNotFoundError, KeyError, ValueError) as e:
         print(f"\n❌ ERROR CRÍTICO: {e}")
-        print("   -> Por favor, revisa los nombres de archivo y columnas en la sección de CONFIGURACIÓN.")
\ No newline at end of file
+        print("   -> Por favor, revisa los nombres de archivo y columnas en la sección de CONFIGURACIÓN.")
+
+
+if __name__ == "__main__":
+    unir_bases_de_datos()
@@ -1,5 +1,14 @@
+import os
+import sys
 import pandas as pd
 
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from fragilidad.caracteristicas import VENTANAS, calcular_caracteristicas
+from fragilidad.ejercicios import COLUMNAS_DIARIAS, EJERCICIOS_FILENAME, resumen_diario
+from fragilidad.esquemas import leer_export
+from fragilidad.perfil_fisico import COLUMNAS_PERFIL, PERFIL_FILENAME, leer_perfiles, unir_perfil_fisico
+
 # --- CONFIGURACIÓN ---
 nombres_archivos = {
     'actividades': 'polar_daily_activities.csv',
@@ -23,47 +32,77 @@ columnas_relevantes = [
     'heart_rate_avg', 'heart_rate_variability_avg', 'ans_charge',
     'sleep_score', 'light_sleep_min', 'deep_sleep_min', 'rem_sleep_min',
     'interruptions_min', 'breathing_rate_avg','temp_amplitude'
-]
+] + list(VENTANAS) + list(COLUMNAS_DIARIAS)
 
 # --- PROCESAMIENTO ---
-dataframes = {}
-
-print("Leyendo archivos...")
-for nombre, archivo in nombres_archivos.items():
-    try:
-        df = pd.read_csv(archivo)
-        columna_fecha_original = mapeo_columnas_fecha[nombre]
-        
-        # Se asegura de que la columna 'date' exista y tenga el formato correcto
-        df['date'] = pd.to_datetime(df[columna_fecha_original]).dt.date
-        
-        # Solo borra la columna de fecha original si su nombre no es 'date'
-        if columna_fecha_original != 'date':
-            df = df.drop(columns=[columna_fecha_original])
-            
-        dataframes[nombre] = df
-        print(f"-> Archivo '{archivo}' leído y procesado.")
-    except FileNotFoundError:
-        print(f"¡ERROR! No se encontró el archivo: {archivo}")
-    except KeyError:
-        print(f"¡ERROR! La columna '{mapeo_columnas_fecha[nombre]}' no se encontró en el archivo '{archivo}'.")
-    except Exception as e:
-        print(f"Ocurrió un error inesperado con el archivo {archivo}: {e}")
-if len(dataframes) == len(nombres_archivos):
-    df_final = dataframes['actividades']
-    for nombre, df_a_unir in list(dataframes.items())[1:]:
-        df_final = pd.merge(df_final, df_a_unir, on='date', how='outer', suffixes=('', f'_{nombre}'))
-    df_final = df_final.sort_values(by='date').reset_index(drop=True)
-
-    # --- FILTRAR SÓLO LAS COLUMNAS RELEVANTES ---
-    columnas_presentes = [col for col in columnas_relevantes if col in df_final.columns]
-    df_filtrado = df_final[columnas_presentes]
-
-    # --- GUARDADO ---
-    nombre_archivo_salida = 'datos_smartwatch.csv'
-    df_filtrado.to_csv(nombre_archivo_salida, index=False, encoding='utf-8-sig')
-
-    print("\n¡Unión y filtrado completados con éxito!")
-    print(f"Archivo creado: '{nombre_archivo_salida}' con {len(df_filtrado)} filas y {len(df_filtrado.columns)} columnas.")
-else:
-    print("\nNo se pudo completar la unión debido a errores al leer los archivos.")
+
+def unir_archivos(nombres_archivos=nombres_archivos, nombre_archivo_salida='datos_smartwatch.csv',
+                  archivo_perfil=PERFIL_FILENAME, archivo_ejercicios=EJERCICIOS_FILENAME):
+    """
+    Lee los CSV exportados, los une por fecha y guarda solo las columnas relevantes.
+    Si existe `archivo_perfil`, añade a cada día el último perfil físico registrado hasta esa fecha.
+    Si existe `archivo_ejercicios`, añade la carga, las zonas y la HRV de los ejercicios de cada día.
+    """
+    dataframes = {}
+
+    print("Leyendo archivos...")
+    for nombre, archivo in nombres_archivos.items():
+        try:
+            df = leer_export(archivo)
+            columna_fecha_original = mapeo_columnas_fecha[nombre]
+
+            # Se asegura de que la columna 'date' exista y tenga el formato correcto
+            # (leer_export ya la parsea, así que aquí solo se descarta la hora si la hubiera)
+            df['date'] = pd.to_datetime(df[columna_fecha_original]).dt.normalize()
+
+            # Solo borra la columna de fecha original si su nombre no es 'date'
+            if columna_fecha_original != 'date':
+                df = df.drop(columns=[columna_fecha_original])
+
+            dataframes[nombre] = df
+            print(f"-> Archivo '{archivo}' leído y procesado.")
+        except FileNotFoundError:
+            print(f"¡ERROR! No se encontró el archivo: {archivo}")
+        except KeyError:
+            print(f"¡ERROR! La columna '{mapeo_columnas_fecha[nombre]}' no se encontró en el archivo '{archivo}'.")
+        except Exception as e:
+            print(f"Ocurrió un error inesperado con el archivo {archivo}: {e}")
+    if len(dataframes) == len(nombres_archivos):
+        df_final = dataframes['actividades']
+        for nombre, df_a_unir in list(dataframes.items())[1:]:
+            df_final = pd.merge(df_final, df_a_unir, on='date', how='outer', suffixes=('', f'_{nombre}'))
+        df_final = df_final.sort_values(by='date').reset_index(drop=True)
+
+        # --- PERFIL FÍSICO VIGENTE CADA DÍA (merge_asof) ---
+        if archivo_perfil and os.path.exists(archivo_perfil):
+            df_final = unir_perfil_fisico(df_final, leer_perfiles(archivo_perfil), fecha='date')
+            print(f"-> Perfil físico añadido desde '{archivo_perfil}'.")
+
+        # --- EJERCICIOS DEL DÍA (análisis de las muestras en bruto) ---
+        if archivo_ejercicios and os.path.exists(archivo_ejercicios):
+            diario = resumen_diario(leer_export(archivo_ejercicios))
+            df_final = pd.merge(df_final, diario, on='date', how='left')
+            # Un día sin ejercicios registrados no tiene carga ni minutos en zona, no le faltan
+            sumas = [c for c, (_, agregacion) in COLUMNAS_DIARIAS.items()
+                     if agregacion == 'sum' and c in df_final.columns]
+            df_final[sumas] = df_final[sumas].fillna(0)
+            print(f"-> Ejercicios añadidos desde '{archivo_ejercicios}'.")
+
+        # --- CARACTERÍSTICAS DERIVADAS Y MÓVILES (sobre la tabla ya unida) ---
+        df_final = calcular_caracteristicas(df_final, usuario=None, fecha='date', recalcular=True)
+
+        # --- FILTRAR SÓLO LAS COLUMNAS RELEVANTES ---
+        columnas_presentes = [col for col in columnas_relevantes + COLUMNAS_PERFIL if col in df_final.columns]
+        df_filtrado = df_final[columnas_presentes]
+
+        # --- GUARDADO ---
+        df_filtrado.to_csv(nombre_archivo_salida, index=False, encoding='utf-8-sig')
+
+        print("\n¡Unión y filtrado completados con éxito!")
+        print(f"Archivo creado: '{nombre_archivo_salida}' con {len(df_filtrado)} filas y {len(df_filtrado.columns)} columnas.")
+    else:
+        print("\nNo se pudo completar la unión debido a errores al leer los archivos.")
+
+
+if __name__ == "__main__":
+    unir_archivos()
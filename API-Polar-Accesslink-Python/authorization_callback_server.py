@@ -1,11 +1,15 @@
 #!/usr/bin/env python
 from __future__ import print_function
 
-import requests
-from flask import Flask, request, redirect
+from functools import lru_cache
 
-from utils import load_config, save_config
+from flask import Flask, request, redirect, jsonify
+
+from utils import load_config
 from accesslink import AccessLink
+from onboarding import Onboarding
+from snapshot_store import SnapshotStore, refresh_user
+from token_store import TokenStore
 
 
 CALLBACK_PORT = 5000
@@ -15,74 +19,95 @@ CONFIG_FILENAME = "config.yml"
 
 REDIRECT_URL = "http://localhost:{}{}".format(CALLBACK_PORT, CALLBACK_ENDPOINT)
 
-config = load_config(CONFIG_FILENAME)
+# Scope requested for every user; it covers the biosensing data used by polar_temperature.py.
+SCOPE = "accesslink.read_all"
+
+# The client, the stores and the onboarding workers are built on first use, so that
+# importing this module (e.g. `polar_temperature.py auth`) does not read the config,
+# open the token store or load backfill's dependencies.
+
+@lru_cache(maxsize=None)
+def get_accesslink():
+    config = load_config(CONFIG_FILENAME)
+    return AccessLink(client_id=config['client_id'],
+                      client_secret=config['client_secret'],
+                      redirect_url=REDIRECT_URL)
+
+
+@lru_cache(maxsize=None)
+def get_tokens():
+    return TokenStore()
+
+
+@lru_cache(maxsize=None)
+def get_snapshots():
+    return SnapshotStore()
+
+
+@lru_cache(maxsize=None)
+def get_onboarding():
+    """The one onboarding service, shared by this server and example_web_app.py."""
+    return Onboarding(get_accesslink(), get_tokens(), first_sync=first_sync)
 
-accesslink = AccessLink(client_id=config['client_id'],
-                        client_secret=config['client_secret'],
-                        redirect_url=REDIRECT_URL)
+
+def first_sync(user_id, access_token):
+    """First sync of a new user: the web app snapshot and the daily activity history.
+
+    The history is written window by window to archivos_exportados/usuarios/<user_id>/
+    (see backfill.py), so it can be resumed with `python backfill.py --usuario <user_id>`.
+    The snapshot's sleep and recharge nights and the activity days are handed to the
+    frailty scorer (puntuacion.py), which scores the days that have every source.
+    """
+    from backfill import backfill_usuario
+    from puntuacion import PuntuadorContinuo
+
+    refresh_user(get_accesslink(), get_snapshots(), user_id, access_token)
+    # A new scorer per sync, so it reads the state other exporters may have written
+    puntuador = PuntuadorContinuo()
+    snapshot = get_snapshots().load(user_id)
+    if snapshot:
+        puntuador.añadir_snapshot(user_id, snapshot)
+    backfill_usuario(get_accesslink(), user_id, access_token, puntuador=puntuador)
 
 
 app = Flask(__name__)
 
 @app.route("/")
 def authorize():
-    return redirect(accesslink.authorization_url)
+    return redirect(get_accesslink().oauth.get_authorization_url(scope=SCOPE))
 
 
 @app.route(CALLBACK_ENDPOINT)
 def callback():
     """Callback for OAuth2 authorization request
 
-    Saves the user's id and access token to a file.
+    Queues the authorization code for the onboarding workers and returns
+    immediately; the token exchange, registration and first sync run in
+    the background. The server keeps running so any number of users can
+    authorize.
     """
-
-    #
-    # Get authorization from the callback request parameters
-    #
     authorization_code = request.args.get("code")
+    if not authorization_code:
+        return "Authorization failed: {}".format(request.args.get("error", "no code received")), 400
+
+    job_id = get_onboarding().submit(authorization_code)
+    return ("Client authorized! Your account is being linked, you can now close this page. "
+            "Progress: <a href=\"/onboarding/{0}\">/onboarding/{0}</a>".format(job_id)), 202
 
-    #
-    # Get an access token for the user using the authorization code.
-    #
-    # The authorization code is only valid for 10 minutes, so the access token
-    # should be fetched immediately after the authorization step.
-    #
-    token_response = accesslink.get_access_token(authorization_code)
-
-    #
-    # Save the user's id and access token to the configuration file.
-    #
-    config["user_id"] = token_response["x_user_id"]
-    config["access_token"] = token_response["access_token"]
-    save_config(config, CONFIG_FILENAME)
-
-    #
-    # Register the user as a user of the application.
-    # This must be done before the user's data can be accessed through AccessLink.
-    #
-    try:
-        accesslink.users.register(access_token=config["access_token"])
-    except requests.exceptions.HTTPError as err:
-        # Error 409 Conflict means that the user has already been registered for this client.
-        # That error can be ignored in this example.
-        if err.response.status_code != 409:
-            raise err
-
-    shutdown()
-    return "Client authorized! You can now close this page."
-
-
-def shutdown():
-    shutdown_func = request.environ.get('werkzeug.server.shutdown')
-    if shutdown_func is not None:
-        shutdown_func()
+
+@app.route("/onboarding/<job_id>")
+def onboarding_status(job_id):
+    status = get_onboarding().status(job_id)
+    if status is None:
+        return jsonify(error="unknown job"), 404
+    return jsonify(status)
 
 
 def main():
+    get_onboarding().start()
     print("Navigate to http://localhost:{port}/ for authorization.\n".format(port=CALLBACK_PORT))
-    app.run(host='localhost', port=CALLBACK_PORT)
+    app.run(host='localhost', port=CALLBACK_PORT, threaded=True)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,292 @@
+# backfill.py
+"""
+Carga histórica de la actividad diaria con memoria acotada.
+
+La primera transacción de actividad de un usuario puede traer meses de resúmenes (varios
+por día). En vez de descargarlos todos antes de escribir nada, se recorren en ventanas de
+`ventana` resúmenes (por defecto 31, un mes con un resumen por día): cada ventana se reduce
+al resumen con más 'active-steps' de cada día, los días nuevos o con más pasos se añaden al
+final del CSV y se guarda un punto de control. Si el proceso se interrumpe, la siguiente
+ejecución sobre la misma transacción continúa desde la última ventana completada en lugar
+de empezar de cero.
+
+El CSV se lee una vez al empezar (en memoria solo quedan los pasos de cada día) y se
+reescribe una vez al terminar, ordenado y con una fila por día. Cada ventana solo escribe
+sus propias filas, así que el coste no crece con la longitud del historial.
+
+Uso:
+    python backfill.py                      # todos los usuarios del almacén de tokens
+    python backfill.py --usuario 62739880   # un único usuario
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import pandas as pd
+import requests
+
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fragilidad.duraciones import duracion_iso_a_minutos
+from fragilidad.instrumentacion import medir
+from fragilidad.reduccion import maximo_por_dia
+
+EXPORT_FOLDER = 'archivos_exportados'
+VENTANA_POR_DEFECTO = 31
+
+# Las métricas derivadas (pasos por minuto, etc.) no se exportan: se calculan sobre la tabla
+# unida en fragilidad/caracteristicas.py
+CAMPOS_ACTIVIDAD = [
+    'id', 'date', 'active-steps', 'active-calories', 'calories', 'duration_minutes'
+]
+
+
+def fila_actividad(summary):
+    """Fila del CSV de actividad a partir de un `ActivitySummary` (los nulos ya traen su valor por defecto)."""
+    return {
+        'id': summary.id,
+        'date': summary.date,
+        'active-steps': summary.active_steps,
+        'active-calories': summary.active_calories,
+        'calories': summary.calories,
+        'duration_minutes': round(duracion_iso_a_minutos(summary.duration), 2),
+    }
+
+
+def reducir_maximo_diario(resumenes):
+    """
+    Se queda, para cada fecha, con el resumen de más 'active-steps' (a igualdad, el primero).
+
+    La selección se hace en columnas con `maximo_por_dia`; los `ActivitySummary` ganadores
+    se devuelven tal cual llegaron de la API, indexados por fecha.
+    """
+    resumenes = [summary for summary in resumenes if summary.date]
+    if not resumenes:
+        return {}
+    tabla = pd.DataFrame({
+        'date': [summary.date for summary in resumenes],
+        'active-steps': [summary.active_steps for summary in resumenes],
+    })
+    return {resumenes[i].date: resumenes[i] for i in maximo_por_dia(tabla).index}
+
+
+# --- CSV de actividad ---
+
+def leer_actividades(csv_filename):
+    """Filas del CSV indexadas por fecha ('active-steps' como número para poder comparar)."""
+    existentes = {}
+    if not os.path.exists(csv_filename):
+        return existentes
+    try:
+        with open(csv_filename, mode='r', newline='', encoding='utf-8') as csv_file:
+            for row in csv.DictReader(csv_file):
+                row['active-steps'] = int(float(row.get('active-steps') or 0))
+                existentes[row['date']] = row
+    except (IOError, KeyError, ValueError) as e:
+        print(f"Aviso: No se pudo leer el archivo CSV existente. Se creará de nuevo. Error: {e}")
+    return existentes
+
+
+def leer_cabecera(csv_filename):
+    try:
+        with open(csv_filename, mode='r', newline='', encoding='utf-8') as csv_file:
+            return next(csv.reader(csv_file), None)
+    except FileNotFoundError:
+        return None
+
+
+def escribir_actividades(csv_filename, filas_por_fecha):
+    """
+    Reescribe el CSV ordenado por fecha; se escribe en un temporal para no dejarlo a medias.
+    Las columnas que ya no se exportan (métricas derivadas de ficheros antiguos) se descartan.
+    """
+    temporal = csv_filename + '.tmp'
+    with medir('exportacion_csv', archivo=os.path.basename(csv_filename)), \
+            open(temporal, mode='w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=CAMPOS_ACTIVIDAD, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(sorted(filas_por_fecha.values(), key=lambda fila: fila['date']))
+    os.replace(temporal, csv_filename)
+
+
+def añadir_actividades(csv_filename, filas):
+    """Añade `filas` al final del CSV (con la cabecera si aún no existe)."""
+    nuevo = not os.path.exists(csv_filename) or os.path.getsize(csv_filename) == 0
+    with medir('exportacion_csv', archivo=os.path.basename(csv_filename)), \
+            open(csv_filename, mode='a', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=CAMPOS_ACTIVIDAD, extrasaction='ignore')
+        if nuevo:
+            writer.writeheader()
+        writer.writerows(sorted(filas, key=lambda fila: fila['date']))
+
+
+def compactar_actividades(csv_filename):
+    """
+    Una fila por día y ordenadas por fecha. Un día actualizado aparece varias veces al final
+    del CSV; `leer_actividades` se queda con la última, que es la de más pasos.
+    """
+    escribir_actividades(csv_filename, leer_actividades(csv_filename))
+
+
+def fusionar_maximos(csv_filename, maximos, pasos, al_guardar=None):
+    """
+    Añade al final del CSV los días nuevos y los que ahora tienen más pasos.
+
+    `pasos` ({fecha: 'active-steps'} de lo ya escrito) se actualiza aquí; así no hace falta
+    volver a leer el CSV en cada ventana. Si se indica, `al_guardar` recibe las filas
+    añadidas o actualizadas una vez escritas. Devuelve (añadidos, actualizados).
+    """
+    añadidos = actualizados = 0
+    cambiadas = []
+    for date, summary in maximos.items():
+        steps = summary.active_steps
+        if date in pasos and steps <= pasos[date]:
+            continue
+        if date in pasos:
+            actualizados += 1
+        else:
+            añadidos += 1
+        pasos[date] = steps
+        cambiadas.append(fila_actividad(summary))
+
+    if cambiadas:
+        añadir_actividades(csv_filename, cambiadas)
+        if al_guardar:
+            al_guardar(cambiadas)
+    return añadidos, actualizados
+
+
+def abrir_actividades(csv_filename):
+    """
+    Lee el CSV una vez al empezar y devuelve {fecha: 'active-steps'}. Un CSV con otras
+    columnas (de versiones anteriores) se reescribe antes, para poder añadirle filas.
+    """
+    existentes = leer_actividades(csv_filename)
+    if leer_cabecera(csv_filename) not in (None, CAMPOS_ACTIVIDAD):
+        escribir_actividades(csv_filename, existentes)
+    return {fecha: fila['active-steps'] for fecha, fila in existentes.items()}
+
+
+# --- Puntos de control ---
+
+def cargar_punto_control(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def guardar_punto_control(ruta, transaccion, procesadas, tamaño_csv=None):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump({'transaccion': transaccion, 'procesadas': procesadas, 'tamaño_csv': tamaño_csv}, f)
+    os.replace(temporal, ruta)
+
+
+def backfill_actividad(transaction, csv_filename, punto_control=None, ventana=VENTANA_POR_DEFECTO, al_guardar=None):
+    """
+    Vuelca la transacción de actividad diaria en `csv_filename` ventana a ventana y la confirma.
+
+    En memoria solo están la ventana en curso y los pasos de cada día. Tras añadir cada
+    ventana se guarda en `punto_control` cuántos resúmenes de la transacción se han procesado
+    y el tamaño del CSV; al relanzar con la misma transacción abierta se descartan las filas
+    de una ventana a medias y se continúa desde ahí. `al_guardar` recibe las filas
+    escritas en cada ventana (p. ej. `PuntuadorContinuo.añadir`). Devuelve un resumen con los
+    días añadidos y actualizados.
+    """
+    punto_control = punto_control or csv_filename + '.checkpoint.json'
+    resumen = {'añadidos': 0, 'actualizados': 0, 'ventanas': 0, 'reanudada_en': 0}
+
+    resource_urls = transaction.list_activities().get("activity-log", [])
+    estado = cargar_punto_control(punto_control)
+    inicio = 0
+    if estado and estado.get('transaccion') == transaction.transaction_url:
+        inicio = min(estado.get('procesadas', 0), len(resource_urls))
+        resumen['reanudada_en'] = inicio
+        print(f"↻ Reanudando la carga histórica en el resumen {inicio} de {len(resource_urls)}.")
+        # Filas que una ventana interrumpida llegó a añadir después del último punto de control
+        tamaño = estado.get('tamaño_csv')
+        if tamaño is not None and os.path.exists(csv_filename) and os.path.getsize(csv_filename) > tamaño:
+            with open(csv_filename, 'r+b') as f:
+                f.truncate(tamaño)
+
+    pasos = abrir_actividades(csv_filename)
+    for desde in range(inicio, len(resource_urls), ventana):
+        urls = resource_urls[desde:desde + ventana]
+        maximos = reducir_maximo_diario([transaction.get_activity_summary(url, typed=True) for url in urls])
+        añadidos, actualizados = fusionar_maximos(csv_filename, maximos, pasos, al_guardar=al_guardar)
+        guardar_punto_control(punto_control, transaction.transaction_url, desde + len(urls),
+                              os.path.getsize(csv_filename) if os.path.exists(csv_filename) else None)
+
+        resumen['añadidos'] += añadidos
+        resumen['actualizados'] += actualizados
+        resumen['ventanas'] += 1
+        print(f"  · Ventana {resumen['ventanas']}: {len(urls)} resúmenes, "
+              f"{añadidos} días nuevos, {actualizados} actualizados.")
+
+    # Una única reescritura por ejecución (también si se reanudó una anterior que añadió filas)
+    if (resumen['añadidos'] or resumen['actualizados'] or inicio) and os.path.exists(csv_filename):
+        compactar_actividades(csv_filename)
+    transaction.commit()
+    if os.path.exists(punto_control):
+        os.remove(punto_control)
+    return resumen
+
+
+def backfill_usuario(accesslink, user_id, access_token, export_folder=EXPORT_FOLDER, ventana=VENTANA_POR_DEFECTO,
+                     puntuador=None):
+    """
+    Crea la transacción de actividad del usuario y la vuelca en su carpeta de exportación.
+    Con `puntuador` (un `PuntuadorContinuo`, ver puntuacion.py) los días escritos se le
+    entregan y al terminar se puntúan los que ya tienen las cuatro fuentes.
+    """
+    transaction = accesslink.daily_activity.create_transaction(user_id=user_id, access_token=access_token)
+    if not transaction:
+        print(f"ℹ Sin actividad nueva para el usuario {user_id}.")
+        return None
+    carpeta = os.path.join(export_folder, 'usuarios', str(user_id))
+    os.makedirs(carpeta, exist_ok=True)
+    al_guardar = (lambda filas: puntuador.añadir(user_id, 'actividad', filas)) if puntuador else None
+    resumen = backfill_actividad(transaction, os.path.join(carpeta, 'polar_daily_activities.csv'),
+                                 ventana=ventana, al_guardar=al_guardar)
+    if puntuador:
+        try:
+            puntuados = puntuador.puntuar()
+            if puntuados:
+                print(f"✓ {puntuados} días nuevos puntuados.")
+        except FileNotFoundError as e:
+            print(f"Aviso: No se pudo cargar el modelo de fragilidad ({e.filename}).")
+    return resumen
+
+
+if __name__ == "__main__":
+    from utils import load_config
+    from accesslink import AccessLink
+    from puntuacion import PuntuadorContinuo
+    from token_store import TokenStore
+
+    parser = argparse.ArgumentParser(description="Carga histórica de la actividad diaria por ventanas.")
+    parser.add_argument("--usuario", help="Id de usuario de Polar (por defecto, todos los del almacén de tokens).")
+    parser.add_argument("--ventana", type=int, default=VENTANA_POR_DEFECTO,
+                        help=f"Resúmenes por ventana (por defecto {VENTANA_POR_DEFECTO}).")
+    args = parser.parse_args()
+
+    config = load_config("config.yml")
+    accesslink = AccessLink(client_id=config['client_id'], client_secret=config['client_secret'])
+    tokens = TokenStore()
+    puntuador = PuntuadorContinuo()
+
+    usuarios = [tokens.get(args.usuario)] if args.usuario else list(tokens)
+    for token in usuarios:
+        if token is None or tokens.is_expired(token):
+            print("Token de acceso no encontrado o caducado. Autoriza de nuevo al usuario.")
+            continue
+        print(f"\n🔄 Usuario {token['user_id']}...")
+        try:
+            backfill_usuario(accesslink, token['user_id'], token['access_token'], ventana=args.ventana,
+                             puntuador=puntuador)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Error al contactar con la API de Polar: {e}")
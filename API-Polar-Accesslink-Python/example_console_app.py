@@ -2,16 +2,24 @@
 
 from __future__ import print_function
 
-from utils import load_config, save_config, pretty_print_json
+import os
+import sys
+
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import load_config, pretty_print_json
 from accesslink import AccessLink
+from token_store import TokenStore
+from fragilidad.instrumentacion import instrumentar
+# backfill, puntuacion y los módulos de 'fragilidad' que usan numpy/pandas se importan en
+# las opciones del menú que los necesitan, para que la aplicación arranque rápido
 
 #LIBRERÍAS ADICIONALES------------------------------------------------------------------------------------------------------------------
 import requests
 import csv
-from datetime import datetime
-import pandas as pd
-import os
-import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 #---------------------------------------------------------------------------------------------------------------------------------------
 
 try:
@@ -22,16 +30,28 @@ except NameError:
 
 CONFIG_FILENAME = "config.yml"
 
+# Descargas simultáneas de registros de información física
+PHYSICAL_INFO_WORKERS = 8
+
+
+def _or_blank(value):
+    """Empty CSV cell for fields missing from a typed record"""
+    return '' if value is None else value
+
 
 class PolarAccessLinkExample(object):
     """Example application for Polar Open AccessLink v3."""
 
     def __init__(self):
         self.config = load_config(CONFIG_FILENAME)
+        self.tokens = TokenStore()
 
-        if "access_token" not in self.config:
+        token = self.tokens.latest()
+        if token is None:
             print("Authorization is required. Run authorization.py first and complete the authentication process.")
             return
+        self.config["user_id"] = token["user_id"]
+        self.config["access_token"] = token["access_token"]
 
         self.accesslink = AccessLink(client_id=self.config["client_id"],
                                      client_secret=self.config["client_secret"])
@@ -39,6 +59,18 @@ class PolarAccessLinkExample(object):
         self.running = True
         self.show_menu()
 
+    @cached_property
+    def puntuador(self):
+        """Recibe los días que se exportan y puntúa la fragilidad de los que se completan"""
+        from puntuacion import PuntuadorContinuo
+        return PuntuadorContinuo()
+
+    @cached_property
+    def muestras(self):
+        """Muestras de los ejercicios en binario, para no tener que volver a descargarlas"""
+        from fragilidad.muestras import AlmacenMuestras
+        return AlmacenMuestras(os.path.join('archivos_exportados', 'usuarios'))
+
     def show_menu(self):
         while self.running:
             print("\nChoose an option:\n" +
@@ -63,8 +95,8 @@ class PolarAccessLinkExample(object):
 
     def print_data(self):
         exercise = self.accesslink.get_exercises(access_token=self.config["access_token"])
-        sleep = self.accesslink.get_sleep(access_token=self.config["access_token"])
-        recharge = self.accesslink.get_recharge(access_token=self.config["access_token"])
+        sleep = self.accesslink.get_sleep(access_token=self.config["access_token"], typed=True)
+        recharge = self.accesslink.get_recharge(access_token=self.config["access_token"], typed=True)
 
 
         # FRAGMENTO DE CÓDIGO AÑADIDO PARA EXPORTAR DATOS DEL SUEÑO----------------------------------------------------------------------
@@ -73,6 +105,8 @@ class PolarAccessLinkExample(object):
 
         if recharge:
             self.export_recharge_data(recharge)   # Nueva función para exportar recharge
+
+        self.score_new_days()
         #--------------------------------------------------------------------------------------------------------------------------------
 
         print("exercises: ", end = '')
@@ -91,6 +125,7 @@ class PolarAccessLinkExample(object):
         self.export_sleep_summary(sleep_data)
 
 
+    @instrumentar('exportacion', archivo='polar_sleep_summary.csv')
     def export_sleep_summary(self, sleep_data):
         export_folder = 'archivos_exportados'
         os.makedirs(export_folder, exist_ok=True)
@@ -109,20 +144,20 @@ class PolarAccessLinkExample(object):
         
         # Preparar datos nuevos para añadir
         new_rows = []
-        for night in sleep_data['nights']:
-            night_date = night.get('date', '')
+        for night in sleep_data['nights']:   # SleepNight (accesslink.models)
+            night_date = night.date
             if not night_date or night_date in existing_dates:
                 continue
                 
             new_rows.append({
                 'date': night_date,
-                'start_time': night.get('sleep_start_time', '').split('T')[1][:8] if night.get('sleep_start_time') else '',
-                'end_time': night.get('sleep_end_time', '').split('T')[1][:8] if night.get('sleep_end_time') else '',
-                'light_sleep_min': round(night.get('light_sleep', 0)/60, 1),
-                'deep_sleep_min': round(night.get('deep_sleep', 0)/60, 1),
-                'rem_sleep_min': round(night.get('rem_sleep', 0)/60, 1),
-                'sleep_score': night.get('sleep_score', ''),
-                'interruptions_min': round(night.get('total_interruption_duration', 0)/60, 1)
+                'start_time': night.sleep_start_time.split('T')[1][:8] if night.sleep_start_time else '',
+                'end_time': night.sleep_end_time.split('T')[1][:8] if night.sleep_end_time else '',
+                'light_sleep_min': round(night.light_sleep/60, 1),
+                'deep_sleep_min': round(night.deep_sleep/60, 1),
+                'rem_sleep_min': round(night.rem_sleep/60, 1),
+                'sleep_score': _or_blank(night.sleep_score),
+                'interruptions_min': round(night.total_interruption_duration/60, 1)
             })
             existing_dates.add(night_date)   # Para evitar duplicados en esta ejecución
         
@@ -142,6 +177,7 @@ class PolarAccessLinkExample(object):
                 writer.writerows(new_rows)
             
             print(f"\n✓ Añadidos {len(new_rows)} nuevos registros a {csv_filename}")
+            self.puntuador.añadir(self.config["user_id"], 'sueno', new_rows)
         else:
             print("\nℹ No se encontraron nuevos datos para añadir al resumen de sueño")
         
@@ -154,6 +190,7 @@ class PolarAccessLinkExample(object):
         # Exportar datos básicos del recharge
         self.export_recharge_summary(recharge_data)
 
+    @instrumentar('exportacion', archivo='polar_recharge_summary.csv')
     def export_recharge_summary(self, recharge_data):
         """Exporta el resumen de datos de recharge"""
         export_folder = 'archivos_exportados'
@@ -172,21 +209,21 @@ class PolarAccessLinkExample(object):
         
         # Preparar datos nuevos para añadir
         new_rows = []
-        for day in recharge_data['recharges']:
-            day_date = day.get('date', '')
+        for day in recharge_data['recharges']:   # NightlyRecharge (accesslink.models)
+            day_date = day.date
             if not day_date or day_date in existing_dates:
                 continue
                 
             new_rows.append({
                 'date': day_date,
-                'polar_user': str(day.get('polar_user', '')).split('/')[-1],
-                'heart_rate_avg': day.get('heart_rate_avg', ''),
-                'heart_rate_variability_avg': day.get('heart_rate_variability_avg', ''),
-                'nightly_recharge_status': day.get('nightly_recharge_status', ''),
-                'ans_charge': day.get('ans_charge', ''),
-                'ans_charge_status': day.get('ans_charge_status', ''),
-                'beat_to_beat_avg': day.get('beat_to_beat_avg', ''),
-                'breathing_rate_avg': day.get('breathing_rate_avg', '')
+                'polar_user': _or_blank(day.polar_user).split('/')[-1],
+                'heart_rate_avg': _or_blank(day.heart_rate_avg),
+                'heart_rate_variability_avg': _or_blank(day.heart_rate_variability_avg),
+                'nightly_recharge_status': _or_blank(day.nightly_recharge_status),
+                'ans_charge': _or_blank(day.ans_charge),
+                'ans_charge_status': _or_blank(day.ans_charge_status),
+                'beat_to_beat_avg': _or_blank(day.beat_to_beat_avg),
+                'breathing_rate_avg': _or_blank(day.breathing_rate_avg)
             })
             existing_dates.add(day_date)
         
@@ -206,15 +243,35 @@ class PolarAccessLinkExample(object):
                 writer.writerows(new_rows)
             
             print(f"\n✓ Añadidos {len(new_rows)} nuevos registros a {csv_filename}")
+            self.puntuador.añadir(self.config["user_id"], 'recarga', new_rows)
         else:
             print("\nℹ No se encontraron nuevos datos para añadir al resumen de recharge")
     #------------------------------------------------------------------------------------------------------------------------------------
 
+    def score_new_days(self):
+        """Puntúa los días que ya tienen actividad, sueño, recarga y temperatura (ver puntuacion.py)."""
+        user_id = self.config["user_id"]
+        if not self.puntuador.conoce_nacimiento(user_id):
+            try:
+                user_info = self.accesslink.users.get_information(user_id=user_id,
+                                                                  access_token=self.config["access_token"])
+                self.puntuador.registrar_nacimiento(user_id, user_info.get("birthdate"))
+            except requests.exceptions.RequestException as e:
+                print(f"Aviso: No se pudo obtener la fecha de nacimiento; la edad se imputará. Error: {e}")
+        try:
+            puntuados = self.puntuador.puntuar()
+        except FileNotFoundError as e:
+            print(f"Aviso: No se pudo cargar el modelo de fragilidad ({e.filename}).")
+            return
+        if puntuados:
+            print(f"\n✓ {puntuados} días nuevos puntuados en {self.puntuador.ruta_registro(user_id)}")
+
     def get_user_information(self):
         user_info = self.accesslink.users.get_information(user_id=self.config["user_id"],
                                                           access_token=self.config["access_token"])
         print("User information:")
         pretty_print_json(user_info)
+        self.puntuador.registrar_nacimiento(self.config["user_id"], user_info.get("birthdate"))
         
         # Call get_physical_info to export the physical data
         self.get_physical_info()
@@ -240,9 +297,9 @@ class PolarAccessLinkExample(object):
         self.accesslink.users.delete(user_id=self.config["user_id"],
                                      access_token=self.config["access_token"])
 
+        self.tokens.delete(self.config["user_id"])
         del self.config["access_token"]
         del self.config["user_id"]
-        save_config(self.config, CONFIG_FILENAME)
 
         print("Access token was successfully revoked.")
 
@@ -252,6 +309,9 @@ class PolarAccessLinkExample(object):
         self.running = False
 
     def get_exercises(self):
+        from fragilidad.ejercicios import serie_ejercicio
+        from fragilidad.recorridos import caracteristicas_recorrido, leer_tcx
+
         transaction = self.accesslink.training_data.create_transaction(user_id=self.config["user_id"],
                                                                         access_token=self.config["access_token"])
         if not transaction:
@@ -259,6 +319,7 @@ class PolarAccessLinkExample(object):
             return
 
         resource_urls = transaction.list_exercises()["exercises"]
+        ejercicios = []
 
         for url in resource_urls:
             exercise_summary = transaction.get_exercise_summary(url)
@@ -266,29 +327,57 @@ class PolarAccessLinkExample(object):
             print("Exercise summary:")
             pretty_print_json(exercise_summary)
 
+            # Las muestras solo se pueden descargar mientras la transacción está abierta
+            sample_urls = (transaction.get_available_samples(url) or {}).get("samples", [])
+            samples = [transaction.get_samples(sample_url) for sample_url in sample_urls]
+            guardadas = self.muestras.guardar_ejercicio(self.config["user_id"], exercise_summary, samples)
+            if guardadas:
+                print(f"✓ Muestras guardadas: {', '.join(guardadas)}")
+            ejercicio = serie_ejercicio(exercise_summary, samples)
+            # El recorrido (TCX) se analiza mientras se descarga, sin guardar el XML entero
+            if exercise_summary.get("has-route"):
+                tcx = transaction.get_tcx(url, stream=True)
+                if tcx is not None:
+                    ejercicio["recorrido"] = caracteristicas_recorrido(leer_tcx(tcx))
+            ejercicios.append(ejercicio)
+
         transaction.commit()
+        self.export_exercise_analytics(ejercicios)
 
-     # FUNCIÓN NUEVA PARA CONVERTIR LA FECHA--------------------------------------------------------------------------------------------------
-    def parse_iso_duration_to_minutes(self, duration_str):
-        """
-        Convierte una duración en formato ISO 8601 (ej. "PT8H11M") a minutos totales.
-        """
-        if not isinstance(duration_str, str) or not duration_str.startswith('PT'):
-            return 0.0
+    def export_exercise_analytics(self, ejercicios):
+        """HRV, TRIMP, zonas y recuperación de todos los ejercicios de la transacción, en un solo lote."""
+        if not ejercicios:
+            return
+        from fragilidad.ejercicios import EJERCICIOS_FILENAME, analizar_ejercicios, guardar_ejercicios
+        from fragilidad.perfil_fisico import PERFIL_FILENAME, leer_perfiles
 
-        hours_match = re.search(r'(\d+)H', duration_str)
-        minutes_match = re.search(r'(\d+)M', duration_str)
-        
-        hours = int(hours_match.group(1)) if hours_match else 0
-        minutes = int(minutes_match.group(1)) if minutes_match else 0
-        
-        total_minutes = (hours * 60) + minutes
-        return total_minutes
-    #---------------------------------------------------------------------------------------------------------------------------------------
+        export_folder = 'archivos_exportados'
+        os.makedirs(export_folder, exist_ok=True)
+
+        # FC de reposo y máxima del último perfil físico exportado, y sexo para el TRIMP
+        fc_reposo = fc_max = sexo = None
+        perfil_csv = os.path.join(export_folder, PERFIL_FILENAME)
+        if os.path.exists(perfil_csv):
+            perfiles = leer_perfiles(perfil_csv)
+            if not perfiles.empty:
+                fc_reposo = perfiles['resting-heart-rate'].iloc[-1]
+                fc_max = perfiles['maximum-heart-rate'].iloc[-1]
+        try:
+            sexo = self.accesslink.users.get_information(user_id=self.config["user_id"],
+                                                         access_token=self.config["access_token"]).get("gender")
+        except requests.exceptions.RequestException as e:
+            print(f"Aviso: No se pudo obtener el sexo del usuario para el TRIMP ({e}).")
 
+        df = analizar_ejercicios(ejercicios, fc_reposo=fc_reposo, fc_max=fc_max, sexo=sexo)
+        csv_filename = os.path.join(export_folder, EJERCICIOS_FILENAME)
+        nuevos = guardar_ejercicios(df, csv_filename)
+        print(f"✓ {nuevos} ejercicios analizados guardados en {csv_filename}")
 
     # FUNCIÓN MODIFICADA PARA EXPORTAR LA ACTIVIDAD FÍSICA DIARIA CON EL VALOR MÁXIMO
+    @instrumentar('exportacion', archivo='polar_daily_activities.csv')
     def get_daily_activity(self):
+        from backfill import backfill_actividad
+
         try:
             transaction = self.accesslink.daily_activity.create_transaction(
                 user_id=self.config["user_id"],
@@ -301,117 +390,51 @@ class PolarAccessLinkExample(object):
             print("No new daily activity available.")
             return
         
-        resource_urls = transaction.list_activities().get("activity-log", [])
-        if not resource_urls:
-            print("No activity log URLs found in the transaction.")
-            transaction.commit()
-            return
-
-        # --- PASO 1: Agrupar datos de la API por día y quedarse con el máximo 'active-steps' ---
-        api_daily_max = {}
-        print("Fetching data from Polar API...")
-        for url in resource_urls:
-            summary = transaction.get_activity_summary(url)
-            date = summary.get('date')
-            if not date:
-                continue
-            
-            current_steps = summary.get('active-steps', 0) or 0
-            
-            # Si la fecha no está registrada o los pasos del registro actual son mayores, se guarda.
-            if date not in api_daily_max or current_steps > api_daily_max[date].get('active-steps', 0):
-                api_daily_max[date] = summary
-
-        # --- PASO 2: Leer los datos existentes del CSV ---
+        # Los resúmenes se procesan por ventanas: cada una se reduce al máximo de 'active-steps'
+        # por día y se fusiona con el CSV, con un punto de control para poder reanudar.
         export_folder = 'archivos_exportados'
         os.makedirs(export_folder, exist_ok=True)
         csv_filename = os.path.join(export_folder, "polar_daily_activities.csv")
-        
-        fieldnames = [
-            'id', 'date', 'active-steps', 'active-calories', 'calories',
-            'duration_minutes', 'steps_per_minute', 'calories_per_step',
-            'active_calories_per_minute'
-        ]
-        
-        existing_data = {}
-        if os.path.exists(csv_filename):
-            try:
-                with open(csv_filename, mode='r', newline='', encoding='utf-8') as csv_file:
-                    reader = csv.DictReader(csv_file)
-                    for row in reader:
-                        # Se convierte 'active-steps' a entero para una comparación numérica correcta
-                        row['active-steps'] = int(row.get('active-steps', 0))
-                        existing_data[row['date']] = row
-            except (IOError, KeyError) as e:
-                print(f"Aviso: No se pudo leer el archivo CSV existente. Se creará de nuevo. Error: {e}")
-
-        # --- PASO 3: Comparar y decidir qué datos actualizar o añadir ---
-        updates_found = 0
-        additions_found = 0
-
-        for date, summary in api_daily_max.items():
-            new_steps = summary.get('active-steps', 0) or 0
-            
-            # Comprobar si la fecha ya existe o si los nuevos pasos son mayores
-            if date not in existing_data or new_steps > existing_data[date]['active-steps']:
-                # Procesar y calcular las métricas solo para los datos que se van a añadir/actualizar
-                duration_minutes = self.parse_iso_duration_to_minutes(summary.get('duration', 'PT0M'))
-                steps_per_minute = (new_steps / duration_minutes) if duration_minutes > 0 else 0
-                total_calories = summary.get('calories', 0) or 0
-                active_calories = summary.get('active-calories', 0) or 0
-                calories_per_step = (total_calories / new_steps) if new_steps > 0 else 0
-                active_calories_per_minute = (active_calories / duration_minutes) if duration_minutes > 0 else 0
-                
-                # Crear la nueva fila
-                processed_row = {
-                    'id': summary.get('id'),
-                    'date': date,
-                    'active-steps': new_steps,
-                    'active-calories': active_calories,
-                    'calories': total_calories,
-                    'duration_minutes': round(duration_minutes, 2),
-                    'steps_per_minute': round(steps_per_minute, 2),
-                    'calories_per_step': round(calories_per_step, 4),
-                    'active_calories_per_minute': round(active_calories_per_minute, 2)
-                }
-                
-                if date in existing_data:
-                    updates_found += 1
-                else:
-                    additions_found += 1
 
-                # Añadir/actualizar el registro en nuestro diccionario de datos
-                existing_data[date] = processed_row
-                
-        # --- PASO 4: Reescribir el archivo CSV con todos los datos actualizados ---
-        if updates_found > 0 or additions_found > 0:
-            # Ordenar los datos por fecha antes de escribirlos
-            sorted_data = sorted(existing_data.values(), key=lambda x: x['date'])
-            
-            with open(csv_filename, mode='w', newline='', encoding='utf-8') as csv_file:
-                writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(sorted_data)
-            
+        print("Fetching data from Polar API...")
+        user_id = self.config["user_id"]
+        resumen = backfill_actividad(transaction, csv_filename,
+                                     al_guardar=lambda filas: self.puntuador.añadir(user_id, 'actividad', filas))
+
+        if resumen['añadidos'] or resumen['actualizados']:
             print(f"\n✓ Proceso completado. Resumen:")
-            print(f"  - {additions_found} días nuevos añadidos.")
-            print(f"  - {updates_found} días existentes actualizados con valores más altos.")
+            print(f"  - {resumen['añadidos']} días nuevos añadidos.")
+            print(f"  - {resumen['actualizados']} días existentes actualizados con valores más altos.")
             print(f"  - Archivo guardado en: {csv_filename}")
         else:
             print("\nℹ No se encontraron actividades nuevas o con valores superiores para exportar.")
-
-        transaction.commit()
+        self.score_new_days()
 
     #------------------------------------------------------------------------------------------------------------------------------------
 
     #FUNCIÓN MODIFICADA PARA EXPORTAR LA INFORMACIÓN FÍSICA DEL USUARIO QUE PORTA EL SMARTWATCH -----------------------------------------
+    @instrumentar('exportacion', archivo='polar_physical_info.csv')
     def get_physical_info(self):
+        from fragilidad.perfil_fisico import PERFIL_FILENAME, guardar_perfiles
+
         transaction = self.accesslink.physical_info.create_transaction(user_id=self.config["user_id"],
                                                                         access_token=self.config["access_token"])
         if not transaction:
             print("No new physical information available.")
             return
 
+        # Se descargan todos los registros de la transacción en paralelo y se guardan
+        # antes de confirmarla (al confirmar, Polar ya no los vuelve a ofrecer).
+        resource_urls = transaction.list_physical_infos().get("physical-informations", [])
+        with ThreadPoolExecutor(max_workers=PHYSICAL_INFO_WORKERS) as executor:
+            registros = list(executor.map(transaction.get_physical_info, resource_urls))
+
+        export_folder = 'archivos_exportados'
+        os.makedirs(export_folder, exist_ok=True)
+        csv_filename = os.path.join(export_folder, PERFIL_FILENAME)
+        nuevos = guardar_perfiles(registros, csv_filename)
+        print(f"\n✓ {nuevos} registros de información física nuevos guardados en {csv_filename}")
+
         transaction.commit()
     #-----------------------------------------------------------------------------------------------------------------------------------
 
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+from __future__ import print_function
+
+import logging
+import math
+import os
+import threading
+
+from flask import Flask, request, redirect, render_template, url_for
+
+from utils import load_config
+from authorization_callback_server import (CALLBACK_ENDPOINT, CALLBACK_PORT, CONFIG_FILENAME, REDIRECT_URL,
+                                           get_accesslink, get_onboarding, get_snapshots, get_tokens)
+import snapshot_store
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two refreshes of the same user's snapshot.
+REFRESH_INTERVAL = int(os.environ.get("DASHBOARD_REFRESH_INTERVAL", 15 * 60))
+
+USERS_PER_PAGE = 10
+MAX_USERS_PER_PAGE = 50
+
+config = load_config(CONFIG_FILENAME)
+
+# Same client, stores and onboarding as authorization_callback_server.py: a user linked
+# here gets the same first sync (snapshot and activity history) as one linked there.
+accesslink = get_accesslink()
+
+
+app = Flask(__name__)
+
+tokens = get_tokens()
+snapshots = get_snapshots()
+
+
+def refresh_user(user_id, access_token):
+    snapshot_store.refresh_user(accesslink, snapshots, user_id, access_token)
+
+
+onboarding = get_onboarding()
+
+
+def refresh_stale_snapshots():
+    """Refresh the stale snapshots and score the days they complete, all users in one batch."""
+    puntuador = None
+    for token in tokens:
+        if tokens.is_expired(token):
+            continue
+        age = snapshots.age(token["user_id"])
+        if age is None or age >= REFRESH_INTERVAL:
+            try:
+                refresh_user(token["user_id"], token["access_token"])
+                snapshot = snapshots.load(token["user_id"])
+                if snapshot:
+                    if puntuador is None:
+                        # Imported and built on first use; a new scorer per pass reads the
+                        # state that the exporters and first syncs may have written meanwhile.
+                        from puntuacion import PuntuadorContinuo
+                        puntuador = PuntuadorContinuo()
+                    puntuador.añadir_snapshot(token["user_id"], snapshot)
+            except Exception:
+                # refresh_user only handles AccessLink errors; anything else (a decode or
+                # database error) is logged so one user cannot stop the refresher thread.
+                logger.exception("Refresh of user %s failed", token["user_id"])
+    if puntuador is not None:
+        try:
+            puntuador.puntuar()
+        except Exception:
+            logger.exception("Scoring the refreshed days failed")
+
+
+def refresher(stop_event):
+    """Background loop that keeps every user's snapshot younger than REFRESH_INTERVAL."""
+    while not stop_event.is_set():
+        refresh_stale_snapshots()
+        stop_event.wait(min(REFRESH_INTERVAL, 60))
+
+
+def start_refresher():
+    stop_event = threading.Event()
+    thread = threading.Thread(target=refresher, args=(stop_event,), daemon=True)
+    thread.start()
+    return stop_event
+
+
+def page_arguments():
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = request.args.get("per_page", USERS_PER_PAGE, type=int)
+    return page, min(max(per_page, 1), MAX_USERS_PER_PAGE)
+
+
+@app.route("/")
+def index():
+    return render_template("index.html",
+                           userid=config["client_id"],
+                           redirect_url=REDIRECT_URL,
+                           status=request.args.get("status"),
+                           error=request.args.get("error"))
+
+
+@app.route(CALLBACK_ENDPOINT)
+def callback():
+    """Callback for OAuth2 authorization request
+
+    Queues the code for the onboarding workers, which save the token,
+    register the user and build the user's first snapshot.
+    """
+    authorization_code = request.args.get("code")
+    if not authorization_code:
+        return redirect(url_for("index", status="error", error=request.args.get("error", "no code received")))
+
+    onboarding.submit(authorization_code)
+    return redirect("/?status=pending")
+
+
+@app.route("/data")
+def data():
+    """Render one page of users from their stored snapshots."""
+    page, per_page = page_arguments()
+    total = tokens.count()
+    pages = max(math.ceil(total / per_page), 1)
+    page = min(page, pages)
+
+    alldata = []
+    for token in tokens.page((page - 1) * per_page, per_page):
+        snapshot = snapshots.load(token["user_id"]) or {"user_id": token["user_id"]}
+        snapshot.setdefault("userdata", {})
+        alldata.append(snapshot)
+
+    return render_template("data.html", alldata=alldata, page=page, pages=pages,
+                           per_page=per_page, total=total)
+
+
+def main():
+    onboarding.start()
+    start_refresher()
+    print("Navigate to http://localhost:{port}/ for authorization.\n".format(port=CALLBACK_PORT))
+    app.run(host='localhost', port=CALLBACK_PORT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""Background onboarding of users who have just authorized the client.
+
+The OAuth2 callback only queues the authorization code and returns. Worker
+threads exchange the code for a token, save it in the token store, register
+the user (409 Conflict means already registered) and queue the user's first
+sync, which runs on its own worker so slow syncs never delay new authorizations.
+"""
+
+import logging
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+ONBOARDING_WORKERS = 8
+SYNC_WORKERS = 2
+
+# Number of finished onboarding jobs whose status is remembered.
+MAX_JOBS = 10000
+
+
+class Onboarding(object):
+    """Token exchange, registration and first sync of new users.
+
+    :param accesslink: AccessLink client.
+    :param tokens: TokenStore where the tokens are saved.
+    :param first_sync: callable(user_id, access_token) run once per new user.
+    """
+
+    def __init__(self, accesslink, tokens, first_sync=None,
+                 workers=ONBOARDING_WORKERS, sync_workers=SYNC_WORKERS):
+        self.accesslink = accesslink
+        self.tokens = tokens
+        self.first_sync = first_sync
+        self.sync_workers = sync_workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onboarding")
+        self.sync_queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Start the first-sync workers (once)."""
+        if self._started or self.first_sync is None:
+            return
+        self._started = True
+        for number in range(self.sync_workers):
+            threading.Thread(target=self._sync_worker, name="first-sync-{}".format(number),
+                             daemon=True).start()
+
+    def submit(self, authorization_code):
+        """Queue an authorization code and return the id of its onboarding job."""
+        job_id = uuid.uuid4().hex
+        self._set_status(job_id, state="pending")
+        self.executor.submit(self._onboard, job_id, authorization_code)
+        return job_id
+
+    def status(self, job_id):
+        with self._lock:
+            status = self._jobs.get(job_id)
+            return dict(status) if status is not None else None
+
+    def _set_status(self, job_id, **status):
+        with self._lock:
+            self._jobs.setdefault(job_id, {}).update(status)
+            self._jobs.move_to_end(job_id)
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+
+    def _onboard(self, job_id, authorization_code):
+        try:
+            #
+            # The authorization code is only valid for 10 minutes, so the token
+            # is fetched as soon as a worker is free.
+            #
+            token_response = self.accesslink.get_access_token(authorization_code)
+            user_id = token_response["x_user_id"]
+            access_token = token_response["access_token"]
+            self.tokens.upsert(user_id, access_token,
+                               expires_in=token_response.get("expires_in"),
+                               token_type=token_response.get("token_type"))
+            self._set_status(job_id, state="authorized", user_id=user_id)
+
+            try:
+                self.accesslink.users.register(access_token=access_token, member_id=str(user_id))
+            except requests.exceptions.HTTPError as err:
+                # Error 409 Conflict means that the user has already been registered for this client.
+                if err.response is None or err.response.status_code != 409:
+                    raise
+
+            if self.first_sync is not None:
+                self._set_status(job_id, state="syncing")
+                self.sync_queue.put((job_id, user_id, access_token))
+            else:
+                self._set_status(job_id, state="done")
+        except Exception as err:
+            logger.exception("Onboarding job %s failed", job_id)
+            self._set_status(job_id, state="failed", error=str(err))
+
+    def _sync_worker(self):
+        while True:
+            job_id, user_id, access_token = self.sync_queue.get()
+            try:
+                self.first_sync(user_id, access_token)
+                self._set_status(job_id, state="done")
+            except Exception as err:
+                logger.exception("First sync of user %s failed", user_id)
+                self._set_status(job_id, state="sync_failed", error=str(err))
+            finally:
+                self.sync_queue.task_done()
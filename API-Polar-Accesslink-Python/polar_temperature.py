@@ -1,79 +1,27 @@
 # polar_temperature.py
 import requests
-import yaml
 import json
 import argparse
 from datetime import datetime, timedelta
-from flask import Flask, request, redirect
-import pandas as pd
 import os
+import sys
+
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fragilidad.instrumentacion import instrumentar
+from token_store import TokenStore
+# pandas, fragilidad.muestras y puntuacion solo se importan en 'export': 'fetch' no los necesita
 
 # --- CONFIGURACIÓN GLOBAL ---
-CONFIG_FILENAME = "config.yml"
-CALLBACK_PORT = 5000
-CALLBACK_ENDPOINT = "/oauth2_callback"
-REDIRECT_URL = f"http://localhost:{CALLBACK_PORT}{CALLBACK_ENDPOINT}"
 EXPORT_FOLDER = "archivos_exportados"
 
-# --- LÓGICA DE AUTORIZACIÓN (OAuth2 con Flask) ---
-# (Esta sección no cambia)
-app = Flask(__name__)
-
-def load_config():
-    try:
-        with open(CONFIG_FILENAME, 'r') as f:
-            return yaml.safe_load(f)
-    except FileNotFoundError:
-        print(f"Error: El archivo '{CONFIG_FILENAME}' no fue encontrado.")
-        return None
-
-def save_config(config):
-    with open(CONFIG_FILENAME, 'w') as f:
-        yaml.dump(config, f)
-
-@app.route("/")
-def authorize():
-    config = load_config()
-    auth_url = (f"https://flow.polar.com/oauth2/authorization?"
-                f"response_type=code&client_id={config['client_id']}"
-                f"&scope=accesslink.read_all&redirect_uri={REDIRECT_URL}")
-    return redirect(auth_url)
-
-@app.route(CALLBACK_ENDPOINT)
-def callback():
-    config = load_config()
-    authorization_code = request.args.get("code")
-    token_url = "https://polarremote.com/v2/oauth2/token"
-    token_data = {"grant_type": "authorization_code", "code": authorization_code, "redirect_uri": REDIRECT_URL}
-    token_auth = (config['client_id'], config['client_secret'])
-    
-    try:
-        token_response = requests.post(token_url, data=token_data, auth=token_auth)
-        token_response.raise_for_status()
-        json_response = token_response.json()
-        config["access_token"] = json_response["access_token"]
-        config["user_id"] = token_response.headers.get("x-user-id")
-        save_config(config)
-
-        register_url = "https://www.polaraccesslink.com/v3/users"
-        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {config['access_token']}"}
-        body = {"member-id": str(config["user_id"])}
-        reg_response = requests.post(register_url, headers=headers, json=body) 
-        
-        if reg_response.status_code != 409:
-            reg_response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        error_text = f"Error durante la obtención del token: {e}"
-        if e.response: error_text += f" | Detalles: {e.response.text}"
-        return error_text, 500
-
-    shutdown_func = request.environ.get('werkzeug.server.shutdown')
-    if shutdown_func: shutdown_func()
-    return "¡Autorización completada! Ahora puedes usar los comandos 'fetch' o 'export'."
+# --- AUTORIZACIÓN ---
+# La gestiona el servicio común authorization_callback_server.py, que guarda el token
+# de cada usuario en el almacén de tokens (TokenStore) y sigue activo para autorizar a más usuarios.
 
 def run_auth_server():
-    print(f"Para autorizar, abre tu navegador y ve a: http://localhost:{CALLBACK_PORT}/")
-    app.run(host='localhost', port=CALLBACK_PORT)
+    import authorization_callback_server
+    authorization_callback_server.main()
 
 # --- CLASE CLIENTE (No cambia) ---
 class PolarApiClient:
@@ -96,36 +44,33 @@ class PolarApiClient:
 
 # --- FUNCIÓN DE EXPORTACIÓN MODIFICADA PARA CALCULAR ESTADÍSTICAS ---
 
-def export_body_temp_to_csv(data, filename):
+@instrumentar('exportacion', archivo='body_temperature_summary.csv')
+def export_body_temp_to_csv(data, filename, almacen=None, user_id=None):
     """
     Procesa los datos de temperatura, calcula estadísticas por día
-    y los guarda en un CSV.
+    y los guarda en un CSV. Devuelve las estadísticas diarias (o None si no hay datos).
+    Con `almacen` (fragilidad.muestras), las muestras de cada medición se guardan también
+    en binario para el usuario `user_id`.
     """
     if not data:
         print("No hay datos de temperatura corporal para exportar.")
         return
-    
+    import pandas as pd
+    from fragilidad.muestras import muestras_temperatura
+
     daily_stats = []
     for measurement in data:
         samples = measurement.get('samples', [])
         if not samples:
             continue
+        if almacen is not None:
+            almacen.guardar_temperatura(user_id, measurement)
 
-        df = pd.DataFrame(samples)
-        temp_series = df['temperature_celsius']
+        # Valores y desfases en una sola pasada (sin desfase, como la primera muestra, cuenta 0)
+        valores, desfases = muestras_temperatura(measurement)
+        temp_series = pd.Series(valores)
         mean_temp = temp_series.mean()
-        
-        # --- INICIO DE LA CORRECCIÓN ---
-        # Comprueba si la columna de duración existe antes de usarla.
-        if 'recordingTimeDeltaMilliseconds' in df.columns:
-            # Si existe, se ua para calcular la duración.
-            # Rellena el NaN de la primera fila con 0.
-            df['recordingTimeDeltaMilliseconds'] = df['recordingTimeDeltaMilliseconds'].fillna(0)
-            duration_ms = df['recordingTimeDeltaMilliseconds'].astype(float).max()
-        else:
-            # Si no existe (porque solo hay una muestra), la duración es 0.
-            duration_ms = 0
-        # --- FIN DE LA CORRECCIÓN ---
+        duration_ms = float(desfases.max())
 
         stats = {
             'date': measurement.get('start_time', '')[:10],
@@ -136,7 +81,7 @@ def export_body_temp_to_csv(data, filename):
             'temp_deviation_mean': (temp_series - mean_temp).mean(),
             'temp_deviation_max': (temp_series - mean_temp).max(),
             'temp_amplitude': temp_series.max() - temp_series.min(),
-            'num_samples': len(df),
+            'num_samples': len(valores),
             'duration_hours': duration_ms / (1000 * 60 * 60)
         }
         daily_stats.append(stats)
@@ -148,6 +93,7 @@ def export_body_temp_to_csv(data, filename):
     final_df = pd.DataFrame(daily_stats)
     final_df.to_csv(filename, sep=',', index=False, encoding='utf-8-sig', float_format='%.4f')
     print(f"✓ Estadísticas de temperatura corporal exportadas a '{filename}'")
+    return final_df
 
 # --- FUNCIÓN DE VISUALIZACIÓN CORREGIDA ---
 
@@ -179,15 +125,15 @@ def process_and_display_body_temp(data):
     print("\n--- Resumen Estadístico de Temperatura Corporal ---")
     for measurement in data:
         samples = measurement.get('samples', [])
-        if samples:
-            df = pd.DataFrame(samples)
-            temp_series = df['temperatureCelsius']
+        # Sin pandas: 'fetch' solo muestra unas pocas cifras por medición
+        temps = [s['temperatureCelsius'] for s in samples if s.get('temperatureCelsius') is not None]
+        if temps:
             date_str = measurement.get('start_time', 'N/A')[:10]
             
             print(f"\nFecha: {date_str}")
-            print(f"  ├─ Temp. Media: {temp_series.mean():.2f}°C")
-            print(f"  ├─ Temp. Máx/Mín: {temp_series.max():.2f}°C / {temp_series.min():.2f}°C")
-            print(f"  └─ Nº Muestras: {len(df)}")
+            print(f"  ├─ Temp. Media: {sum(temps) / len(temps):.2f}°C")
+            print(f"  ├─ Temp. Máx/Mín: {max(temps):.2f}°C / {min(temps):.2f}°C")
+            print(f"  └─ Nº Muestras: {len(samples)}")
 
 # --- FUNCIÓN PRINCIPAL (No cambia) ---
 if __name__ == "__main__":
@@ -201,11 +147,11 @@ if __name__ == "__main__":
         run_auth_server()
     
     elif args.command == 'fetch' or args.command == 'export':
-        config = load_config()
-        if not config or "access_token" not in config:
+        token = TokenStore().latest()
+        if token is None:
             print("Token de acceso no encontrado. Ejecuta primero el comando 'auth'.")
         else:
-            client = PolarApiClient(access_token=config["access_token"])
+            client = PolarApiClient(access_token=token["access_token"])
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=28)
             
@@ -218,9 +164,25 @@ if __name__ == "__main__":
                     process_and_display_body_temp(body_temp_data)
                 
                 elif args.command == 'export':
+                    from fragilidad.muestras import AlmacenMuestras
+                    from puntuacion import PuntuadorContinuo
+
                     os.makedirs(EXPORT_FOLDER, exist_ok=True)
                     output_file = os.path.join(EXPORT_FOLDER, 'body_temperature_summary.csv')
-                    export_body_temp_to_csv(body_temp_data, output_file)
+                    almacen = AlmacenMuestras(os.path.join(EXPORT_FOLDER, 'usuarios'))
+                    final_df = export_body_temp_to_csv(body_temp_data, output_file,
+                                                       almacen=almacen, user_id=token["user_id"])
+
+                    # Los días que ya tienen actividad, sueño y recarga se puntúan ahora (puntuacion.py)
+                    if final_df is not None:
+                        puntuador = PuntuadorContinuo(export_folder=EXPORT_FOLDER)
+                        puntuador.añadir(token["user_id"], 'temperatura', final_df.to_dict('records'))
+                        try:
+                            puntuados = puntuador.puntuar()
+                            if puntuados:
+                                print(f"✓ {puntuados} días nuevos puntuados.")
+                        except FileNotFoundError as e:
+                            print(f"Aviso: No se pudo cargar el modelo de fragilidad ({e.filename}).")
 
             except requests.exceptions.RequestException as e:
                 print(f"\nError al contactar con la API de Polar: {e}")
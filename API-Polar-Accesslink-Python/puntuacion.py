@@ -0,0 +1,319 @@
+# puntuacion.py
+"""
+Puntuación continua de la fragilidad a medida que se sincronizan días nuevos.
+
+Cada exportación (actividad, sueño, recarga y temperatura) entrega al puntuador las filas
+que acaba de escribir. Cuando un día tiene las cuatro fuentes y ya ha terminado (la
+actividad de hoy aún puede crecer), se une, se imputa con las medianas del entrenamiento
+y se puntúa con 'fragility_pipeline.joblib' o, si está exportado, con su versión ONNX
+(fragilidad/inferencia.py). Los días listos de todos los usuarios se predicen juntos en un
+único `predict_proba` (micro-lote) y se añaden al registro del usuario en
+'archivos_exportados/usuarios/<id>/predicciones_fragilidad.csv'.
+
+Cada usuario guarda un pequeño estado ('puntuacion_estado.pkl'): los días pendientes, el
+último día puntuado y las ventanas de `fragilidad.temporales`. Así cada día se puntúa una
+sola vez y nunca se vuelve a leer ni a predecir el historial.
+
+Varios puntuadores pueden trabajar a la vez sobre la misma carpeta (los hilos de alta de
+usuarios, el refresco del panel web y los exportadores de cron, que son otros procesos).
+Cada cambio del estado de un usuario (leer, añadir o puntuar, añadir al registro y guardar)
+se hace con un bloqueo de fichero ('puntuacion_estado.pkl.lock') y sobre el estado recién
+leído del disco, no sobre una copia cargada antes por este puntuador.
+
+Uso:
+    puntuador = PuntuadorContinuo()
+    puntuador.añadir(user_id, 'sueno', filas_nuevas)
+    puntuador.puntuar()
+"""
+import csv
+import os
+import pickle
+import sys
+from contextlib import ExitStack, contextmanager
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_DIR)
+from fragilidad.imputacion import ESTADISTICAS_FILENAME, cargar_estadisticas, imputar
+from fragilidad.inferencia import cargar_modelo, columnas_modelo
+from fragilidad.instrumentacion import incrementar, medir
+from fragilidad.temporales import COLUMNAS_TEMPORALES, HistorialTemporal
+
+EXPORT_FOLDER = 'archivos_exportados'
+
+# El modelo y las estadísticas que usa la Interfaz
+PIPELINE_FILE = os.path.join(REPO_DIR, 'Interfaz', 'fragility_pipeline.joblib')
+STATS_FILE = os.path.join(REPO_DIR, 'Interfaz', ESTADISTICAS_FILENAME)
+
+LOG_FILENAME = 'predicciones_fragilidad.csv'
+ESTADO_FILENAME = 'puntuacion_estado.pkl'
+BLOQUEO_FILENAME = ESTADO_FILENAME + '.lock'
+
+# Columnas que aporta cada exportación al día unido
+COLUMNAS_FUENTE = {
+    'actividad': ['active-steps', 'active-calories', 'calories', 'duration_minutes'],
+    'sueno': ['sleep_score', 'light_sleep_min', 'deep_sleep_min', 'rem_sleep_min', 'interruptions_min'],
+    'recarga': ['heart_rate_avg', 'heart_rate_variability_avg', 'ans_charge', 'breathing_rate_avg'],
+    'temperatura': ['temp_mean', 'temp_std', 'temp_amplitude'],
+}
+
+ETIQUETAS = {0: 'Frágil', 1: 'Pre-frágil', 2: 'Robusto'}
+
+CAMPOS_LOG = ['date', 'predicted_frailty'] + [f'prob_{nombre}' for nombre in ETIQUETAS.values()]
+
+
+def _numero(valor):
+    """Valor numérico de un campo exportado ('' o texto no numérico cuentan como nulos)."""
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _minutos(segundos):
+    return round(segundos / 60, 1) if isinstance(segundos, (int, float)) else None
+
+
+def filas_sueno(nights):
+    """Filas de 'sueno' a partir de las noches de AccessLink (dicts de /users/sleep, duraciones en segundos)."""
+    return [{
+        'date': night.get('date'),
+        'light_sleep_min': _minutos(night.get('light_sleep')),
+        'deep_sleep_min': _minutos(night.get('deep_sleep')),
+        'rem_sleep_min': _minutos(night.get('rem_sleep')),
+        'sleep_score': night.get('sleep_score'),
+        'interruptions_min': _minutos(night.get('total_interruption_duration')),
+    } for night in nights]
+
+
+def calcular_edad(fecha_nacimiento, fecha):
+    if not fecha_nacimiento:
+        return np.nan
+    nacimiento, dia = pd.Timestamp(fecha_nacimiento), pd.Timestamp(fecha)
+    return dia.year - nacimiento.year - ((dia.month, dia.day) < (nacimiento.month, nacimiento.day))
+
+
+class PuntuadorContinuo:
+    """Acumula los días exportados de cada usuario y puntúa los que se completan."""
+
+    def __init__(self, export_folder=EXPORT_FOLDER, pipeline_file=PIPELINE_FILE, stats_file=STATS_FILE):
+        self.export_folder = export_folder
+        self.pipeline_file = pipeline_file
+        self.stats_file = stats_file
+        self.estados = {}
+        self._pipeline = None
+        self._valores = None
+
+    # --- Estado por usuario ---
+
+    def _carpeta(self, user_id):
+        return os.path.join(self.export_folder, 'usuarios', str(user_id))
+
+    def ruta_registro(self, user_id):
+        """CSV con las predicciones del usuario, un día por fila."""
+        return os.path.join(self._carpeta(user_id), LOG_FILENAME)
+
+    @contextmanager
+    def _bloqueo(self, user_id):
+        """Acceso exclusivo al estado del usuario, entre hilos y entre procesos."""
+        carpeta = self._carpeta(user_id)
+        os.makedirs(carpeta, exist_ok=True)
+        with open(os.path.join(carpeta, BLOQUEO_FILENAME), 'w') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:   # LK_LOCK se rinde tras 10 s
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _leer_estado(self, user_id):
+        """Estado guardado del usuario, leído de nuevo del disco (llamar con `_bloqueo`)."""
+        user_id = str(user_id)
+        try:
+            with open(os.path.join(self._carpeta(user_id), ESTADO_FILENAME), 'rb') as f:
+                self.estados[user_id] = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.estados[user_id] = {
+                'pendientes': {},
+                'ultima': None,
+                'fecha_nacimiento': None,
+                'historial': HistorialTemporal(),
+            }
+        return self.estados[user_id]
+
+    def _estado(self, user_id):
+        """Último estado leído del usuario (solo para consultas; los cambios usan `_leer_estado`)."""
+        user_id = str(user_id)
+        if user_id not in self.estados:
+            with self._bloqueo(user_id):
+                return self._leer_estado(user_id)
+        return self.estados[user_id]
+
+    def _guardar_estado(self, user_id):
+        carpeta = self._carpeta(user_id)
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, ESTADO_FILENAME)
+        with open(ruta + '.tmp', 'wb') as f:
+            pickle.dump(self.estados[str(user_id)], f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(ruta + '.tmp', ruta)
+
+    def conoce_nacimiento(self, user_id):
+        return bool(self._estado(user_id)['fecha_nacimiento'])
+
+    def registrar_nacimiento(self, user_id, fecha_nacimiento):
+        """Fecha de nacimiento del usuario ('birthdate' de AccessLink), para calcular la edad de cada día."""
+        with self._bloqueo(user_id):
+            self._leer_estado(user_id)['fecha_nacimiento'] = fecha_nacimiento
+            self._guardar_estado(user_id)
+
+    def añadir(self, user_id, fuente, filas):
+        """
+        Guarda las filas recién exportadas de una `fuente` ('actividad', 'sueno', 'recarga' o
+        'temperatura'). Los días ya puntuados se ignoran. Devuelve cuántas filas se aceptan.
+        """
+        with self._bloqueo(user_id):
+            estado = self._leer_estado(user_id)
+            aceptadas = 0
+            for fila in filas:
+                dia = str(fila.get('date') or '')[:10]
+                if not dia or (estado['ultima'] and dia <= estado['ultima']):
+                    continue
+                valores = {columna: _numero(fila.get(columna)) for columna in COLUMNAS_FUENTE[fuente] if columna in fila}
+                estado['pendientes'].setdefault(dia, {})[fuente] = valores
+                aceptadas += 1
+            if aceptadas:
+                self._guardar_estado(user_id)
+        return aceptadas
+
+    def añadir_snapshot(self, user_id, snapshot):
+        """
+        Sueño, recarga y fecha de nacimiento de un snapshot del panel web (snapshot_store.py),
+        que guarda las respuestas de AccessLink tal cual. Devuelve cuántas filas se aceptan.
+        """
+        nacimiento = (snapshot.get('userdata') or {}).get('birthdate')
+        if nacimiento and not self.conoce_nacimiento(user_id):
+            self.registrar_nacimiento(user_id, nacimiento)
+        return (self.añadir(user_id, 'sueno', filas_sueno((snapshot.get('sleepdata') or {}).get('nights') or []))
+                + self.añadir(user_id, 'recarga', (snapshot.get('recharge') or {}).get('recharges') or []))
+
+    # --- Puntuación ---
+
+    def _cargar_modelo(self):
+        if self._pipeline is None:
+            with medir('puntuacion_carga_modelo'):
+                self._pipeline = cargar_modelo(self.pipeline_file)
+            self._valores = cargar_estadisticas(self.stats_file) if os.path.exists(self.stats_file) else {}
+        return self._pipeline
+
+    def _dias_listos(self, user_id, hoy):
+        """Días completos (las cuatro fuentes), ya terminados y posteriores al último puntuado, en orden."""
+        estado = self._estado(user_id)
+        ultima = estado['ultima'] or ''
+        return sorted(dia for dia, fuentes in estado['pendientes'].items()
+                      if ultima < dia < hoy and all(fuente in fuentes for fuente in COLUMNAS_FUENTE))
+
+    def puntuar(self, hoy=None):
+        """
+        Puntúa en un solo lote los días listos de los usuarios que han recibido datos en esta
+        sesión y los añade a sus registros. Devuelve el número de días puntuados.
+        """
+        hoy = hoy or date.today().isoformat()
+        candidatos = []
+        for user_id in sorted(self.estados):
+            with self._bloqueo(user_id):
+                self._leer_estado(user_id)   # con lo que hayan añadido otros puntuadores
+            if self._dias_listos(user_id, hoy):
+                candidatos.append(user_id)
+        if not candidatos:
+            return 0
+        pipeline = self._cargar_modelo()
+
+        # Con los estados bloqueados (siempre en el mismo orden) y releídos: otro puntuador
+        # puede haber puntuado ya esos días desde que este los leyó
+        with ExitStack() as bloqueos:
+            for user_id in candidatos:
+                bloqueos.enter_context(self._bloqueo(user_id))
+                self._leer_estado(user_id)
+            return self._puntuar_bloqueados(pipeline, candidatos, hoy)
+
+    def _puntuar_bloqueados(self, pipeline, candidatos, hoy):
+        listos = {user_id: self._dias_listos(user_id, hoy) for user_id in candidatos}
+        listos = {user_id: dias for user_id, dias in listos.items() if dias}
+        if not listos:
+            return 0
+
+        columnas = columnas_modelo(pipeline)
+        usa_temporales = any(columna in COLUMNAS_TEMPORALES for columna in columnas)
+        filas, claves = [], []
+        try:
+            for user_id, dias in listos.items():
+                estado = self._estado(user_id)
+                for dia in dias:
+                    fila = {}
+                    for valores in estado['pendientes'][dia].values():
+                        fila.update(valores)
+                    fila['age'] = calcular_edad(estado['fecha_nacimiento'], dia)
+                    # Las ventanas avanzan siempre, para que estén al día si el modelo pasa a usarlas
+                    estado['historial'].avanzar(user_id, dia, fila)
+                    if usa_temporales:
+                        fila.update(estado['historial'].caracteristicas(user_id))
+                    filas.append(fila)
+                    claves.append((user_id, dia))
+
+            X = pd.DataFrame(filas).reindex(columns=columnas).apply(pd.to_numeric, errors='coerce')
+            X = imputar(X, self._valores)
+            with medir('puntuacion_prediccion'):
+                probabilidades = pipeline.predict_proba(X)
+        except Exception:
+            # El historial temporal ya avanzó en memoria: se descarta y se vuelve a leer del disco
+            for user_id in listos:
+                self.estados.pop(user_id, None)
+            raise
+
+        registros = {}
+        for (user_id, dia), fila in zip(claves, probabilidades):
+            registro = {'date': dia, 'predicted_frailty': ETIQUETAS.get(int(fila.argmax()), 'Desconocido')}
+            for indice, nombre in ETIQUETAS.items():
+                if indice < len(fila):
+                    registro[f'prob_{nombre}'] = round(float(fila[indice]), 3)
+            registros.setdefault(user_id, []).append(registro)
+
+        for user_id, dias in listos.items():
+            self._añadir_al_registro(user_id, registros[user_id])
+            estado = self._estado(user_id)
+            estado['ultima'] = dias[-1]
+            # Los días anteriores al último puntuado ya no se completarán a tiempo
+            estado['pendientes'] = {dia: fuentes for dia, fuentes in estado['pendientes'].items() if dia > dias[-1]}
+            self._guardar_estado(user_id)
+        incrementar('puntuacion_dias', len(claves))
+        return len(claves)
+
+    def _añadir_al_registro(self, user_id, registros):
+        os.makedirs(self._carpeta(user_id), exist_ok=True)
+        ruta = self.ruta_registro(user_id)
+        nuevo = not os.path.exists(ruta)
+        with open(ruta, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CAMPOS_LOG)
+            if nuevo:
+                writer.writeheader()
+            writer.writerows(registros)
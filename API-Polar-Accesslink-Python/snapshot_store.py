@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Per-user snapshots of the non-transactional AccessLink data shown by the web app."""
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import requests
+
+SNAPSHOT_DIR = "snapshots"
+
+
+class SnapshotStore(object):
+    """Per-user dashboard data materialized as one JSON file per user.
+
+    The page only reads the files of the users it shows; AccessLink is only
+    called by the background refresher.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, user_id):
+        return os.path.join(self.directory, "{}.json".format(user_id))
+
+    def load(self, user_id):
+        try:
+            with open(self._path(user_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, snapshot):
+        path = self._path(snapshot["user_id"])
+        temporary = path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(temporary, path)
+
+    def age(self, user_id):
+        """Seconds since the snapshot was written, or None if there is none."""
+        try:
+            return time.time() - os.stat(self._path(user_id)).st_mtime
+        except FileNotFoundError:
+            return None
+
+
+def build_snapshot(accesslink, user_id, access_token):
+    """Fetch everything data.html shows for one user."""
+    return {
+        "user_id": user_id,
+        "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "userdata": accesslink.get_userdata(user_id=user_id, access_token=access_token),
+        "exercises": accesslink.get_exercises(access_token=access_token),
+        "sleepdata": accesslink.get_sleep(access_token=access_token),
+        "recharge": accesslink.get_recharge(access_token=access_token),
+    }
+
+
+def refresh_user(accesslink, store, user_id, access_token):
+    """Rebuild the snapshot of one user, keeping the previous one if AccessLink fails."""
+    try:
+        store.save(build_snapshot(accesslink, user_id, access_token))
+    except requests.exceptions.RequestException as err:
+        # Keep serving the previous snapshot; the error is shown next to it.
+        snapshot = store.load(user_id) or {"user_id": user_id}
+        snapshot["error"] = str(err)
+        store.save(snapshot)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Per-user access token storage backed by SQLite.
+
+Tokens used to be kept in config.yml (one user) and usertokens.yml (a list)
+that were read and rewritten in full every time a user authorized. The store
+keeps one row per user_id, so lookups and upserts touch a single row, and
+SQLite's locking makes it safe to share between many processes and threads.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+import yaml
+
+TOKEN_DB_FILENAME = "tokens.db"
+
+# Files where tokens were kept before the store existed; imported once on creation.
+LEGACY_TOKEN_FILES = ("config.yml", "usertokens.yml")
+
+# Tokens that expire within this many seconds are treated as already expired.
+EXPIRY_MARGIN = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    user_id      TEXT PRIMARY KEY,
+    access_token TEXT NOT NULL,
+    token_type   TEXT,
+    expires_at   REAL,
+    updated_at   REAL NOT NULL
+)
+"""
+
+
+class TokenStore(object):
+    """Indexed token store keyed by Polar user id.
+
+    :param path: SQLite database file.
+    :param import_from: YAML files (config.yml / usertokens.yml) whose tokens
+        are copied into the store when the database is created.
+    """
+
+    def __init__(self, path=TOKEN_DB_FILENAME, import_from=LEGACY_TOKEN_FILES):
+        self.path = path
+        self._local = threading.local()
+        created = not os.path.exists(path)
+        with self._connection() as connection:
+            connection.execute(_SCHEMA)
+        if created:
+            for filename in import_from:
+                self.import_yaml(filename)
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads, so each one gets its own.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _as_dict(row):
+        return dict(row) if row is not None else None
+
+    def upsert(self, user_id, access_token, expires_in=None, token_type=None):
+        """Insert or replace the token of one user.
+
+        :param expires_in: token lifetime in seconds, as returned by the token endpoint.
+        """
+        now = time.time()
+        expires_at = now + expires_in if expires_in else None
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO tokens (user_id, access_token, token_type, expires_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET access_token=excluded.access_token, "
+                "token_type=excluded.token_type, expires_at=excluded.expires_at, "
+                "updated_at=excluded.updated_at",
+                (str(user_id), access_token, token_type, expires_at, now))
+
+    def get(self, user_id, include_expired=False):
+        """Token of one user, or None if unknown or expired (re-authorization needed)."""
+        row = self._connection().execute(
+            "SELECT * FROM tokens WHERE user_id = ?", (str(user_id),)).fetchone()
+        if row is None or (not include_expired and self.is_expired(row)):
+            return None
+        return self._as_dict(row)
+
+    @staticmethod
+    def is_expired(token):
+        return token["expires_at"] is not None and token["expires_at"] - EXPIRY_MARGIN <= time.time()
+
+    def latest(self):
+        """Most recently authorized user that still has a valid token (for single-user scripts)."""
+        row = self._connection().execute(
+            "SELECT * FROM tokens WHERE expires_at IS NULL OR expires_at > ? "
+            "ORDER BY updated_at DESC LIMIT 1", (time.time() + EXPIRY_MARGIN,)).fetchone()
+        return self._as_dict(row)
+
+    def delete(self, user_id):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM tokens WHERE user_id = ?", (str(user_id),))
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+    def page(self, offset, limit):
+        """Tokens ordered by user id, `limit` at a time (for paginated listings)."""
+        rows = self._connection().execute(
+            "SELECT * FROM tokens ORDER BY user_id LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+        return [self._as_dict(row) for row in rows]
+
+    def expiring(self, within):
+        """Users whose token expires in the next `within` seconds (or has already expired)."""
+        rows = self._connection().execute(
+            "SELECT * FROM tokens WHERE expires_at IS NOT NULL AND expires_at <= ? ORDER BY expires_at",
+            (time.time() + within,)).fetchall()
+        return [self._as_dict(row) for row in rows]
+
+    def __iter__(self):
+        for row in self._connection().execute("SELECT * FROM tokens ORDER BY user_id"):
+            yield self._as_dict(row)
+
+    def import_yaml(self, filename):
+        """Copy the tokens of a config.yml / usertokens.yml file into the store."""
+        if not os.path.exists(filename):
+            return
+        with open(filename) as f:
+            data = yaml.safe_load(f) or {}
+        tokens = list(data.get("tokens") or [])
+        if data.get("user_id") and data.get("access_token"):
+            tokens.append({"user_id": data["user_id"], "access_token": data["access_token"]})
+        for token in tokens:
+            self.upsert(token["user_id"], token["access_token"])
@@ -17,4 +17,5 @@ def save_config(config, filename):
 
 
 def pretty_print_json(data):
-    print(json.dumps(data, indent=4, sort_keys=True))
+    # Typed records (accesslink.models) are printed with their JSON keys
+    print(json.dumps(data, indent=4, sort_keys=True, default=lambda record: record.to_dict()))
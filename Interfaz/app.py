@@ -3,7 +3,18 @@ import streamlit as st
 import pandas as pd
 import os
 import subprocess
-import joblib
+import sys
+
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fragilidad.caracteristicas import cargar_con_caracteristicas
+from fragilidad.explicaciones import contribuciones_clase, explicar, factores_principales
+from fragilidad.imputacion import ESTADISTICAS_FILENAME, cargar_estadisticas, imputar
+from fragilidad.inferencia import cargar_modelo, columnas_modelo
+from fragilidad.temporales import COLUMNAS_TEMPORALES, calcular_temporales
+from fragilidad.validacion import validar
+from fragilidad.visualizacion import numero_paginas, paginar, reducir_lttb, resumen_semanal
+from fragilidad.instrumentacion import incrementar, medir
 
 # --- 1. Configuración de la Página y Constantes ---
 st.set_page_config(
@@ -24,6 +35,7 @@ CONSOLIDATED_FILE = os.path.join(UPLOAD_DIR, "datos_consolidados.csv")
 COMPLETE_RAW_FILE = os.path.join(UPLOAD_DIR, "dataset_completo_raw.csv")
 COMPLETE_CLEANED_FILE = os.path.join(UPLOAD_DIR, "dataset_completo_limpio.csv")
 PIPELINE_FILE = 'fragility_pipeline.joblib'
+STATS_FILE = ESTADISTICAS_FILENAME
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
@@ -36,9 +48,10 @@ def run_script(script_name, args=[]):
     
     command = ["python", script_path] + args
     try:
-        result = subprocess.run(
-            command, capture_output=True, text=True, check=True, encoding='latin-1'
-        )
+        with medir('interfaz_script', script=script_name):
+            result = subprocess.run(
+                command, capture_output=True, text=True, check=True, encoding='latin-1'
+            )
         st.info(f"Salida de '{script_name}':\n{result.stdout}")
         return True
     except FileNotFoundError:
@@ -48,76 +61,167 @@ def run_script(script_name, args=[]):
         st.error(f"Error al ejecutar '{script_name}':\n{e.stderr}")
         return False
 
-def display_prediction_results(df_to_predict, probabilities):
-    """Toma las probabilidades y muestra los resultados en un formato amigable."""
-    predictions_numeric = probabilities.argmax(axis=1)
-    
-    label_map = {
-        0: 'Frágil',
-        1: 'Pre-frágil',
-        2: 'Robusto'
-    }
-    predictions_text = [label_map.get(p, 'Desconocido') for p in predictions_numeric]
-
-    results_df = pd.DataFrame({'date': df_to_predict['date']})
+LABEL_MAP = {
+    0: 'Frágil',
+    1: 'Pre-frágil',
+    2: 'Robusto'
+}
+PROBABILITY_COLUMNS = [f'prob_{class_name}' for class_name in LABEL_MAP.values()]
+
+# Lo que se envía al navegador en cada repintado, sea cual sea la longitud del historial
+ROWS_PER_PAGE = 50
+CHART_MAX_POINTS = 500
+
+def build_results(df_to_predict, probabilities, contributions=None, features=None):
+    """
+    Construye una sola vez, ordenadas por fecha, la tabla de resultados y, si hay
+    contribuciones SHAP (fragilidad/explicaciones.py), la de contribuciones a la clase predicha.
+    """
+    predictions_text = [LABEL_MAP.get(p, 'Desconocido') for p in probabilities.argmax(axis=1)]
+
+    results_df = pd.DataFrame({'date': pd.to_datetime(df_to_predict['date']).values})
     results_df['predicted_frailty'] = predictions_text
     
-    for class_index, class_name in label_map.items():
+    for class_index, class_name in LABEL_MAP.items():
         if class_index < probabilities.shape[1]:
             results_df[f'prob_{class_name}'] = probabilities[:, class_index].round(3)
 
+    if contributions is not None:
+        results_df['factores_clave'] = factores_principales(contributions, probabilities, df_to_predict, features)
+
+    # Tendencias de la última semana (fragilidad/caracteristicas.py), como contexto de cada día
+    for column in ['active_steps_mean_7d', 'hrv_mean_7d', 'hrv_trend_7d']:
+        if column in df_to_predict.columns:
+            results_df[column] = df_to_predict[column].round(1).values
+
+    detail_df = None
+    if contributions is not None:
+        detail_df = contribuciones_clase(contributions, probabilities, features).round(3)
+        detail_df.insert(0, 'date', results_df['date'].values)
+
+    if not results_df['date'].is_monotonic_increasing:
+        order = results_df['date'].argsort(kind='stable').to_numpy()
+        results_df = results_df.iloc[order].reset_index(drop=True)
+        if detail_df is not None:
+            detail_df = detail_df.iloc[order].reset_index(drop=True)
+    return results_df, detail_df
+
+def page_selector(label, rows, key):
+    """Selector de página para una tabla de `rows` filas (ROWS_PER_PAGE por página)."""
+    pages = numero_paginas(rows, ROWS_PER_PAGE)
+    return st.number_input(f"{label} (de {pages}, {ROWS_PER_PAGE} filas por página)",
+                           min_value=1, max_value=pages, value=1, step=1, key=key)
+
+def display_prediction_results(results_df, detail_df, key):
+    """
+    Muestra los resultados con un tamaño acotado (fragilidad/visualizacion.py): tablas
+    paginadas y la evolución por semanas o con las curvas reducidas con LTTB.
+    """
     st.success("¡Predicción completada!")
-    st.dataframe(results_df)
+    page = page_selector("Página de resultados", len(results_df), f"{key}_page")
+    st.dataframe(paginar(results_df, page, ROWS_PER_PAGE)[0])
+    if detail_df is not None:
+        with st.expander("Contribución de cada variable a la clase predicha (SHAP)"):
+            st.caption("Valores positivos empujan el día hacia la clase predicha; negativos, en contra.")
+            st.dataframe(paginar(detail_df, page, ROWS_PER_PAGE)[0])
+    else:
+        st.caption("Las explicaciones por variable necesitan xgboost (requirements-xgboost.txt) y el pipeline .joblib junto al modelo ONNX.")
     st.subheader("Resumen de la Clasificación")
     st.bar_chart(results_df['predicted_frailty'].value_counts())
 
 
     # --- Gráfico de línea para la evolución ---
     st.subheader("Evolución de la Fragilidad en el Tiempo")
-    
-    # Definir el orden de las categorías para que el eje Y se muestre lógicamente
-    category_order = ['Robusto', 'Pre-frágil', 'Frágil']
-    
-    # Crear una copia del dataframe para la gráfica
-    plot_df = results_df.copy()
-    
-    # Convertir la columna de predicción a un tipo categórico con orden
-    plot_df['predicted_frailty'] = pd.Categorical(
-        plot_df['predicted_frailty'], 
-        categories=category_order, 
-        ordered=True
-    )
-    
-    # Ordenar por fecha para que la línea tenga sentido
-    plot_df = plot_df.sort_values('date')
+    view = st.radio("Vista", ["Por semana", "Curvas de probabilidad (LTTB)"], horizontal=True, key=f"{key}_view")
+    if view == "Por semana":
+        # Clase más frecuente y probabilidad media de cada semana (y LTTB si aun así son demasiadas)
+        weekly_df = resumen_semanal(results_df, PROBABILITY_COLUMNS)
+        weekly_chart = reducir_lttb(weekly_df.reset_index(), PROBABILITY_COLUMNS, CHART_MAX_POINTS, fecha='semana')
+        st.line_chart(weekly_chart.set_index('semana')[PROBABILITY_COLUMNS])
+        with st.expander("Resumen semanal"):
+            weekly_page = page_selector("Página del resumen semanal", len(weekly_df), f"{key}_weekly_page")
+            st.dataframe(paginar(weekly_df.round(3), weekly_page, ROWS_PER_PAGE)[0])
+    else:
+        # Como mucho CHART_MAX_POINTS días por curva, conservando picos y cambios de tendencia
+        reduced_df = reducir_lttb(results_df, PROBABILITY_COLUMNS, CHART_MAX_POINTS)
+        st.line_chart(reduced_df.set_index('date')[PROBABILITY_COLUMNS])
+        st.caption(f"{len(reduced_df)} de {len(results_df)} días representados.")
 
-    # Para st.line_chart, es mejor tener la fecha como índice
-    plot_df = plot_df.set_index('date')
+def show_results(key):
+    """Vuelve a pintar los últimos resultados de la pestaña, también al cambiar de página o de vista."""
+    if key in st.session_state:
+        with medir('interfaz_visualizacion'):
+            display_prediction_results(*st.session_state[key], key=key)
 
-    # Generar el gráfico de línea
-    st.line_chart(
-        plot_df['predicted_frailty']
-    )
+def add_temporal_features(df, features):
+    """
+    Si el modelo se entrenó con características temporales (exportMLXGBoost.py --temporales),
+    las calcula sobre el historial subido y rellena los primeros días, que no tienen
+    desviación ni pendiente, con las medianas del entrenamiento.
+    """
+    temporales = [column for column in features if column in COLUMNAS_TEMPORALES]
+    if not temporales:
+        return df
+    df = calcular_temporales(df.copy(), usuario=None, fecha='date')
+    stats_path = os.path.join(APP_DIR, STATS_FILE)
+    if os.path.exists(stats_path):
+        valores = cargar_estadisticas(stats_path)
+        df = imputar(df, {column: valores[column] for column in temporales if column in valores})
+    return df
+
+def validate_upload(df):
+    """
+    Comprueba tipos, rangos fisiológicos y fechas de las 15 variables y de 'date' antes de
+    cargar el modelo (fragilidad/validacion.py). Devuelve las filas con las que se puede
+    predecir, con los valores imposibles como NaN, o None si no se puede seguir.
+    """
+    with medir('interfaz_validacion'):
+        resultado = validar(df)
+    if resultado.faltan:
+        st.error(f"Error Crítico: Faltan columnas para la predicción: {resultado.faltan}")
+        return None
+    if len(resultado.informe):
+        incrementar('interfaz_filas_descartadas', resultado.descartadas)
+        st.warning(f"Se han descartado {resultado.descartadas} filas (fecha no válida o repetida). "
+                   "Los valores no numéricos o fuera de rango se tratan como ausentes.")
+        st.dataframe(resultado.informe, hide_index=True)
+    if not resultado.valida:
+        st.error("Ninguna fila tiene una fecha válida: no se puede predecir.")
+        return None
+    return resultado.datos
 
-def predict_on_dataframe(df):
-    """Función central que realiza la predicción sobre un dataframe ya limpio."""
+def predict_on_dataframe(df, key):
+    """
+    Función central que realiza la predicción sobre un dataframe ya limpio. Los resultados se
+    guardan en la sesión bajo `key` y los pinta `show_results`.
+    """
+    # Resultados anteriores de la pestaña y sus selectores de página
+    for state_key in (key, f"{key}_page", f"{key}_weekly_page"):
+        st.session_state.pop(state_key, None)
+    df = validate_upload(df)
+    if df is None:
+        return
     try:
-        pipeline = joblib.load(os.path.join(APP_DIR, PIPELINE_FILE))
+        # Con 'fragility_pipeline.onnx' al lado y onnxruntime instalado no hace falta
+        # scikit-learn ni xgboost (fragilidad/inferencia.py, FRAGILIDAD_INFERENCIA)
+        with medir('interfaz_carga_modelo'):
+            pipeline = cargar_modelo(os.path.join(APP_DIR, PIPELINE_FILE))
         
-        numeric_features = [
-            'age', 'active-steps', 'active-calories', 'calories', 'duration_minutes',
-            'heart_rate_avg', 'heart_rate_variability_avg', 'ans_charge', 'sleep_score',
-            'light_sleep_min', 'deep_sleep_min', 'rem_sleep_min', 'interruptions_min',
-            'breathing_rate_avg', 'temp_amplitude'
-        ]
+        numeric_features = columnas_modelo(pipeline)
+        df = add_temporal_features(df, numeric_features)
         
         missing_cols = list(set(numeric_features) - set(df.columns))
         if missing_cols:
             st.error(f"Error Crítico: Faltan columnas para la predicción: {missing_cols}")
             return
 
-        probabilities = pipeline.predict_proba(df)
-        display_prediction_results(df, probabilities)
+        # Probabilidades y contribuciones SHAP en una sola pasada por los árboles, guardadas
+        # por huella de los datos: repetir la predicción no vuelve a evaluar el modelo
+        with medir('interfaz_prediccion'):
+            probabilities, contributions = explicar(pipeline, df)
+        incrementar('interfaz_filas_predichas', len(df))
+
+        st.session_state[key] = build_results(df, probabilities, contributions, numeric_features)
 
     except FileNotFoundError:
         st.error(f"Error: No se encontró el archivo del modelo '{PIPELINE_FILE}'. Asegúrate de haber entrenado el modelo.")
@@ -150,7 +254,9 @@ with tab1:
     2.  **Carga el Archivo**: Sube el fichero CSV completo.
     3.  **Ejecuta**: Pulsa el botón "Limpiar y Predecir Dataset".
 
-    La aplicación tomará tu archivo, rellenará cualquier valor `NaN` que encuentre usando la mediana (para números) o la moda (para texto), y luego realizará la predicción.
+    Antes de nada se comprueban las fechas y los rangos de cada variable: las filas con una fecha no válida o repetida se descartan y los valores imposibles (por ejemplo, minutos negativos) se tratan como `NaN`.
+
+    La aplicación tomará tu archivo, rellenará cualquier valor `NaN` que encuentre usando la mediana de la población de entrenamiento (o, para columnas que el modelo no conoce, la mediana/moda del propio archivo), y luego realizará la predicción.
     """)
 
     st.subheader("Columnas Requeridas por el Modelo")
@@ -193,14 +299,15 @@ with tab2:
             input_files = [ACTIVITY_FILE, RECHARGE_FILE, SLEEP_FILE, TEMP_FILE]
             if run_script("prepararDF.py", ["--inputs"] + input_files + ["--output", CONSOLIDATED_FILE]):
                 # Añadir edad
-                df = pd.read_csv(CONSOLIDATED_FILE)
+                df = cargar_con_caracteristicas(CONSOLIDATED_FILE, 'dataset_consolidado', fecha='date')
                 df['age'] = age_input
                 
                 # Predecir
                 st.subheader("Paso 2: Realizando la Predicción")
-                predict_on_dataframe(df)
+                predict_on_dataframe(df, "results_tab1")
         else:
             st.error("Por favor, carga los cuatro archivos necesarios.")
+    show_results("results_tab1")
 
 # --- Pestaña 3: Flujo de 1 archivo completo ---
 with tab3:
@@ -220,11 +327,12 @@ with tab3:
             st.subheader("Paso 1: Limpiando el Dataset (imputando NaNs)")
             if run_script("limpiar_dataset.py", [COMPLETE_RAW_FILE, COMPLETE_CLEANED_FILE]):
                 # Cargar dataframe limpio y predecir
-                df_cleaned = pd.read_csv(COMPLETE_CLEANED_FILE)
+                df_cleaned = cargar_con_caracteristicas(COMPLETE_CLEANED_FILE, 'dataset_consolidado', fecha='date')
                 st.subheader("Paso 2: Realizando la Predicción")
-                predict_on_dataframe(df_cleaned)
+                predict_on_dataframe(df_cleaned, "results_tab2")
         else:
             st.error("Por favor, carga un archivo consolidado.")
+    show_results("results_tab2")
 
 
 
@@ -1,11 +1,84 @@
 # limpiar_dataset.py
+import os
+import sys
 import pandas as pd
 import argparse
 
-def clean_missing_values(input_file, output_file):
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fragilidad.imputacion import ESTADISTICAS_FILENAME, cargar_estadisticas, imputar, imputar_por_bloques
+from fragilidad.validacion import COLUMNAS_INFORME, RANGOS, resumen_validacion, validar
+
+# Estadísticas de la población de entrenamiento (se copian junto a fragility_pipeline.joblib)
+DEFAULT_STATS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ESTADISTICAS_FILENAME)
+
+def validador_por_bloques(informes):
+    """
+    Validación de cada bloque para `imputar_por_bloques`, igual que la del fichero completo:
+    además descarta los días ya vistos en bloques anteriores. Añade el informe de cada
+    bloque a `informes`.
+    """
+    vistas = set()
+
+    def validar_bloque(bloque):
+        con_fecha = 'date' in bloque.columns
+        resultado = validar(bloque, [column for column in RANGOS if column in bloque.columns],
+                            fecha='date' if con_fecha else None)
+        informes.append(resultado.informe)
+        datos = resultado.datos
+        if con_fecha:
+            dias = datos['date'].dt.normalize()
+            repetidas = dias.isin(vistas).to_numpy()
+            if repetidas.any():
+                informes.append(pd.DataFrame([('date', 'fecha_duplicada', int(repetidas.sum()),
+                                               str(datos['date'].iloc[repetidas.argmax()]))],
+                                             columns=COLUMNAS_INFORME))
+                datos = datos[~repetidas]
+            vistas.update(dias)
+        return datos
+
+    return validar_bloque
+
+def clean_missing_values(input_file, output_file, stats_file=DEFAULT_STATS_FILE, chunksize=None):
     """
     Carga un dataset, imputa los valores NaN y guarda el resultado.
+
+    Si existe `stats_file`, los NaN se rellenan con la mediana/moda del entrenamiento;
+    las columnas que no aparezcan en él se imputan con los valores del propio fichero.
+    Con `chunksize` el fichero se procesa por bloques (requiere `stats_file` y solo rellena
+    las columnas que aparecen en él), con la misma validación en cada bloque.
     """
+    valores = None
+    if stats_file and os.path.exists(stats_file):
+        valores = cargar_estadisticas(stats_file)
+        print(f"Usando las estadísticas de imputación del entrenamiento ('{stats_file}').")
+
+    if chunksize:
+        if valores is None:
+            print("Error: El modo por bloques necesita el fichero de estadísticas del entrenamiento.")
+            return
+        informes = []
+        try:
+            columnas = pd.read_csv(input_file, nrows=0).columns
+            filas = imputar_por_bloques(input_file, output_file, valores, chunksize=chunksize,
+                                        parse_dates=['date'] if 'date' in columnas else None,
+                                        preparar=validador_por_bloques(informes))
+        except FileNotFoundError:
+            print(f"Error: No se encontró el archivo de entrada '{input_file}'.")
+            return
+        informe = pd.concat(informes, ignore_index=True)
+        if len(informe):
+            # Un problema por (columna, motivo), sumando las filas de todos los bloques
+            informe = informe.groupby(['columna', 'motivo'], sort=False, as_index=False) \
+                .agg(filas=('filas', 'sum'), ejemplo=('ejemplo', 'first'))
+            descartadas = informe.loc[informe['motivo'].isin(['fecha_invalida', 'fecha_duplicada']), 'filas'].sum()
+            print(f"Validación: {descartadas} filas descartadas")
+            print(informe.to_string(index=False))
+        if not filas:
+            sys.exit("Error: Ninguna fila del archivo tiene una fecha válida.")
+        print(f"Dataset imputado por bloques ({filas} filas) y guardado en '{output_file}'.")
+        return
+
     try:
         df = pd.read_csv(input_file)
         print(f"Archivo '{input_file}' cargado con {len(df)} filas.")
@@ -13,6 +86,19 @@ def clean_missing_values(input_file, output_file):
         print(f"Error: No se encontró el archivo de entrada '{input_file}'.")
         return
 
+    # --- 0. Validación de Tipos, Rangos y Fechas ---
+    # Antes de imputar: los valores no numéricos o imposibles pasan a NaN y se imputan como
+    # cualquier hueco; las fechas no válidas o repetidas se descartan (fragilidad/validacion.py)
+    resultado = validar(df, [column for column in RANGOS if column in df.columns],
+                        fecha='date' if 'date' in df.columns else None)
+    if len(resultado.informe):
+        print(f"Validación: {resumen_validacion(resultado)}")
+        print(resultado.informe.to_string(index=False))
+    df = resultado.datos
+    if df.empty:
+        # Con código de salida 1 para que la Interfaz no siga con un fichero limpio anterior
+        sys.exit("Error: Ninguna fila del archivo tiene una fecha válida.")
+
     # --- 1. Análisis de Valores Faltantes ---
     print("\n--- Análisis Inicial de Valores Faltantes ---")
     missing_values = df.isnull().sum()
@@ -24,6 +110,12 @@ def clean_missing_values(input_file, output_file):
     
     # --- 2. Imputación de Valores NaN ---
     print("\nIniciando imputación de valores NaN...")
+    if valores is not None:
+        df = imputar(df, valores)
+        for column in missing_cols.index:
+            if column in valores:
+                print(f"  - Columna '{column}': NaN rellenados con el valor del entrenamiento ({valores[column]})")
+
     for column in df.columns:
         if df[column].isnull().any():
             # Si es una columna numérica, rellenar con la mediana
@@ -57,6 +149,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Limpia valores NaN de un fichero CSV.")
     parser.add_argument("input_file", help="Ruta al fichero CSV de entrada.")
     parser.add_argument("output_file", help="Ruta para guardar el fichero CSV limpio.")
+    parser.add_argument("--estadisticas", default=DEFAULT_STATS_FILE,
+                        help="JSON con la mediana/moda del entrenamiento (por defecto el que acompaña al modelo).")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Procesa el fichero en bloques de este número de filas.")
     
     args = parser.parse_args()
-    clean_missing_values(args.input_file, args.output_file)
+    clean_missing_values(args.input_file, args.output_file, args.estadisticas, args.chunksize)
@@ -1,6 +1,34 @@
 # prepararDF.py
-import pandas as pd
+import os
+import sys
+import tempfile
 import argparse
+import pandas as pd
+
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fragilidad.esquemas import leer_export
+from fragilidad.validacion import RANGOS, resumen_validacion, validar
+
+# Esquema de cada archivo de entrada (ver fragilidad/esquemas.py)
+ESQUEMAS_ENTRADA = {
+    'actividad': 'polar_daily_activities',
+    'recuperacion': 'polar_recharge_summary',
+    'sueno': 'polar_sleep_summary',
+    'temperatura': 'body_temperature_summary',
+}
+
+def validar_entrada(nombre, df):
+    """
+    Comprueba las variables del modelo que trae el archivo y sus fechas antes de unirlo
+    (fragilidad/validacion.py): los valores imposibles pasan a NaN, así que su día se elimina
+    junto con el resto de filas incompletas, y los días repetidos se descartan en lugar de
+    multiplicar las filas de la unión.
+    """
+    resultado = validar(df, [columna for columna in RANGOS if columna in df.columns])
+    if len(resultado.informe):
+        print(f"Validación de '{nombre}': {resumen_validacion(resultado)}")
+    return resultado.datos
 
 def preparar_dataframe(activity_file, recharge_file, sleep_file, temp_file, output_file):
     """
@@ -8,17 +36,13 @@ def preparar_dataframe(activity_file, recharge_file, sleep_file, temp_file, outp
     y guarda el resultado.
     """
     try:
-        # Carga los archivos CSV
-        activity_df = pd.read_csv(activity_file)
-        recharge_df = pd.read_csv(recharge_file)
-        sleep_df = pd.read_csv(sleep_file)
-        temperature_df = pd.read_csv(temp_file)
+        # Carga los archivos CSV (la columna 'date' se parsea a datetime durante la lectura)
+        activity_df = validar_entrada('actividad', leer_export(activity_file, ESQUEMAS_ENTRADA['actividad']))
+        recharge_df = validar_entrada('recuperacion', leer_export(recharge_file, ESQUEMAS_ENTRADA['recuperacion']))
+        sleep_df = validar_entrada('sueno', leer_export(sleep_file, ESQUEMAS_ENTRADA['sueno']))
+        temperature_df = validar_entrada('temperatura', leer_export(temp_file, ESQUEMAS_ENTRADA['temperatura']))
         print("Archivos de entrada cargados correctamente.")
 
-        # Convierte la columna 'date' a datetime para asegurar consistencia
-        for df in [activity_df, recharge_df, sleep_df, temperature_df]:
-            df['date'] = pd.to_datetime(df['date'])
-
         # Une los datasets por la columna 'date'
         merged_df = activity_df \
             .merge(recharge_df, on='date', how='inner') \
@@ -39,17 +63,120 @@ def preparar_dataframe(activity_file, recharge_file, sleep_file, temp_file, outp
     except Exception as e:
         print(f"Ocurrió un error inesperado: {e}")
 
+def _particionar_por_fecha(nombre, input_file, directorio, chunksize, frecuencia):
+    """
+    Lee un CSV por bloques y reparte sus filas en un fichero temporal por periodo de fechas.
+    Las filas cuya fecha no se puede interpretar se descartan y se informan aquí, como hace
+    `validar_entrada` con el archivo completo. Devuelve el conjunto de periodos encontrados.
+    """
+    periodos = set()
+    invalidas = 0
+    ejemplo = None
+    for bloque in leer_export(input_file, ESQUEMAS_ENTRADA[nombre], chunksize=chunksize):
+        # Un solo valor no interpretable deja la columna del bloque como texto
+        fechas = pd.to_datetime(bloque['date'], errors='coerce')
+        validas = fechas.notna()
+        if not validas.all():
+            invalidas += int((~validas).sum())
+            ejemplo = ejemplo or str(bloque['date'][~validas].iloc[0])
+            bloque = bloque[validas].assign(date=fechas[validas])
+        claves = bloque['date'].dt.to_period(frecuencia).astype(str)
+        for periodo, parte in bloque.groupby(claves):
+            destino = os.path.join(directorio, f"{nombre}_{periodo}.csv")
+            parte.to_csv(destino, mode='a', header=periodo not in periodos, index=False)
+            periodos.add(periodo)
+    if invalidas:
+        print(f"Validación de '{nombre}': {invalidas} filas descartadas; date fecha_invalida ({invalidas}), p. ej. {ejemplo!r}")
+    return periodos
+
+def preparar_dataframe_por_bloques(activity_file, recharge_file, sleep_file, temp_file, output_file,
+                                   chunksize=100_000, frecuencia='M'):
+    """
+    Igual que `preparar_dataframe`, pero con memoria constante para subidas de varios años:
+    cada archivo se lee por bloques y se reparte por periodos de fecha (por defecto meses) en
+    ficheros temporales; después se une y limpia un periodo cada vez y se añade a la salida.
+    """
+    archivos = {
+        'actividad': activity_file,
+        'recuperacion': recharge_file,
+        'sueno': sleep_file,
+        'temperatura': temp_file,
+    }
+    try:
+        with tempfile.TemporaryDirectory() as directorio:
+            periodos = {}
+            for nombre, ruta in archivos.items():
+                periodos[nombre] = _particionar_por_fecha(nombre, ruta, directorio, chunksize, frecuencia)
+            print("Archivos de entrada particionados por fecha.")
+
+            # Solo los periodos presentes en los 4 archivos pueden producir filas (uniones 'inner')
+            comunes = sorted(set.intersection(*periodos.values()))
+            filas_unidas = 0
+            filas_finales = 0
+            cabecera_escrita = False
+            with open(output_file, 'w', newline='') as salida:
+                for periodo in comunes:
+                    # Todas las filas de un día están en el mismo periodo, así que los días
+                    # repetidos se detectan igual que con el archivo completo
+                    activity_df, recharge_df, sleep_df, temperature_df = [
+                        validar_entrada(nombre, leer_export(os.path.join(directorio, f"{nombre}_{periodo}.csv"),
+                                                            ESQUEMAS_ENTRADA[nombre]))
+                        for nombre in archivos
+                    ]
+                    merged_df = activity_df \
+                        .merge(recharge_df, on='date', how='inner') \
+                        .merge(sleep_df, on='date', how='inner') \
+                        .merge(temperature_df, on='date', how='inner')
+                    cleaned_df = merged_df.dropna()
+                    cleaned_df.to_csv(salida, header=not cabecera_escrita, index=False)
+                    cabecera_escrita = True
+                    filas_unidas += len(merged_df)
+                    filas_finales += len(cleaned_df)
+
+                if not cabecera_escrita:
+                    # Ningún periodo en común: se escribe solo la cabecera de la unión, como la
+                    # versión sin bloques, para que los pasos siguientes lean un CSV vacío válido
+                    activity_df, recharge_df, sleep_df, temperature_df = [
+                        leer_export(ruta, ESQUEMAS_ENTRADA[nombre], nrows=0) for nombre, ruta in archivos.items()
+                    ]
+                    activity_df \
+                        .merge(recharge_df, on='date', how='inner') \
+                        .merge(sleep_df, on='date', how='inner') \
+                        .merge(temperature_df, on='date', how='inner') \
+                        .to_csv(salida, index=False)
+
+        print(f"Datasets unidos por periodos ({len(comunes)}). Total de filas antes de limpiar: {filas_unidas}")
+        print(f"Filas con NaN eliminadas. Total de filas final: {filas_finales}")
+        print(f"Datos fusionados y limpiados guardados en '{output_file}'")
+
+    except FileNotFoundError as e:
+        print(f"Error: No se encontró el archivo {e.filename}")
+    except Exception as e:
+        print(f"Ocurrió un error inesperado: {e}")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Une y limpia 4 datasets de salud.")
     parser.add_argument("--inputs", nargs=4, required=True, help="Ruta a los 4 archivos de entrada (actividad, recuperacion, sueno, temperatura).")
     parser.add_argument("--output", required=True, help="Ruta para guardar el fichero CSV final.")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Procesa los archivos por bloques de este número de filas, uniendo mes a mes (memoria constante).")
     
     args = parser.parse_args()
     
-    preparar_dataframe(
-        activity_file=args.inputs[0],
-        recharge_file=args.inputs[1],
-        sleep_file=args.inputs[2],
-        temp_file=args.inputs[3],
-        output_file=args.output
-    )
+    if args.chunksize:
+        preparar_dataframe_por_bloques(
+            activity_file=args.inputs[0],
+            recharge_file=args.inputs[1],
+            sleep_file=args.inputs[2],
+            temp_file=args.inputs[3],
+            output_file=args.output,
+            chunksize=args.chunksize
+        )
+    else:
+        preparar_dataframe(
+            activity_file=args.inputs[0],
+            recharge_file=args.inputs[1],
+            sleep_file=args.inputs[2],
+            temp_file=args.inputs[3],
+            output_file=args.output
+        )
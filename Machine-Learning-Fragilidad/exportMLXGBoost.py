@@ -1,21 +1,21 @@
-import pandas as pd
-from imblearn.over_sampling import SMOTE
+import argparse
+import os
+import sys
 from xgboost import XGBClassifier
 import joblib
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 
-print("Iniciando el entrenamiento del pipeline final...")
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fragilidad.balanceo import MODOS_BALANCEO, balancear, validacion_cruzada_agrupada
+from fragilidad.caracteristicas import cargar_con_caracteristicas
+from fragilidad.imputacion import ESTADISTICAS_FILENAME, calcular_estadisticas, guardar_estadisticas, imputar
+from fragilidad.inferencia import (TOLERANCIA_PARIDAD, ModeloONNX, cargar_modelo, columnas_modelo, comprobar_paridad,
+                                   exportar_onnx, huella, ruta_onnx)
+from fragilidad.temporales import COLUMNAS_TEMPORALES, calcular_temporales
 
-# --- 1. Cargar el Dataset ---
-try:
-    df = pd.read_csv('dataset_preparado.csv')
-    print("Archivo 'dataset_preparado.csv' cargado.")
-except FileNotFoundError:
-    print("Error: No se encontro el archivo 'dataset_preparado.csv'.")
-    exit()
-
-# --- 2. Definir Columnas y Objetivo ---
+# --- Definir Columnas y Objetivo ---
 # Estas son las columnas que el modelo usará para predecir.
 # Es importante que coincidan con las que usaste en el entrenamiento.
 numeric_features = [
@@ -25,34 +25,150 @@ numeric_features = [
     'breathing_rate_avg', 'temp_amplitude'
 ]
 
-X_full = df[numeric_features]
-y_full = df['frailty_status']
 
-# --- 3. Balancear los Datos con SMOTE ---
-smote = SMOTE(random_state=42)
-X_resampled, y_resampled = smote.fit_resample(X_full, y_full)
-print(f"Datos balanceados con SMOTE, total de filas: {X_resampled.shape[0]}")
+def crear_pipeline(features=numeric_features):
+    """Pipeline sin entrenar (preprocesador + XGBoost)."""
+    # El preprocesador se asegura de que solo se usen las columnas numéricas.
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', 'passthrough', features)
+        ])
+
+    # El modelo XGBoost con los mejores parámetros
+    model = XGBClassifier(objective='multi:softmax', num_class=3, use_label_encoder=False, eval_metric='mlogloss', random_state=42)
+
+    # Unimos el preprocesador y el modelo en un único Pipeline
+    return Pipeline(steps=[('preprocessor', preprocessor),
+                           ('classifier', model)])
+
+
+def entrenar_pipeline(df, features=numeric_features, balanceo='smote'):
+    """
+    Trata el desbalance de clases según `balanceo` ('smote', 'pesos' o 'ninguno', ver
+    fragilidad/balanceo.py) y entrena el pipeline (preprocesador + XGBoost).
+    """
+    X_full = df[features]
+    y_full = df['frailty_status']
+
+    # --- Balancear los Datos ---
+    X_train, y_train, pesos = balancear(X_full, y_full, balanceo)
+    if balanceo == 'smote':
+        print(f"Datos balanceados con SMOTE, total de filas: {X_train.shape[0]}")
+    elif balanceo == 'pesos':
+        print(f"Clases equilibradas con pesos por fila, sin remuestrear ({X_train.shape[0]} filas)")
+
+    # --- Entrenar el Pipeline Completo ---
+    final_pipeline = crear_pipeline(features)
+    if pesos is None:
+        final_pipeline.fit(X_train, y_train)
+    else:
+        final_pipeline.fit(X_train, y_train, classifier__sample_weight=pesos)
+    print("Pipeline final (preprocesador + modelo) entrenado.")
+    return final_pipeline
+
+
+def comprobar_exportaciones(df, rutas):
+    """
+    Compara cada pipeline ya guardado en `rutas` con su 'fragility_pipeline.onnx' sobre `df`,
+    sin reentrenar. Devuelve True si todos se exportaron de ese .joblib y sus probabilidades
+    difieren como mucho TOLERANCIA_PARIDAD.
+    """
+    correctos = True
+    for ruta in rutas:
+        try:
+            pipeline = cargar_modelo(ruta, 'joblib')
+            modelo = ModeloONNX(ruta_onnx(ruta))
+        except (FileNotFoundError, ImportError) as e:
+            print(f"⚠ {ruta}: no se puede comparar ({e}).")
+            correctos = False
+            continue
+        columnas = columnas_modelo(pipeline)
+        datos = df if set(columnas) <= set(df.columns) else calcular_temporales(df, usuario='id_usuario', fecha='fecha_comun')
+        diferencia = comprobar_paridad(pipeline, modelo, datos[columnas])
+        al_dia = modelo.huella_pipeline == huella(ruta)
+        correcto = al_dia and diferencia <= TOLERANCIA_PARIDAD
+        correctos &= correcto
+        print(f"{'✓' if correcto else '⚠'} {ruta}: diferencia máxima {diferencia:.1e} (tolerancia {TOLERANCIA_PARIDAD:.0e})"
+              + ("" if al_dia else "; el .onnx no se exportó de este .joblib"))
+    return correctos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrena y guarda el pipeline de fragilidad.")
+    parser.add_argument("--temporales", action='store_true',
+                        help="Añade las medias, desviaciones y pendientes de 7/14/28 días (fragilidad/temporales.py).")
+    parser.add_argument("--balanceo", choices=MODOS_BALANCEO, default='smote',
+                        help="Cómo tratar el desbalance de clases: 'smote' (por defecto) sobremuestrea, "
+                             "'pesos' pondera cada fila según su clase sin crear filas nuevas.")
+    parser.add_argument("--evaluar", action='store_true',
+                        help="Antes de entrenar, muestra la macro-F1 de una validación cruzada por usuario.")
+    parser.add_argument("--onnx", action='store_true',
+                        help="Exporta también el modelo a ONNX ('fragility_pipeline.onnx'), que se ejecuta "
+                             "solo con onnxruntime (fragilidad/inferencia.py). Requiere onnxmltools y onnxruntime.")
+    parser.add_argument("--comprobar", nargs='*', metavar='PIPELINE',
+                        help="No entrena: comprueba que el .onnx de cada pipeline ya guardado (por defecto "
+                             "'fragility_pipeline.joblib') da sus mismas probabilidades sobre 'dataset_preparado.csv'. "
+                             "Termina con código 1 si alguno no coincide.")
+    args = parser.parse_args()
+
+    if args.comprobar is None:
+        print("Iniciando el entrenamiento del pipeline final...")
+
+    # --- 1. Cargar el Dataset ---
+    # Con las características derivadas y móviles de fragilidad/caracteristicas.py, que se
+    # guardan junto al CSV y solo se recalculan si el fichero cambia
+    try:
+        df = cargar_con_caracteristicas('dataset_preparado.csv', 'dataset_consolidado')
+        print("Archivo 'dataset_preparado.csv' cargado.")
+    except FileNotFoundError:
+        print("Error: No se encontro el archivo 'dataset_preparado.csv'.")
+        exit()
+
+    if args.comprobar is not None:
+        sys.exit(0 if comprobar_exportaciones(df, args.comprobar or ['fragility_pipeline.joblib']) else 1)
+
+    # --- 2. Entrenar el Pipeline ---
+    features = numeric_features
+    # Mediana de cada variable en la población de entrenamiento (antes de balancear). La Interfaz
+    # las usa para rellenar NaN en lugar de recalcularlas con los pocos días de un paciente.
+    estadisticas = calcular_estadisticas(df, numeric_features)
+    if args.temporales:
+        # Los primeros días de cada usuario no tienen desviación ni pendiente: SMOTE no admite NaN,
+        # así que se rellenan con la mediana, igual que hará la Interfaz
+        df = calcular_temporales(df, usuario='id_usuario', fecha='fecha_comun')
+        features = numeric_features + COLUMNAS_TEMPORALES
+        estadisticas.update(calcular_estadisticas(df, COLUMNAS_TEMPORALES))
+        df = imputar(df, {columna: estadisticas[columna] for columna in COLUMNAS_TEMPORALES if columna in estadisticas})
+        print(f"Características temporales añadidas: {len(COLUMNAS_TEMPORALES)} columnas.")
 
-# --- 4. Crear el Pipeline ---
-# El preprocesador se asegura de que solo se usen las columnas numéricas.
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', 'passthrough', numeric_features)
-    ])
+    if args.evaluar:
+        f1 = validacion_cruzada_agrupada(df, features, lambda: crear_pipeline(features), args.balanceo)
+        print(f"Macro-F1 (validación cruzada por usuario, {len(f1)} folds, balanceo '{args.balanceo}'): "
+              f"{f1.mean():.3f} ± {f1.std():.3f}")
 
-# El modelo XGBoost con los mejores parámetros
-model = XGBClassifier(objective='multi:softmax', num_class=3, use_label_encoder=False, eval_metric='mlogloss', random_state=42)
+    final_pipeline = entrenar_pipeline(df, features, args.balanceo)
 
-# Unimos el preprocesador y el modelo en un único Pipeline
-final_pipeline = Pipeline(steps=[('preprocessor', preprocessor),
-                                 ('classifier', model)])
+    # --- 3. Guardar el Pipeline ---
+    pipeline_filename = 'fragility_pipeline.joblib'
+    joblib.dump(final_pipeline, pipeline_filename)
 
-# --- 5. Entrenar el Pipeline Completo ---
-final_pipeline.fit(X_resampled, y_resampled)
-print("Pipeline final (preprocesador + modelo) entrenado.")
+    print(f"\n¡Listo! Pipeline guardado exitosamente como '{pipeline_filename}'")
 
-# --- 6. Guardar el Pipeline ---
-pipeline_filename = 'fragility_pipeline.joblib'
-joblib.dump(final_pipeline, pipeline_filename)
+    # --- 4. Guardar las Estadísticas de Imputación ---
+    guardar_estadisticas(estadisticas, ESTADISTICAS_FILENAME, filas=len(df))
+    print(f"Estadísticas de imputación guardadas en '{ESTADISTICAS_FILENAME}' (cópialo junto al pipeline en la Interfaz)")
 
-print(f"\n¡Listo! Pipeline guardado exitosamente como '{pipeline_filename}'")
\ No newline at end of file
+    # --- 5. Exportar a ONNX ---
+    if args.onnx:
+        try:
+            onnx_filename = exportar_onnx(final_pipeline, pipeline_filename)
+            diferencia = comprobar_paridad(final_pipeline, ModeloONNX(onnx_filename), df[features])
+        except ImportError as e:
+            print(f"Error: la exportación a ONNX necesita onnxmltools y onnxruntime ({e}).")
+            sys.exit(1)
+        if diferencia > TOLERANCIA_PARIDAD:
+            os.remove(onnx_filename)
+            print(f"Error: las probabilidades de ONNX difieren hasta {diferencia:.2e} de las del pipeline; no se guarda.")
+            sys.exit(1)
+        print(f"Modelo ONNX guardado como '{onnx_filename}' (diferencia máxima con el pipeline: {diferencia:.1e}). "
+              f"Cópialo junto al pipeline en la Interfaz.")
@@ -1,11 +1,23 @@
+import argparse
+import os
+import sys
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import matplotlib.pyplot as plt
 import seaborn as sns
-from imblearn.over_sampling import SMOTE
 # Importar el nuevo clasificador
-from xgboost import XGBClassifier
+from xgboost import DMatrix, XGBClassifier
+
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fragilidad.balanceo import MODOS_BALANCEO, balancear
+from fragilidad.explicaciones import importancia_global
+
+parser = argparse.ArgumentParser(description="Entrena y evalúa el modelo XGBoost con una división por usuario.")
+parser.add_argument("--balanceo", choices=MODOS_BALANCEO, default='smote',
+                    help="Cómo tratar el desbalance de clases: 'smote' (por defecto) o 'pesos' por clase en el fit.")
+args = parser.parse_args()
 
 # --- 1. Cargar el Dataset Preparado ---
 try:
@@ -29,10 +41,10 @@ test_indices = df[df['id_usuario'].isin(test_user_ids)].index
 X_train, X_test = X.loc[train_indices], X.loc[test_indices]
 y_train, y_test = y.loc[train_indices], y.loc[test_indices]
 
-# --- 4. Aplicar SMOTE (Solo a los datos de entrenamiento) ---
-smote = SMOTE(random_state=42)
-X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
-print(f"Set de entrenamiento balanceado con SMOTE: {X_train_resampled.shape[0]} filas")
+# --- 4. Balancear las Clases (Solo en los datos de entrenamiento) ---
+# Con SMOTE se crean filas sintéticas; con 'pesos' cada fila pondera según la frecuencia de su clase
+X_train_resampled, y_train_resampled, sample_weight = balancear(X_train, y_train, args.balanceo)
+print(f"Set de entrenamiento balanceado ({args.balanceo}): {X_train_resampled.shape[0]} filas")
 
 # --- 5. Entrenar el Modelo con XGBoost ---
 # Se inicializa el clasificador XGBoost
@@ -40,7 +52,7 @@ print(f"Set de entrenamiento balanceado con SMOTE: {X_train_resampled.shape[0]}
 model = XGBClassifier(objective='multi:softmax', num_class=3, use_label_encoder=False, eval_metric='mlogloss', random_state=42)
 
 # Se entrena el modelo con los datos balanceados
-model.fit(X_train_resampled, y_train_resampled)
+model.fit(X_train_resampled, y_train_resampled, sample_weight=sample_weight)
 print("Modelo XGBoost entrenado.")
 
 # --- 6. Evaluar el Modelo ---
@@ -73,6 +85,12 @@ feature_importances = pd.Series(model.feature_importances_, index=X.columns).sor
 # Imprimir las 10 más importantes
 print(feature_importances.head(10))
 
+# Contribución SHAP media (en valor absoluto) en el conjunto de test, con el modo pred_contribs
+# del booster: la misma medida que explica cada predicción en la Interfaz
+contribuciones = model.get_booster().predict(DMatrix(X_test), pred_contribs=True)
+print("\nContribución SHAP media |valor| en el conjunto de test:")
+print(importancia_global(contribuciones, list(X.columns)).head(10))
+
 # Crear un gráfico de barras para visualizar
 plt.figure(figsize=(10, 8))
 sns.barplot(x=feature_importances, y=feature_importances.index, palette='viridis')
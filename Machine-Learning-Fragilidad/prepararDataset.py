@@ -1,10 +1,16 @@
+import os
+import sys
 import pandas as pd
 
+# Raíz del repositorio en el path para poder usar el paquete compartido 'fragilidad'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fragilidad.esquemas import leer_export
+
 # --- 1. Cargar los Datasets ---
 try:
     # Carga los datos reales y los sintéticos
-    df_real = pd.read_csv('datasetRealML.csv')
-    df_sintetico = pd.read_csv('datasetIAML.csv')
+    df_real = leer_export('datasetRealML.csv', 'dataset_consolidado')
+    df_sintetico = leer_export('datasetIAML.csv', 'dataset_consolidado')
     print(" Archivos cargados correctamente.")
 except FileNotFoundError:
     print(" Error: Asegúrate de que los archivos 'datasetRealML.csv' y 'datasetIAML.csv' están en la misma carpeta.")
@@ -0,0 +1,142 @@
+# benchmark_arranque.py
+"""
+Tiempo de arranque (importación) de las herramientas de línea de órdenes, con presupuesto.
+
+Los trabajos programados lanzan estas herramientas cientos de veces al día, así que lo
+que cuesta importarlas se paga en cada ejecución. Cada punto de entrada se importa en un
+proceso nuevo con `python -X importtime` y se toma el tiempo acumulado del módulo (el
+mínimo de varias repeticiones, tras una primera que compila los .pyc). Se comprueba:
+
+- que no supere su presupuesto en milisegundos;
+- que no cargue dependencias pesadas que no necesita para arrancar (pandas, numpy,
+  msgspec, Flask...), que deben importarse en las funciones que las usan.
+
+Termina con código 1 si algún punto de entrada incumple su presupuesto.
+
+Uso:
+    python benchmarks/benchmark_arranque.py
+    python benchmarks/benchmark_arranque.py --detalle 5 --repeticiones 10
+    python benchmarks/benchmark_arranque.py --factor 2    # presupuestos x2 en máquinas lentas
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# --- Rutas del Repositorio ---
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(REPO_DIR, 'API-Polar-Accesslink-Python')
+
+# --- Presupuestos ---
+# Punto de entrada -> (directorio desde el que se importa, presupuesto en ms, módulos que no debe cargar)
+PUNTOS_ENTRADA = {
+    'accesslink': (API_DIR, 150, ['pandas', 'numpy', 'msgspec', 'flask']),
+    'example_console_app': (API_DIR, 200, ['pandas', 'numpy', 'msgspec', 'flask']),
+    'polar_temperature': (API_DIR, 200, ['pandas', 'numpy', 'msgspec', 'flask']),
+    'authorization_callback_server': (API_DIR, 350, ['pandas', 'numpy', 'msgspec']),
+    # La carga histórica trabaja con pandas desde el principio: solo se vigila el tiempo
+    'backfill': (API_DIR, 800, ['msgspec', 'flask', 'sklearn', 'xgboost']),
+}
+
+
+# --- Medición ---
+
+def importar(modulo, directorio, cwd):
+    """Importa `modulo` en un proceso nuevo y devuelve las líneas de `-X importtime` como (propio, acumulado, nombre, nivel)."""
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join([directorio, REPO_DIR]))
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                             cwd=cwd, env=entorno, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+
+    lineas = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:') or '|' not in linea:
+            continue
+        propio, acumulado, nombre = linea[len('import time:'):].split('|')
+        if not propio.strip().isdigit():
+            continue  # cabecera
+        nivel = (len(nombre) - len(nombre.lstrip(' ')) - 1) // 2  # 0: el módulo importado
+        lineas.append((int(propio), int(acumulado), nombre.strip(), nivel))
+    return lineas
+
+
+def medir_arranque(modulo, directorio, repeticiones):
+    """Mejor tiempo acumulado (ms) de importar `modulo`, los módulos cargados y sus importaciones directas."""
+    # Cada importación se hace en un directorio vacío: ninguna debe crear ficheros al arrancar
+    with tempfile.TemporaryDirectory() as cwd:
+        importar(modulo, directorio, cwd)  # compila los .pyc
+        mejor = None
+        for _ in range(repeticiones):
+            lineas = importar(modulo, directorio, cwd)
+            # Las líneas salen en postorden: las importaciones directas del módulo son las de
+            # nivel 1 desde la línea de nivel 0 anterior (p. ej. 'site') hasta la suya
+            directas = []
+            for _, acumulado, nombre, nivel in lineas:
+                if nivel == 0 and nombre == modulo:
+                    total = acumulado
+                    break
+                if nivel == 0:
+                    directas = []
+                elif nivel == 1:
+                    directas.append((acumulado / 1000, nombre))
+            if mejor is None or total < mejor['ms'] * 1000:
+                mejor = {
+                    'ms': total / 1000,
+                    'modulos': {nombre for _, _, nombre, _ in lineas},
+                    'directas': sorted(directas, reverse=True),
+                }
+        mejor['ficheros'] = os.listdir(cwd)
+    return mejor
+
+
+def comprobar(puntos, repeticiones, factor, detalle):
+    """Mide cada punto de entrada y devuelve la lista de incumplimientos."""
+    incumplimientos = []
+    print(f"{'punto de entrada':<32} {'tiempo':>10} {'presupuesto':>12}")
+    for modulo in puntos:
+        directorio, presupuesto, prohibidos = PUNTOS_ENTRADA[modulo]
+        presupuesto *= factor
+        try:
+            resultado = medir_arranque(modulo, directorio, repeticiones)
+        except RuntimeError as e:
+            print(f"{modulo:<32} ERROR {e}")
+            incumplimientos.append(f"{modulo}: no se puede importar")
+            continue
+
+        cargados = [nombre for nombre in prohibidos if nombre in resultado['modulos']]
+        marca = '✓'
+        if resultado['ms'] > presupuesto:
+            marca = '⚠ SUPERA EL PRESUPUESTO'
+            incumplimientos.append(f"{modulo}: {resultado['ms']:.1f} ms > {presupuesto:.0f} ms")
+        if cargados:
+            marca = f"⚠ CARGA {', '.join(cargados)}"
+            incumplimientos.append(f"{modulo}: importa {', '.join(cargados)} al arrancar")
+        if resultado['ficheros']:
+            marca = f"⚠ CREA {', '.join(resultado['ficheros'])}"
+            incumplimientos.append(f"{modulo}: crea {', '.join(resultado['ficheros'])} al importarse")
+        print(f"{modulo:<32} {resultado['ms']:>7.1f} ms {presupuesto:>9.0f} ms  {marca}")
+        for ms, nombre in resultado['directas'][:detalle]:
+            print(f"    {nombre:<36} {ms:>7.1f} ms")
+    return incumplimientos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de arranque de los puntos de entrada, con presupuesto.")
+    parser.add_argument("--puntos", nargs='+', choices=list(PUNTOS_ENTRADA), default=list(PUNTOS_ENTRADA),
+                        help="Puntos de entrada a medir (por defecto todos).")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones por punto de entrada (se toma el mínimo).")
+    parser.add_argument("--factor", type=float, default=1.0,
+                        help="Multiplica todos los presupuestos (para máquinas más lentas que la de referencia).")
+    parser.add_argument("--detalle", type=int, default=0,
+                        help="Muestra las N importaciones directas más lentas de cada punto de entrada.")
+    args = parser.parse_args()
+
+    incumplimientos = comprobar(args.puntos, args.repeticiones, args.factor, args.detalle)
+    if incumplimientos:
+        print("\n⚠ Presupuesto de arranque incumplido:")
+        for incumplimiento in incumplimientos:
+            print(f"  - {incumplimiento}")
+        sys.exit(1)
+    print("\n✓ Todos los puntos de entrada arrancan dentro de su presupuesto.")
@@ -0,0 +1,131 @@
+# benchmark_balanceo.py
+"""
+SMOTE frente a pesos por clase al entrenar el modelo de fragilidad.
+
+Para cada escala y modo de balanceo (fragilidad/balanceo.py) mide, con el pipeline de
+'exportMLXGBoost.py':
+
+- el tiempo de entrenamiento sobre todo el dataset (balanceo + fit, mejor de N);
+- la memoria pico de Python (tracemalloc, en una pasada aparte; incluye los arrays de
+  numpy de SMOTE pero no la memoria interna de XGBoost);
+- la macro-F1 de una validación cruzada por usuario, con el balanceo aplicado solo a los
+  folds de entrenamiento.
+
+Usa 'dataset_preparado.csv' (etiquetas reales y desbalanceadas). Las escalas mayores que 1
+replican cada usuario con otro id y un ruido del 2% en las variables; en la validación
+cruzada las copias de un usuario van siempre al mismo fold, para que la macro-F1 siga
+midiendo el acierto con usuarios no vistos.
+
+Uso:
+    python benchmarks/benchmark_balanceo.py
+    python benchmarks/benchmark_balanceo.py --escalas 1 10 100 --modos smote pesos ninguno
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# --- Rutas del Repositorio ---
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_DIR = os.path.join(REPO_DIR, 'Machine-Learning-Fragilidad')
+DATASET = os.path.join(ML_DIR, 'dataset_preparado.csv')
+
+sys.path.insert(0, REPO_DIR)
+from fragilidad.balanceo import MODOS_BALANCEO, balancear, validacion_cruzada_agrupada
+
+
+def cargar_modulo(nombre, ruta):
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def ampliar(df, escala, features, seed=42):
+    """
+    `escala` copias del dataset, cada una con sus propios usuarios y un 2% de ruido
+    multiplicativo. 'usuario_original' es el grupo de la validación cruzada.
+    """
+    df = df.assign(usuario_original=df['id_usuario'])
+    if escala == 1:
+        return df
+    rng = np.random.default_rng(seed)
+    copias = []
+    for copia in range(escala):
+        parte = df.copy()
+        parte['id_usuario'] = parte['id_usuario'].astype(str) + f'_{copia}'
+        if copia:
+            ruido = rng.normal(1.0, 0.02, (len(parte), len(features)))
+            parte[features] = parte[features].to_numpy(dtype=float) * ruido
+        copias.append(parte)
+    return pd.concat(copias, ignore_index=True)
+
+
+def entrenar(export, df, features, modo):
+    X, y, pesos = balancear(df[features], df['frailty_status'], modo)
+    pipeline = export.crear_pipeline(features)
+    if pesos is None:
+        pipeline.fit(X, y)
+    else:
+        pipeline.fit(X, y, classifier__sample_weight=pesos)
+    return len(X)
+
+
+def medir(export, df, features, modo, repeticiones, folds):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas = entrenar(export, df, features, modo)
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    entrenar(export, df, features, modo)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    f1 = validacion_cruzada_agrupada(df, features, lambda: export.crear_pipeline(features), modo,
+                                     grupo='usuario_original', n_splits=folds)
+    return {
+        'filas_entrenamiento': filas,
+        'tiempo_min_s': min(tiempos),
+        'memoria_pico_mib': pico / (1024 * 1024),
+        'macro_f1': f1.mean(),
+        'macro_f1_std': f1.std(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara SMOTE y pesos por clase en el entrenamiento.")
+    parser.add_argument("--escalas", nargs='+', type=int, default=[1, 10],
+                        help="Copias del dataset real (por defecto 1 10).")
+    parser.add_argument("--modos", nargs='+', choices=MODOS_BALANCEO, default=['smote', 'pesos'],
+                        help="Modos de balanceo a comparar (por defecto smote pesos).")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones del entrenamiento (se guarda el mínimo).")
+    parser.add_argument("--folds", type=int, default=5, help="Folds de la validación cruzada por usuario.")
+    args = parser.parse_args()
+    # XGBoost avisa en cada fit de que 'use_label_encoder' ya no se usa
+    warnings.filterwarnings('ignore', message='(?s).*use_label_encoder')
+
+    export = cargar_modulo('exportMLXGBoost', os.path.join(ML_DIR, 'exportMLXGBoost.py'))
+    features = export.numeric_features
+    base = pd.read_csv(DATASET)
+    print(f"Dataset: {len(base)} filas, {base['id_usuario'].nunique()} usuarios, "
+          f"clases {base['frailty_status'].value_counts().sort_index().to_dict()}\n")
+
+    print(f"{'modo@escala':<18} {'filas fit':>10} {'tiempo':>12} {'memoria':>13} {'macro-F1':>16}")
+    for escala in args.escalas:
+        df = ampliar(base, escala, features)
+        for modo in args.modos:
+            with contextlib.redirect_stdout(io.StringIO()):
+                r = medir(export, df, features, modo, args.repeticiones, args.folds)
+            print(f"{modo + '@' + str(escala) + 'x':<18} {r['filas_entrenamiento']:>10} "
+                  f"{r['tiempo_min_s'] * 1000:>9.1f} ms {r['memoria_pico_mib']:>9.2f} MiB "
+                  f"{r['macro_f1']:>8.3f} ± {r['macro_f1_std']:.3f}")
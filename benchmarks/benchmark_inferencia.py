@@ -0,0 +1,149 @@
+# benchmark_inferencia.py
+"""
+Inferencia con el pipeline de joblib frente a su exportación ONNX (fragilidad/inferencia.py).
+
+Cada motor se mide en un proceso nuevo, como un proceso de la Interfaz o un trabajo por
+lotes que arranca:
+
+- carga: importar lo necesario y cargar el modelo;
+- latencia de `predict_proba` para lotes de distinto tamaño (mínimo de N repeticiones);
+- memoria residente máxima del proceso (ru_maxrss), que sí incluye la de XGBoost/onnxruntime;
+- tamaño en disco de los paquetes de site-packages que ha cargado el proceso, como
+  aproximación a lo que hay que instalar en el contenedor.
+
+Además se comprueba que las probabilidades de ambos motores coinciden (TOLERANCIA_PARIDAD)
+sobre 'dataset_preparado.csv', con y sin huecos; si no, termina con código 1.
+
+Uso:
+    python benchmarks/benchmark_inferencia.py
+    python benchmarks/benchmark_inferencia.py --lotes 1 1000 100000 --repeticiones 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# --- Rutas del Repositorio ---
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INTERFAZ_DIR = os.path.join(REPO_DIR, 'Interfaz')
+PIPELINE = os.path.join(INTERFAZ_DIR, 'fragility_pipeline.joblib')
+DATASET = os.path.join(REPO_DIR, 'Machine-Learning-Fragilidad', 'dataset_preparado.csv')
+
+sys.path.insert(0, REPO_DIR)
+
+
+def tamaño_paquetes():
+    """MiB en disco de los paquetes de site-packages importados por este proceso."""
+    raices = set()
+    for modulo in list(sys.modules.values()):
+        ruta = getattr(modulo, '__file__', None) or ''
+        if 'site-packages' not in ruta:
+            continue
+        base, resto = ruta.split('site-packages' + os.sep, 1)
+        raices.add(os.path.join(base, 'site-packages', resto.split(os.sep)[0]))
+    total = 0
+    for raiz in raices:
+        if os.path.isfile(raiz):
+            total += os.path.getsize(raiz)
+            continue
+        for carpeta, _, ficheros in os.walk(raiz):
+            total += sum(os.path.getsize(os.path.join(carpeta, f)) for f in ficheros)
+    return total / (1024 * 1024)
+
+
+def medir_motor(motor, lotes, repeticiones):
+    """Se ejecuta en el proceso hijo: carga el modelo con `motor` y mide cada tamaño de lote."""
+    import resource
+
+    inicio = time.perf_counter()
+    from fragilidad.inferencia import cargar_modelo, columnas_modelo
+    modelo = cargar_modelo(PIPELINE, motor)
+    carga = time.perf_counter() - inicio
+
+    import numpy as np
+    import pandas as pd
+    columnas = columnas_modelo(modelo)
+    base = pd.read_csv(DATASET, usecols=columnas)
+    rng = np.random.default_rng(0)
+
+    latencias = {}
+    for n in lotes:
+        X = base.iloc[rng.integers(0, len(base), n)].reset_index(drop=True)
+        modelo.predict_proba(X)  # calentamiento
+        tiempos = []
+        for _ in range(repeticiones):
+            t = time.perf_counter()
+            modelo.predict_proba(X)
+            tiempos.append(time.perf_counter() - t)
+        latencias[n] = min(tiempos)
+
+    return {
+        'modelo': type(modelo).__name__,
+        'carga_s': carga,
+        'latencias_s': latencias,
+        'rss_max_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'paquetes_mib': tamaño_paquetes(),
+    }
+
+
+def ejecutar_hijo(motor, lotes, repeticiones):
+    proceso = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--hijo', motor, '--lotes', *map(str, lotes),
+         '--repeticiones', str(repeticiones)],
+        capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def comprobar():
+    """Diferencia máxima entre las probabilidades de los dos motores, en este proceso."""
+    import pandas as pd
+    from fragilidad.inferencia import cargar_modelo, columnas_modelo, comprobar_paridad
+    pipeline = cargar_modelo(PIPELINE, 'joblib')
+    return comprobar_paridad(pipeline, cargar_modelo(PIPELINE, 'onnx'),
+                             pd.read_csv(DATASET, usecols=columnas_modelo(pipeline)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara la inferencia con joblib y con ONNX.")
+    parser.add_argument("--lotes", nargs='+', type=int, default=[1, 100, 10000],
+                        help="Filas por llamada a predict_proba (por defecto 1 100 10000).")
+    parser.add_argument("--repeticiones", type=int, default=10, help="Repeticiones por lote (se guarda el mínimo).")
+    parser.add_argument("--hijo", choices=['joblib', 'onnx'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        import warnings
+        warnings.filterwarnings('ignore')  # aviso de XGBoost al cargar un pickle de otra versión
+        print(json.dumps(medir_motor(args.hijo, args.lotes, args.repeticiones)))
+        sys.exit(0)
+
+    # Los hijos se lanzan antes de cargar nada aquí: ru_maxrss se hereda del proceso padre
+    resultados = {}
+    for motor in ('joblib', 'onnx'):
+        try:
+            resultados[motor] = ejecutar_hijo(motor, args.lotes, args.repeticiones)
+        except RuntimeError as e:
+            print(f"⚠ No se puede usar el motor {motor} ({e}). Exporta el modelo con "
+                  f"'exportMLXGBoost.py --onnx' e instala onnxruntime.")
+            sys.exit(1)
+
+    import warnings
+    warnings.filterwarnings('ignore')
+    from fragilidad.inferencia import TOLERANCIA_PARIDAD
+    diferencia = comprobar()
+    marca = '✓' if diferencia <= TOLERANCIA_PARIDAD else '⚠'
+    print(f"{marca} Paridad: diferencia máxima de probabilidades {diferencia:.1e} (tolerancia {TOLERANCIA_PARIDAD:.0e})\n")
+
+    cabecera = f"{'motor':<8} {'carga':>10} " + ' '.join(f"{f'lote {n}':>12}" for n in args.lotes) + \
+               f" {'RSS máx':>10} {'paquetes':>10}"
+    print(cabecera)
+    for motor, r in resultados.items():
+        latencias = ' '.join(f"{r['latencias_s'][str(n)] * 1000:>9.2f} ms" for n in args.lotes)
+        print(f"{motor:<8} {r['carga_s'] * 1000:>7.0f} ms {latencias} {r['rss_max_mib']:>6.0f} MiB "
+              f"{r['paquetes_mib']:>6.0f} MiB")
+    if diferencia > TOLERANCIA_PARIDAD:
+        sys.exit(1)
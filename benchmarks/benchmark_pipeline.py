@@ -0,0 +1,631 @@
+# benchmark_pipeline.py
+"""
+Benchmark reproducible de las etapas principales del pipeline de fragilidad.
+
+Genera datos sintéticos a escala 1x, 10x y 100x, mide tiempo y memoria pico de
+cada etapa y guarda los resultados en 'benchmarks/resultados/' junto con el
+commit actual, para poder comparar entre commits y detectar regresiones.
+
+Uso:
+    python benchmarks/benchmark_pipeline.py
+    python benchmarks/benchmark_pipeline.py --escalas 1 10 --etapas entrenamiento prediccion
+    python benchmarks/benchmark_pipeline.py --comparar --umbral 1.2
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# --- Rutas del Repositorio ---
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(REPO_DIR, 'API-Polar-Accesslink-Python')
+EXPORT_DIR = os.path.join(API_DIR, 'archivos_exportados')
+INTERFAZ_DIR = os.path.join(REPO_DIR, 'Interfaz')
+ML_DIR = os.path.join(REPO_DIR, 'Machine-Learning-Fragilidad')
+RESULTADOS_DIR = os.path.join(REPO_DIR, 'benchmarks', 'resultados')
+
+# --- Tamaño Base (escala 1x) ---
+N_USUARIOS_BASE = 25
+N_DIAS_BASE = 30
+SNAPSHOTS_POR_DIA = 4
+FECHA_INICIO = datetime(2025, 6, 1)
+
+NUMERIC_FEATURES = [
+    'age', 'active-steps', 'active-calories', 'calories', 'duration_minutes',
+    'heart_rate_avg', 'heart_rate_variability_avg', 'ans_charge', 'sleep_score',
+    'light_sleep_min', 'deep_sleep_min', 'rem_sleep_min', 'interruptions_min',
+    'breathing_rate_avg', 'temp_amplitude'
+]
+
+
+def cargar_modulo(nombre, ruta):
+    """Importa un script del repositorio a partir de su ruta (hay nombres repetidos entre carpetas)."""
+    spec = importlib.util.spec_from_file_location(nombre, ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+# --- Generación de Datos Sintéticos ---
+
+def generar_dataset(n_filas, seed=42):
+    """Dataset consolidado (una fila por día y usuario) con la misma forma que 'dataset_preparado.csv'."""
+    rng = np.random.default_rng(seed)
+    n_usuarios = max(1, n_filas // N_DIAS_BASE)
+    usuarios = np.repeat(np.arange(1, n_usuarios + 1), N_DIAS_BASE)[:n_filas]
+    fechas = pd.date_range(FECHA_INICIO, periods=N_DIAS_BASE, freq='D').strftime('%Y-%m-%d')
+    steps = rng.integers(500, 13000, n_filas)
+    active_calories = steps * rng.uniform(0.03, 0.05, n_filas)
+
+    df = pd.DataFrame({
+        'id_usuario': usuarios,
+        'age': rng.integers(65, 81, n_usuarios)[usuarios - 1],
+        'fecha_comun': np.tile(fechas, n_usuarios)[:n_filas],
+        'active-steps': steps,
+        'active-calories': active_calories.round(1),
+        'calories': (active_calories + rng.uniform(1400, 2200, n_filas)).round(1),
+        'duration_minutes': rng.uniform(30, 120, n_filas).round(),
+        'heart_rate_avg': rng.uniform(55, 85, n_filas).round(1),
+        'heart_rate_variability_avg': rng.uniform(15, 65, n_filas).round(1),
+        'ans_charge': rng.uniform(20, 100, n_filas).round(1),
+        'sleep_score': rng.uniform(45, 90, n_filas).round(1),
+        'light_sleep_min': rng.integers(100, 300, n_filas),
+        'deep_sleep_min': rng.integers(30, 120, n_filas),
+        'rem_sleep_min': rng.integers(40, 160, n_filas),
+        'interruptions_min': rng.integers(0, 30, n_filas),
+        'breathing_rate_avg': rng.uniform(12, 20, n_filas).round(1),
+        'temp_amplitude': rng.uniform(0.3, 1.0, n_filas).round(2),
+    })
+    df['frailty_status'] = rng.integers(0, 3, n_filas)
+    return df
+
+
+def generar_exports(directorio, n_dias, seed=42):
+    """Escribe los 4 CSV exportados (actividad, recarga, sueño, temperatura) de un único usuario."""
+    rng = np.random.default_rng(seed)
+    fechas = pd.date_range(FECHA_INICIO, periods=n_dias, freq='D').strftime('%Y-%m-%d')
+    steps = rng.integers(500, 13000, n_dias)
+    duration = rng.integers(30, 600, n_dias)
+    calories = rng.integers(1400, 2600, n_dias)
+    active_calories = rng.integers(50, 900, n_dias)
+
+    rutas = {
+        'actividades': os.path.join(directorio, 'polar_daily_activities.csv'),
+        'recarga': os.path.join(directorio, 'polar_recharge_summary.csv'),
+        'sueno': os.path.join(directorio, 'polar_sleep_summary.csv'),
+        'temperatura': os.path.join(directorio, 'body_temperature_summary.csv'),
+    }
+    pd.DataFrame({
+        'id': np.arange(n_dias) + 3391495298, 'date': fechas, 'active-steps': steps,
+        'active-calories': active_calories, 'calories': calories, 'duration_minutes': duration,
+        'steps_per_minute': (steps / duration).round(2),
+        'calories_per_step': (calories / steps).round(4),
+        'active_calories_per_minute': (active_calories / duration).round(2),
+    }).to_csv(rutas['actividades'], index=False)
+    pd.DataFrame({
+        'date': fechas, 'polar_user': 62739880,
+        'heart_rate_avg': rng.integers(55, 85, n_dias),
+        'heart_rate_variability_avg': rng.integers(15, 80, n_dias),
+        'nightly_recharge_status': rng.integers(1, 6, n_dias),
+        'ans_charge': rng.uniform(-10, 10, n_dias).round(1),
+        'ans_charge_status': rng.integers(1, 6, n_dias),
+        'beat_to_beat_avg': rng.integers(700, 1000, n_dias),
+        'breathing_rate_avg': rng.uniform(12, 20, n_dias).round(1),
+    }).to_csv(rutas['recarga'], index=False)
+    pd.DataFrame({
+        'date': fechas, 'start_time': '23:30:00', 'end_time': '07:15:00',
+        'light_sleep_min': rng.uniform(100, 300, n_dias).round(1),
+        'deep_sleep_min': rng.uniform(30, 120, n_dias).round(1),
+        'rem_sleep_min': rng.uniform(40, 160, n_dias).round(1),
+        'sleep_score': rng.integers(45, 90, n_dias),
+        'interruptions_min': rng.uniform(0, 60, n_dias).round(1),
+    }).to_csv(rutas['sueno'], index=False)
+    temp_mean = rng.uniform(33, 36, n_dias)
+    pd.DataFrame({
+        'date': fechas, 'temp_mean': temp_mean.round(4), 'temp_max': (temp_mean + 1).round(4),
+        'temp_min': (temp_mean - 1).round(4), 'temp_std': rng.uniform(0.1, 2, n_dias).round(4),
+        'temp_deviation_mean': 0.0, 'temp_deviation_max': rng.uniform(0.5, 3, n_dias).round(4),
+        'temp_amplitude': rng.uniform(0.3, 10, n_dias).round(4),
+        'num_samples': 288, 'duration_hours': 0.0,
+    }).to_csv(rutas['temperatura'], index=False, encoding='utf-8-sig')
+    return rutas
+
+
+def generar_datos_externos(directorio, n_usuarios, seed=42):
+    """Escribe 'usuarios.csv' y los 4 CSV multi-snapshot que consume 'DatosUsuariosExternos/unir_BBDD.py'."""
+    generar_exports(directorio, n_usuarios * N_DIAS_BASE, seed)
+    rng = np.random.default_rng(seed)
+
+    inicios = pd.date_range(FECHA_INICIO, periods=n_usuarios, freq=f'{N_DIAS_BASE}D')
+    usuarios = pd.DataFrame({
+        'id_usuario': [f'usuario_{i}' for i in range(1, n_usuarios + 1)],
+        'user_id_polar': 62739880,
+        'fecha_inicio': inicios.strftime('%Y-%m-%d'),
+        'fecha_fin': (inicios + pd.Timedelta(days=N_DIAS_BASE - 1)).strftime('%Y-%m-%d'),
+        'fecha_nacimiento': '1955-01-01', 'sexo': 'M', 'peso_kg': 60, 'altura_cm': 160,
+    })
+    usuarios.to_csv(os.path.join(directorio, 'usuarios.csv'), index=False)
+
+    # La actividad externa trae varias capturas intradía por fecha
+    actividad = pd.read_csv(os.path.join(directorio, 'polar_daily_activities.csv'))
+    actividad = actividad.loc[actividad.index.repeat(SNAPSHOTS_POR_DIA)].reset_index(drop=True)
+    factor = rng.uniform(0.25, 1.0, len(actividad))
+    for col in ['active-steps', 'active-calories', 'calories', 'duration_minutes']:
+        actividad[col] = (actividad[col] * factor).round()
+    hora = actividad.groupby('date').cumcount() * (20 // SNAPSHOTS_POR_DIA) + 4
+    actividad['created'] = actividad['date'] + 'T' + hora.map('{:02d}:00:00.000'.format)
+    actividad.to_csv(os.path.join(directorio, 'polar_daily_activities_util.csv'), index=False)
+    os.replace(os.path.join(directorio, 'body_temperature_summary.csv'),
+               os.path.join(directorio, 'temperatura_procesada.csv'))
+
+
+def generar_resumenes_api(n_dias, seed=42):
+    """Respuestas simuladas de la API (actividad con capturas intradía, sueño y recarga)."""
+    rng = np.random.default_rng(seed)
+    fechas = pd.date_range(FECHA_INICIO, periods=n_dias, freq='D').strftime('%Y-%m-%d')
+
+    actividades = {}
+    for i, fecha in enumerate(fechas):
+        for j in range(SNAPSHOTS_POR_DIA):
+            url = f"https://www.polaraccesslink.com/v3/users/1/activity-transactions/1/activities/{i}_{j}"
+            actividades[url] = {
+                'id': i * SNAPSHOTS_POR_DIA + j, 'date': fecha,
+                'active-steps': int(rng.integers(0, 13000)), 'active-calories': int(rng.integers(0, 900)),
+                'calories': int(rng.integers(1400, 2600)), 'duration': f"PT{rng.integers(0, 10)}H{rng.integers(0, 60)}M",
+            }
+    sueno = {'nights': [{
+        'date': fecha, 'sleep_start_time': f"{fecha}T23:30:00.000+02:00",
+        'sleep_end_time': f"{fecha}T07:15:00.000+02:00", 'light_sleep': 12000, 'deep_sleep': 4000,
+        'rem_sleep': 5000, 'sleep_score': 80, 'total_interruption_duration': 1500,
+    } for fecha in fechas]}
+    recarga = {'recharges': [{
+        'date': fecha, 'polar_user': 'https://www.polaraccesslink.com/v3/users/1', 'heart_rate_avg': 60,
+        'heart_rate_variability_avg': 40, 'nightly_recharge_status': 4, 'ans_charge': 2.5,
+        'ans_charge_status': 3, 'beat_to_beat_avg': 900, 'breathing_rate_avg': 14.5,
+    } for fecha in fechas]}
+    return actividades, sueno, recarga
+
+
+class _TransaccionSimulada(object):
+    """Sustituye a DailyActivityTransaction sin hacer peticiones HTTP."""
+
+    transaction_url = "https://www.polaraccesslink.com/v3/users/1/activity-transactions/1"
+
+    def __init__(self, actividades):
+        self.actividades = actividades
+
+    def list_activities(self):
+        return {'activity-log': list(self.actividades)}
+
+    def get_activity_summary(self, url, typed=False):
+        from accesslink.models import ActivitySummary
+        return ActivitySummary.from_dict(self.actividades[url]) if typed else self.actividades[url]
+
+    def commit(self):
+        return {}
+
+
+class _AccessLinkSimulado(object):
+
+    def __init__(self, actividades):
+        self.daily_activity = self
+        self.users = self
+        self.actividades = actividades
+
+    def create_transaction(self, user_id, access_token):
+        return _TransaccionSimulada(self.actividades)
+
+    def get_information(self, user_id, access_token):
+        return {'birthdate': '1950-01-01'}
+
+
+# --- Etapas ---
+# Cada etapa recibe (escala, directorio temporal) y devuelve una función sin argumentos a medir.
+
+def etapa_exportacion_api(escala, directorio):
+    sys.path.insert(0, API_DIR)
+    from accesslink.models import NightlyRecharge, SleepNight, decode
+    from puntuacion import PuntuadorContinuo
+    consola = cargar_modulo('example_console_app', os.path.join(API_DIR, 'example_console_app.py'))
+    actividades, sueno, recarga = generar_resumenes_api(N_DIAS_BASE * escala)
+    # Sueño y recarga como los devuelve get_sleep / get_recharge con typed=True
+    sueno = decode(json.dumps(sueno).encode(), SleepNight, 'nights')
+    recarga = decode(json.dumps(recarga).encode(), NightlyRecharge, 'recharges')
+    app = consola.PolarAccessLinkExample.__new__(consola.PolarAccessLinkExample)
+    app.config = {'user_id': 1, 'access_token': 'token'}
+    app.accesslink = _AccessLinkSimulado(actividades)
+    app.puntuador = PuntuadorContinuo(export_folder=os.path.join(directorio, 'archivos_exportados'))
+
+    def ejecutar():
+        os.chdir(directorio)
+        for nombre in ['polar_daily_activities.csv', 'polar_sleep_summary.csv', 'polar_recharge_summary.csv']:
+            ruta = os.path.join('archivos_exportados', nombre)
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        app.get_daily_activity()
+        app.export_sleep_summary(sueno)
+        app.export_recharge_summary(recarga)
+    return ejecutar
+
+
+def _cuerpos_api(escala):
+    """Cuerpos JSON (bytes) de los resúmenes de actividad y de la lista de noches, como llegan por HTTP."""
+    actividades, sueno, _ = generar_resumenes_api(N_DIAS_BASE * escala * N_USUARIOS_BASE)
+    return [json.dumps(resumen).encode() for resumen in actividades.values()], json.dumps(sueno).encode()
+
+
+def etapa_decodificacion(escala, directorio):
+    sys.path.insert(0, API_DIR)
+    from accesslink.models import ActivitySummary, SleepNight, decode
+    cuerpos, noches = _cuerpos_api(escala)
+    # Los registros se conservan, como en una ventana de backfill, para medir también su memoria
+    return lambda: ([decode(cuerpo, ActivitySummary) for cuerpo in cuerpos], decode(noches, SleepNight, 'nights'))
+
+
+def etapa_decodificacion_dict(escala, directorio):
+    # Referencia: la decodificación a dicts que se usaba antes (response.json())
+    cuerpos, noches = _cuerpos_api(escala)
+    return lambda: ([json.loads(cuerpo) for cuerpo in cuerpos], json.loads(noches))
+
+
+def etapa_union_exports(escala, directorio):
+    unir = cargar_modulo('unir_BBDD', os.path.join(EXPORT_DIR, 'unir_BBDD.py'))
+    rutas = generar_exports(directorio, N_DIAS_BASE * escala)
+    salida = os.path.join(directorio, 'datos_smartwatch.csv')
+    return lambda: unir.unir_archivos(rutas, salida)
+
+
+def etapa_union_externos(escala, directorio):
+    unir = cargar_modulo('unir_BBDD_externos', os.path.join(EXPORT_DIR, 'DatosUsuariosExternos', 'unir_BBDD.py'))
+    generar_datos_externos(directorio, N_USUARIOS_BASE * escala)
+    archivos = {nombre: dict(config, path=os.path.join(directorio, config['path']))
+                for nombre, config in unir.ARCHIVOS_DATOS.items()}
+    usuarios = dict(unir.ARCHIVO_USUARIOS, path=os.path.join(directorio, 'usuarios.csv'))
+    salida = os.path.join(directorio, 'datos_smartwatch.csv')
+    return lambda: unir.unir_bases_de_datos(archivos, usuarios, salida)
+
+
+def etapa_clasificacion(escala, directorio):
+    clasificacion = cargar_modulo('clasificacion_fragilidad', os.path.join(EXPORT_DIR, 'clasificacion_fragilidad.py'))
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala)
+    return lambda: df.apply(clasificacion.classify_frailty_by_rules, axis=1)
+
+
+def etapa_preparar_dataframe(escala, directorio):
+    preparar = cargar_modulo('prepararDF', os.path.join(INTERFAZ_DIR, 'prepararDF.py'))
+    rutas = generar_exports(directorio, N_DIAS_BASE * escala)
+    salida = os.path.join(directorio, 'datos_consolidados.csv')
+    return lambda: preparar.preparar_dataframe(rutas['actividades'], rutas['recarga'], rutas['sueno'],
+                                               rutas['temperatura'], salida)
+
+
+def etapa_preparar_dataframe_bloques(escala, directorio):
+    preparar = cargar_modulo('prepararDF', os.path.join(INTERFAZ_DIR, 'prepararDF.py'))
+    rutas = generar_exports(directorio, N_DIAS_BASE * escala)
+    salida = os.path.join(directorio, 'datos_consolidados.csv')
+    return lambda: preparar.preparar_dataframe_por_bloques(rutas['actividades'], rutas['recarga'], rutas['sueno'],
+                                                           rutas['temperatura'], salida, chunksize=1000)
+
+
+def etapa_metricas_actividad(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.duraciones import metricas_actividad
+    rng = np.random.default_rng(0)
+    n_filas = N_USUARIOS_BASE * N_DIAS_BASE * SNAPSHOTS_POR_DIA * escala
+    df = pd.DataFrame({
+        'duration': [f"PT{h}H{m}M{s}S" for h, m, s in zip(rng.integers(0, 10, n_filas), rng.integers(0, 60, n_filas),
+                                                         rng.integers(0, 60, n_filas))],
+        'active-steps': rng.integers(0, 15000, n_filas),
+        'active-calories': rng.integers(0, 900, n_filas),
+        'calories': rng.integers(1400, 2600, n_filas),
+    })
+    return lambda: metricas_actividad(df)
+
+
+def etapa_caracteristicas(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.caracteristicas import calcular_caracteristicas
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala)
+    return lambda: calcular_caracteristicas(df.copy(), recalcular=True)
+
+
+def etapa_temporales(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.temporales import calcular_temporales
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala)
+    return lambda: calcular_temporales(df.copy(), recalcular=True)
+
+
+def etapa_puntuacion(escala, directorio):
+    sys.path.insert(0, API_DIR)
+    puntuacion = cargar_modulo('puntuacion', os.path.join(API_DIR, 'puntuacion.py'))
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala).rename(columns={'fecha_comun': 'date'})
+    lotes = [(usuario, fuente, grupo[['date'] + [c for c in columnas if c in grupo.columns]].to_dict('records'))
+             for usuario, grupo in df.groupby('id_usuario')
+             for fuente, columnas in puntuacion.COLUMNAS_FUENTE.items()]
+
+    def ejecutar():
+        carpeta = tempfile.mkdtemp(dir=directorio)
+        puntuador = puntuacion.PuntuadorContinuo(export_folder=carpeta)
+        for usuario, fuente, filas in lotes:
+            puntuador.añadir(usuario, fuente, filas)
+        puntuador.puntuar(hoy='2100-01-01')
+    return ejecutar
+
+
+def etapa_muestras(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.muestras import AlmacenMuestras
+    rng = np.random.default_rng(0)
+    # Un ejercicio de una hora al día, con pulso cada segundo, tal como lo devuelve get_samples
+    ejercicios = []
+    for dia in range(N_DIAS_BASE * escala):
+        inicio = FECHA_INICIO + timedelta(days=dia, hours=18)
+        pulso = rng.integers(60, 180, 3600)
+        ejercicios.append(({'id': dia, 'start-time': inicio.isoformat()},
+                           [{'sample-type': '0', 'recording-rate': 1, 'data': ','.join(map(str, pulso))}]))
+
+    def ejecutar():
+        almacen = AlmacenMuestras(tempfile.mkdtemp(dir=directorio))
+        for ejercicio, muestras in ejercicios:
+            almacen.guardar_ejercicio('u1', ejercicio, muestras)
+        # Los 10 primeros minutos de cada ejercicio, leídos del disco sin copiar
+        for ejercicio, _ in ejercicios:
+            desde = pd.Timestamp(ejercicio['start-time'])
+            for bloque in almacen.bloques('u1', 'heart_rate', desde, desde + pd.Timedelta(minutes=10)):
+                bloque.valores.mean()
+    return ejecutar
+
+
+def etapa_ejercicios(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.ejercicios import analizar_ejercicios
+    rng = np.random.default_rng(0)
+    # Un ejercicio de una hora al día: pulso cada segundo e intervalos RR latido a latido
+    ejercicios = [{'id': dia, 'inicio': (FECHA_INICIO + timedelta(days=dia, hours=18)).isoformat(),
+                   'hr': rng.normal(130, 20, 3600).round(), 'intervalo_s': 1.0,
+                   'rr': rng.normal(480, 40, 7500)}
+                  for dia in range(N_DIAS_BASE * escala)]
+    return lambda: analizar_ejercicios(ejercicios, fc_reposo=60, fc_max=190)
+
+
+def etapa_recorridos(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.recorridos import caracteristicas_recorrido, leer_tcx
+    # Un paseo de 2 horas por escala, con un punto por segundo, como lo exporta get_tcx
+    ruta = os.path.join(directorio, 'paseo.tcx')
+    with open(ruta, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<TrainingCenterDatabase '
+                'xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">'
+                '<Activities><Activity Sport="WALKING"><Lap><Track>')
+        for i in range(2 * 3600 * escala):
+            instante = (FECHA_INICIO + timedelta(seconds=i)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            f.write(f'<Trackpoint><Time>{instante}</Time><Position><LatitudeDegrees>{40 + i * 1e-5:.7f}'
+                    f'</LatitudeDegrees><LongitudeDegrees>-3.7</LongitudeDegrees></Position>'
+                    f'<AltitudeMeters>650.0</AltitudeMeters><DistanceMeters>{i * 1.1:.1f}</DistanceMeters>'
+                    f'<HeartRateBpm><Value>{100 + i % 20}</Value></HeartRateBpm><Cadence>{50 + i % 3}</Cadence>'
+                    f'</Trackpoint>')
+        f.write('</Track></Lap></Activity></Activities></TrainingCenterDatabase>')
+    return lambda: caracteristicas_recorrido(leer_tcx(ruta))
+
+
+def etapa_validacion(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.validacion import validar
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala).drop(columns='fecha_comun')
+    # Un historial largo de una sola persona, con las fechas como texto igual que en un CSV subido
+    df['date'] = pd.date_range('1900-01-01', periods=len(df), freq='D').strftime('%Y-%m-%d')
+    return lambda: validar(df)
+
+
+def etapa_limpieza(escala, directorio):
+    limpiar = cargar_modulo('limpiar_dataset', os.path.join(INTERFAZ_DIR, 'limpiar_dataset.py'))
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala)
+    rng = np.random.default_rng(0)
+    huecos = rng.random(df.shape) < 0.05
+    huecos[:, 0] = False
+    df = df.mask(huecos)
+    entrada = os.path.join(directorio, 'dataset_completo_raw.csv')
+    salida = os.path.join(directorio, 'dataset_completo_limpio.csv')
+    df.to_csv(entrada, index=False)
+    return lambda: limpiar.clean_missing_values(entrada, salida)
+
+
+def etapa_entrenamiento(escala, directorio):
+    export = cargar_modulo('exportMLXGBoost', os.path.join(ML_DIR, 'exportMLXGBoost.py'))
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala)
+    return lambda: export.entrenar_pipeline(df)
+
+
+def etapa_prediccion(escala, directorio):
+    import joblib
+    pipeline = joblib.load(os.path.join(INTERFAZ_DIR, 'fragility_pipeline.joblib'))
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala).rename(columns={'fecha_comun': 'date'})
+    return lambda: pipeline.predict_proba(df)
+
+
+def etapa_prediccion_onnx(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.inferencia import cargar_modelo
+    modelo = cargar_modelo(os.path.join(INTERFAZ_DIR, 'fragility_pipeline.joblib'), 'onnx')
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala).rename(columns={'fecha_comun': 'date'})
+    return lambda: modelo.predict_proba(df)
+
+
+def etapa_explicaciones(escala, directorio):
+    sys.path.insert(0, REPO_DIR)
+    from fragilidad.explicaciones import calcular_contribuciones
+    from fragilidad.inferencia import cargar_modelo
+    pipeline = cargar_modelo(os.path.join(INTERFAZ_DIR, 'fragility_pipeline.joblib'), 'joblib')
+    df = generar_dataset(N_USUARIOS_BASE * N_DIAS_BASE * escala).rename(columns={'fecha_comun': 'date'})
+    # Sin el caché de explicar(): mide la pasada de TreeSHAP completa
+    return lambda: calcular_contribuciones(pipeline, df)
+
+
+ETAPAS = {
+    'exportacion_api': etapa_exportacion_api,
+    'decodificacion': etapa_decodificacion,
+    'decodificacion_dict': etapa_decodificacion_dict,
+    'union_exports': etapa_union_exports,
+    'union_externos': etapa_union_externos,
+    'clasificacion': etapa_clasificacion,
+    'preparar_dataframe': etapa_preparar_dataframe,
+    'preparar_dataframe_bloques': etapa_preparar_dataframe_bloques,
+    'metricas_actividad': etapa_metricas_actividad,
+    'caracteristicas': etapa_caracteristicas,
+    'temporales': etapa_temporales,
+    'puntuacion': etapa_puntuacion,
+    'muestras': etapa_muestras,
+    'ejercicios': etapa_ejercicios,
+    'recorridos': etapa_recorridos,
+    'validacion': etapa_validacion,
+    'limpieza': etapa_limpieza,
+    'entrenamiento': etapa_entrenamiento,
+    'prediccion': etapa_prediccion,
+    'prediccion_onnx': etapa_prediccion_onnx,
+    'explicaciones': etapa_explicaciones,
+}
+
+
+# --- Medición ---
+
+def medir(funcion, repeticiones):
+    """Devuelve el mejor tiempo (s) de varias repeticiones y la memoria pico (MiB) de una ejecución aparte."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    # tracemalloc ralentiza la ejecución, así que la memoria se mide en una pasada independiente
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'tiempo_min_s': min(tiempos),
+        'tiempo_medio_s': sum(tiempos) / len(tiempos),
+        'memoria_pico_mib': pico / (1024 * 1024),
+    }
+
+
+def ejecutar_benchmarks(etapas, escalas, repeticiones):
+    resultados = {}
+    directorio_original = os.getcwd()
+    for nombre in etapas:
+        for escala in escalas:
+            clave = f"{nombre}@{escala}x"
+            with tempfile.TemporaryDirectory() as directorio:
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        funcion = ETAPAS[nombre](escala, directorio)
+                        resultados[clave] = medir(funcion, repeticiones)
+                except Exception as e:
+                    resultados[clave] = {'error': f"{type(e).__name__}: {e}"}
+                finally:
+                    os.chdir(directorio_original)
+            mostrar_resultado(clave, resultados[clave])
+    return resultados
+
+
+def mostrar_resultado(clave, resultado):
+    if 'error' in resultado:
+        print(f"{clave:<30} ERROR {resultado['error']}")
+    else:
+        print(f"{clave:<30} {resultado['tiempo_min_s'] * 1000:>12.2f} ms {resultado['memoria_pico_mib']:>10.2f} MiB")
+
+
+# --- Persistencia y Comparación ---
+
+def guardar_resultados(resultados, escalas, repeticiones):
+    os.makedirs(RESULTADOS_DIR, exist_ok=True)
+    commit = commit_actual()
+    marca = datetime.now().strftime('%Y%m%dT%H%M%S')
+    informe = {
+        'commit': commit,
+        'fecha': marca,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'maquina': platform.platform(),
+        'escalas': escalas,
+        'repeticiones': repeticiones,
+        'resultados': resultados,
+    }
+    ruta = os.path.join(RESULTADOS_DIR, f"{marca}_{commit}.json")
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2, sort_keys=True)
+    print(f"\n✓ Resultados guardados en '{ruta}'")
+    return ruta
+
+
+def cargar_anterior(ruta_actual):
+    """Último informe guardado antes del actual (los nombres empiezan por la fecha, así que se ordenan solos)."""
+    if not os.path.isdir(RESULTADOS_DIR):
+        return None
+    anteriores = sorted(f for f in os.listdir(RESULTADOS_DIR)
+                        if f.endswith('.json') and os.path.join(RESULTADOS_DIR, f) != ruta_actual)
+    if not anteriores:
+        return None
+    with open(os.path.join(RESULTADOS_DIR, anteriores[-1]), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def comparar(resultados, anterior, umbral):
+    """Compara tiempos con el informe anterior y devuelve las etapas que superan el umbral."""
+    print(f"\n--- Comparación con el commit {anterior['commit']} ({anterior['fecha']}) ---")
+    regresiones = []
+    for clave, actual in resultados.items():
+        previo = anterior['resultados'].get(clave)
+        if not previo or 'error' in previo or 'error' in actual:
+            continue
+        ratio = actual['tiempo_min_s'] / previo['tiempo_min_s'] if previo['tiempo_min_s'] > 0 else 1.0
+        marca = '  ⚠ REGRESIÓN' if ratio > umbral else ''
+        print(f"{clave:<30} x{ratio:>6.2f}{marca}")
+        if ratio > umbral:
+            regresiones.append(clave)
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del pipeline de fragilidad.")
+    parser.add_argument("--escalas", nargs='+', type=int, default=[1, 10, 100],
+                        help="Factores de escala de los datos sintéticos (por defecto 1 10 100).")
+    parser.add_argument("--etapas", nargs='+', choices=list(ETAPAS), default=list(ETAPAS),
+                        help="Etapas a medir (por defecto todas).")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por medida (se guarda el mínimo).")
+    parser.add_argument("--comparar", action='store_true', help="Compara con el último resultado guardado.")
+    parser.add_argument("--umbral", type=float, default=1.2,
+                        help="Ratio de tiempo a partir del cual se considera regresión (por defecto 1.2).")
+    args = parser.parse_args()
+
+    print(f"{'etapa@escala':<30} {'tiempo':>15} {'memoria':>14}")
+    resultados = ejecutar_benchmarks(args.etapas, args.escalas, args.repeticiones)
+    ruta = guardar_resultados(resultados, args.escalas, args.repeticiones)
+
+    if args.comparar:
+        anterior = cargar_anterior(ruta)
+        if anterior is None:
+            print("\nℹ No hay resultados anteriores con los que comparar.")
+        elif comparar(resultados, anterior, args.umbral):
+            sys.exit(1)
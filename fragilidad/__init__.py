@@ -0,0 +1,5 @@
+"""
+Código compartido por la exportación de datos Polar, el entrenamiento del modelo y la Interfaz.
+
+Los scripts de cada carpeta añaden la raíz del repositorio a `sys.path` para poder importarlo.
+"""
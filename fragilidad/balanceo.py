@@ -0,0 +1,66 @@
+# balanceo.py
+"""
+Tratamiento del desbalance de clases (frágil / pre-frágil / robusto) al entrenar.
+
+- 'smote': sobremuestrea las clases minoritarias con SMOTE, como hasta ahora. Materializa
+  una matriz mayor que la original y su búsqueda de vecinos crece con los datos.
+- 'pesos': no crea filas. Cada fila recibe un peso inversamente proporcional a la
+  frecuencia de su clase y se pasa como `sample_weight` a `XGBClassifier.fit`.
+- 'ninguno': entrena con los datos tal cual.
+
+`validacion_cruzada_agrupada` compara los modos con la macro-F1 de una validación cruzada
+por usuario. El balanceo se aplica solo a los folds de entrenamiento.
+
+Uso:
+    X, y, pesos = balancear(df[features], df['frailty_status'], 'pesos')
+    pipeline.fit(X, y, classifier__sample_weight=pesos)
+"""
+import numpy as np
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedGroupKFold
+from sklearn.utils.class_weight import compute_sample_weight
+
+MODOS_BALANCEO = ('smote', 'pesos', 'ninguno')
+
+
+def pesos_muestra(y, pesos_clase='balanced'):
+    """
+    Peso de cada fila según su clase. Con 'balanced', n_filas / (n_clases * filas_de_la_clase),
+    de modo que cada clase pesa lo mismo en total; también admite un dict {clase: peso}.
+    """
+    return compute_sample_weight(pesos_clase, y)
+
+
+def balancear(X, y, modo='smote', random_state=42):
+    """Devuelve (X, y, sample_weight) para entrenar con el `modo` indicado (sample_weight es None salvo con 'pesos')."""
+    if modo == 'smote':
+        # imblearn solo hace falta en este modo
+        from imblearn.over_sampling import SMOTE
+        X, y = SMOTE(random_state=random_state).fit_resample(X, y)
+        return X, y, None
+    if modo == 'pesos':
+        return X, y, pesos_muestra(y)
+    if modo == 'ninguno':
+        return X, y, None
+    raise ValueError(f"Modo de balanceo desconocido: {modo!r} (opciones: {', '.join(MODOS_BALANCEO)})")
+
+
+def validacion_cruzada_agrupada(df, features, crear_modelo, modo='smote', grupo='id_usuario',
+                                objetivo='frailty_status', n_splits=5, random_state=42):
+    """
+    Macro-F1 de cada fold de una validación cruzada estratificada por `grupo`: los días de un
+    usuario nunca se reparten entre entrenamiento y test. `crear_modelo()` devuelve un
+    pipeline sin entrenar cuyo último paso se llama 'classifier'.
+    """
+    X, y, grupos = df[features], df[objetivo], df[grupo]
+    folds = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    puntuaciones = []
+    for entrenamiento, test in folds.split(X, y, grupos):
+        X_train, y_train, pesos = balancear(X.iloc[entrenamiento], y.iloc[entrenamiento], modo, random_state)
+        modelo = crear_modelo()
+        if pesos is None:
+            modelo.fit(X_train, y_train)
+        else:
+            modelo.fit(X_train, y_train, classifier__sample_weight=pesos)
+        puntuaciones.append(f1_score(y.iloc[test], modelo.predict(X.iloc[test]), average='macro'))
+    return np.array(puntuaciones)
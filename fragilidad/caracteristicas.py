@@ -0,0 +1,152 @@
+# caracteristicas.py
+"""
+Etapa de cálculo de características sobre la tabla ya unida (un día por fila).
+
+Las características se declaran en dos diccionarios y se calculan por columnas:
+
+- COCIENTES: métricas derivadas (pasos por minuto, calorías por paso...). La división es
+  segura: si el denominador es 0 o falta, el resultado es NaN en lugar de un 0 inventado.
+- VENTANAS: medias móviles y tendencias por usuario, con ventanas de calendario ('7D')
+  sobre la columna de fecha, de modo que los días sin datos no alargan la ventana.
+
+`calcular_caracteristicas` solo calcula las columnas que aún no están en la tabla, y
+`cargar_con_caracteristicas` guarda el resultado junto al CSV, así que el entrenamiento y
+la Interfaz reutilizan lo ya calculado mientras el fichero no cambie.
+
+Uso:
+    df = calcular_caracteristicas(df, usuario='id_usuario', fecha='fecha_comun')
+    df = cargar_con_caracteristicas('dataset_preparado.csv', 'dataset_consolidado')
+"""
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from .esquemas import leer_export
+
+# nombre -> (numerador, denominador, decimales)
+COCIENTES = {
+    'steps_per_minute': ('active-steps', 'duration_minutes', 2),
+    'calories_per_step': ('calories', 'active-steps', 4),
+    'active_calories_per_minute': ('active-calories', 'duration_minutes', 2),
+}
+
+# nombre -> (columna, ventana, estadístico)
+#   'media':     media de los días dentro de la ventana (incluido el propio día)
+#   'tendencia': media de la ventana menos la media de la ventana anterior del mismo tamaño
+VENTANAS = {
+    'active_steps_mean_7d': ('active-steps', '7D', 'media'),
+    'hrv_mean_7d': ('heart_rate_variability_avg', '7D', 'media'),
+    'hrv_trend_7d': ('heart_rate_variability_avg', '7D', 'tendencia'),
+}
+
+COLUMNAS_CARACTERISTICAS = list(COCIENTES) + list(VENTANAS)
+
+# Cambia si cambian las definiciones, para invalidar las cachés guardadas junto a los CSV
+FIRMA_DEFINICIONES = hashlib.sha1(repr((COCIENTES, VENTANAS)).encode()).hexdigest()[:12]
+
+SUFIJO_CACHE = '.caracteristicas.pkl'
+
+
+def cociente_seguro(numerador, denominador):
+    """numerador / denominador como float64; NaN donde el denominador es 0, negativo o falta."""
+    numerador = pd.to_numeric(numerador, errors='coerce').astype('float64')
+    denominador = pd.to_numeric(denominador, errors='coerce').astype('float64')
+    return numerador / denominador.where(denominador > 0)
+
+
+def calcular_cocientes(df, cocientes=COCIENTES, recalcular=False):
+    """Añade las métricas derivadas cuyas columnas de origen existen en `df`."""
+    for nombre, (numerador, denominador, decimales) in cocientes.items():
+        if (nombre in df.columns and not recalcular) or numerador not in df.columns or denominador not in df.columns:
+            continue
+        df[nombre] = cociente_seguro(df[numerador], df[denominador]).round(decimales)
+    return df
+
+
+def calcular_ventanas(df, usuario='id_usuario', fecha='fecha_comun', ventanas=VENTANAS, recalcular=False):
+    """
+    Añade las características móviles, calculadas por usuario con `groupby().rolling()`.
+
+    Sin columna `usuario` (p. ej. el fichero de un único paciente en la Interfaz) toda la
+    tabla se trata como un solo usuario. El orden de las filas de `df` se conserva.
+    """
+    pendientes = {nombre: definicion for nombre, definicion in ventanas.items()
+                  if (recalcular or nombre not in df.columns) and definicion[0] in df.columns}
+    if not pendientes or df.empty:
+        return df
+
+    claves = [usuario] if usuario and usuario in df.columns else []
+    columnas = sorted({columna for columna, _, _ in pendientes.values()})
+    # Se trabaja por posición (índice 0..n-1), así da igual que el índice de `df` tenga repetidos
+    tabla = df[claves + columnas].reset_index(drop=True)
+    tabla['_fecha'] = pd.to_datetime(df[fecha], errors='coerce').to_numpy()
+    tabla[columnas] = tabla[columnas].apply(pd.to_numeric, errors='coerce').astype('float64')
+    tabla = tabla.dropna(subset=['_fecha']).sort_values(claves + ['_fecha'], kind='stable')
+    grupos = tabla.groupby(claves, sort=False, observed=True) if claves else tabla.groupby(np.zeros(len(tabla)))
+
+    calculadas = {}
+
+    def movil(ventana, estadistico):
+        # Cada combinación ventana/estadístico se calcula una sola vez para todas las columnas
+        if (ventana, estadistico) not in calculadas:
+            rodante = grupos.rolling(ventana, on='_fecha')[columnas]
+            calculadas[ventana, estadistico] = pd.DataFrame(
+                getattr(rodante, estadistico)()[columnas].to_numpy(), index=tabla.index, columns=columnas)
+        return calculadas[ventana, estadistico]
+
+    for nombre, (columna, ventana, estadistico) in pendientes.items():
+        if estadistico == 'media':
+            valores = movil(ventana, 'mean')[columna]
+        elif estadistico == 'tendencia':
+            # Suma y número de días de la ventana y de la ventana doble: la diferencia es la anterior
+            doble = f"{2 * pd.Timedelta(ventana).days}D"
+            suma, dias = movil(ventana, 'sum')[columna], movil(ventana, 'count')[columna]
+            suma_doble, dias_doble = movil(doble, 'sum')[columna], movil(doble, 'count')[columna]
+            anterior = (suma_doble - suma) / (dias_doble - dias).where(dias_doble > dias)
+            valores = suma / dias.where(dias > 0) - anterior
+        else:
+            raise ValueError(f"Estadístico desconocido en '{nombre}': {estadistico}")
+        columna_df = np.full(len(df), np.nan)
+        columna_df[valores.index] = valores.to_numpy()
+        df[nombre] = columna_df
+    return df
+
+
+def calcular_caracteristicas(df, usuario='id_usuario', fecha='fecha_comun', recalcular=False):
+    """Etapa completa: cocientes y ventanas móviles. Modifica y devuelve `df`."""
+    calcular_cocientes(df, recalcular=recalcular)
+    return calcular_ventanas(df, usuario=usuario, fecha=fecha, recalcular=recalcular)
+
+
+def _firma_fichero(ruta):
+    estado = os.stat(ruta)
+    return (estado.st_size, estado.st_mtime_ns, FIRMA_DEFINICIONES)
+
+
+def cargar_con_caracteristicas(ruta, nombre=None, usuario='id_usuario', fecha='fecha_comun'):
+    """
+    Lee un CSV con `leer_export` y le añade las características, usando la caché del fichero.
+
+    La tabla calculada se guarda en '<ruta>.caracteristicas.pkl' junto con el tamaño y la
+    fecha de modificación del CSV; si ninguno ha cambiado (ni las definiciones), se devuelve
+    directamente sin volver a leer ni calcular nada.
+    """
+    cache = ruta + SUFIJO_CACHE
+    firma = _firma_fichero(ruta)
+    try:
+        with open(cache, 'rb') as f:
+            guardado = pickle.load(f)
+        if guardado.get('firma') == firma:
+            return guardado['datos']
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        pass
+
+    df = calcular_caracteristicas(leer_export(ruta, nombre), usuario=usuario, fecha=fecha)
+    temporal = cache + '.tmp'
+    with open(temporal, 'wb') as f:
+        pickle.dump({'firma': firma, 'datos': df}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporal, cache)
+    return df
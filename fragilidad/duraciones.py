@@ -0,0 +1,61 @@
+# duraciones.py
+"""
+Conversión de duraciones ISO 8601 de Polar ("PT4H33M30S", "P1DT2H", "PT45.5S") a minutos.
+
+`duracion_a_minutos` convierte una columna entera de una vez y `duracion_iso_a_minutos` un
+único valor (un resumen recién descargado); las dos usan la misma expresión precompilada
+y tienen en cuenta días, horas, minutos y segundos.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+PATRON_DURACION = re.compile(
+    r'^P(?:(?P<dias>\d+(?:\.\d+)?)D)?'
+    r'(?:T(?:(?P<horas>\d+(?:\.\d+)?)H)?(?:(?P<minutos>\d+(?:\.\d+)?)M)?(?:(?P<segundos>\d+(?:\.\d+)?)S)?)?$'
+)
+
+_MINUTOS_POR_UNIDAD = {'dias': 1440.0, 'horas': 60.0, 'minutos': 1.0, 'segundos': 1 / 60}
+
+
+def duracion_iso_a_minutos(duracion, por_defecto=0.0):
+    """Minutos de una duración ISO 8601; `por_defecto` si no es una duración válida."""
+    if not isinstance(duracion, str):
+        return por_defecto
+    coincidencia = PATRON_DURACION.match(duracion)
+    if coincidencia is None:
+        return por_defecto
+    return sum(float(valor) * _MINUTOS_POR_UNIDAD[unidad]
+               for unidad, valor in coincidencia.groupdict().items() if valor)
+
+
+def duracion_a_minutos(serie, por_defecto=np.nan):
+    """
+    Convierte una Serie de duraciones ISO 8601 en minutos (float64) en una sola pasada.
+
+    Las duraciones se repiten mucho (resolución de segundos dentro de un día), así que cada
+    valor distinto se analiza una única vez y el resultado se reparte con `pd.factorize`;
+    es bastante más rápido que `str.extract` o `pd.to_timedelta` sobre la columna entera.
+    Los valores nulos o que no son duraciones válidas quedan como `por_defecto`.
+    """
+    codigos, distintos = pd.factorize(serie, use_na_sentinel=True)
+    minutos = np.array([duracion_iso_a_minutos(valor, por_defecto) for valor in distintos] + [por_defecto],
+                       dtype='float64')
+    # El código -1 (nulos) apunta al último elemento, que es `por_defecto`
+    return pd.Series(minutos[codigos], index=serie.index, name=serie.name)
+
+
+def metricas_actividad(df, duracion='duration'):
+    """
+    Recalcula 'duration_minutes' a partir de la columna ISO 8601 `duracion` y, con ella,
+    las métricas derivadas de `caracteristicas.COCIENTES` (pasos por minuto, etc.).
+
+    Sirve para re-derivar exportaciones antiguas, que ignoraban los segundos. Devuelve
+    una copia de `df`.
+    """
+    from .caracteristicas import calcular_cocientes
+
+    df = df.copy()
+    df['duration_minutes'] = duracion_a_minutos(df[duracion], por_defecto=0.0).round(2)
+    return calcular_cocientes(df, recalcular=True)
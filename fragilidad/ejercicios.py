@@ -0,0 +1,241 @@
+# ejercicios.py
+"""
+Análisis de las muestras en bruto de los ejercicios: HRV, TRIMP, tiempo en zonas y
+recuperación de la frecuencia cardiaca.
+
+Hasta ahora de cada ejercicio solo se usaban los resúmenes de Polar. Aquí las series de
+pulso y de intervalos RR de `get_samples` se convierten en arrays de numpy y se analizan
+todos los ejercicios de una transacción a la vez: las muestras de todos se concatenan y
+cada estadístico sale de unas pocas operaciones por segmento (`np.bincount`,
+`np.maximum.reduceat`), sin bucles por ejercicio ni por muestra.
+
+Por ejercicio se calcula:
+
+- rmssd, sdnn: variabilidad de los intervalos RR (ms), descartando artefactos.
+- trimp: carga de entrenamiento de Banister, Σ Δt·FCr·a·e^(b·FCr), con FCr la reserva.
+- zone1_min ... zone5_min: minutos en cada zona (50-60 %, ..., 90-100 % de la FC máxima).
+- hr_recovery_slope: pendiente (lpm por minuto) del pulso en el minuto siguiente a la última
+  vez que alcanza su máximo.
+
+Si el ejercicio trae su recorrido ('recorrido': `recorridos.caracteristicas_recorrido`), se
+añaden también la distancia, la velocidad, la cadencia, la longitud de paso y las paradas.
+
+`resumen_diario` lo agrega por día (carga y minutos sumados, HRV y recuperación
+promediadas) para añadirlo a la tabla diaria en la unión de datos.
+
+Uso:
+    ejercicios = [serie_ejercicio(resumen, muestras) for resumen, muestras in descargados]
+    df = analizar_ejercicios(ejercicios, fc_reposo=55, fc_max=185, sexo='FEMALE')
+    diario = resumen_diario(df)
+"""
+import numpy as np
+import pandas as pd
+
+from .muestras import TIPOS_MUESTRA, texto_a_valores
+from .recorridos import CARACTERISTICAS_RECORRIDO
+
+EJERCICIOS_FILENAME = 'polar_exercise_analytics.csv'
+
+# Límites de las zonas de FC como fracción de la FC máxima (las cinco zonas de Polar)
+ZONAS_FC = (0.5, 0.6, 0.7, 0.8, 0.9)
+
+# Intervalos RR plausibles (ms) y salto máximo entre latidos consecutivos (artefactos)
+RR_VALIDO_MS = (300.0, 2000.0)
+RR_SALTO_MAXIMO = 0.2
+
+# Coeficientes de Banister (a, b) por sexo; sin sexo conocido se usan los originales
+COEFICIENTES_TRIMP = {'MALE': (0.64, 1.92), 'FEMALE': (0.86, 1.67)}
+
+FC_REPOSO_POR_DEFECTO = 60.0
+
+# Segundos tras el máximo de pulso en que se mide la recuperación
+VENTANA_RECUPERACION_S = 60
+
+CAMPOS_EJERCICIO = [
+    'id', 'date', 'start_time', 'duration_min', 'hr_mean', 'hr_max', 'rmssd', 'sdnn', 'trimp',
+] + [f'zone{zona}_min' for zona in range(1, len(ZONAS_FC) + 1)] + ['hr_recovery_slope']
+
+# columna diaria -> (columna por ejercicio, agregación)
+COLUMNAS_DIARIAS = {
+    'exercise_minutes': ('duration_min', 'sum'),
+    'exercise_trimp': ('trimp', 'sum'),
+    **{f'exercise_zone{zona}_min': (f'zone{zona}_min', 'sum') for zona in range(1, len(ZONAS_FC) + 1)},
+    'exercise_rmssd': ('rmssd', 'mean'),
+    'exercise_sdnn': ('sdnn', 'mean'),
+    'exercise_hr_recovery_slope': ('hr_recovery_slope', 'mean'),
+    'exercise_distance_m': ('distance_m', 'sum'),
+    'exercise_stops_min': ('stops_min', 'sum'),
+    'exercise_speed_m_s': ('speed_mean_m_s', 'mean'),
+    'exercise_cadence_cv': ('cadence_cv', 'mean'),
+    'exercise_step_length_m': ('step_length_m', 'mean'),
+}
+
+
+def serie_ejercicio(resumen, muestras):
+    """
+    Pulso e intervalos RR de un ejercicio como arrays, a partir de su resumen
+    (`get_exercise_summary`) y de las respuestas de `get_samples`.
+    """
+    ejercicio = {'id': resumen.get('id'), 'inicio': resumen.get('start-time'),
+                 'hr': np.empty(0), 'intervalo_s': 1.0, 'rr': np.empty(0)}
+    for muestra in muestras:
+        serie, _ = TIPOS_MUESTRA.get(str(muestra.get('sample-type')), (None, None))
+        if serie == 'heart_rate':
+            ejercicio['hr'] = texto_a_valores(muestra.get('data'))
+            ejercicio['intervalo_s'] = float(muestra.get('recording-rate') or 1)
+        elif serie == 'rr_interval':
+            ejercicio['rr'] = texto_a_valores(muestra.get('data'))
+    return ejercicio
+
+
+def _segmentos(arrays):
+    """Concatena `arrays` y devuelve (valores, segmento de cada valor, posición dentro de él, inicios)."""
+    longitudes = np.array([len(a) for a in arrays], dtype='int64')
+    inicios = np.concatenate([[0], np.cumsum(longitudes)[:-1]]) if len(arrays) else np.empty(0, dtype='int64')
+    valores = np.concatenate([np.asarray(a, dtype='float64') for a in arrays]) if len(arrays) else np.empty(0)
+    segmento = np.repeat(np.arange(len(arrays)), longitudes)
+    return valores, segmento, np.arange(len(valores)) - inicios[segmento], inicios
+
+
+def _por_ejercicio(valor, n):
+    """Un valor (o array) por ejercicio; None o NaN se quedan como NaN."""
+    return np.broadcast_to(np.asarray(np.nan if valor is None else valor, dtype='float64'), (n,)).copy()
+
+
+def _dividir(numerador, denominador):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominador > 0, numerador / denominador, np.nan)
+
+
+def variabilidad_rr(rr, segmento, n):
+    """RMSSD y SDNN (ms) de cada segmento, sin intervalos fuera de rango ni saltos bruscos."""
+    valido = (rr >= RR_VALIDO_MS[0]) & (rr <= RR_VALIDO_MS[1])
+    # Diferencias entre latidos consecutivos del mismo ejercicio, ambos válidos
+    diferencia = np.diff(rr)
+    consecutivo = (segmento[1:] == segmento[:-1]) & valido[1:] & valido[:-1]
+    consecutivo &= np.abs(diferencia) <= RR_SALTO_MAXIMO * rr[:-1]
+    seg_dif = segmento[1:][consecutivo]
+    rmssd = np.sqrt(_dividir(np.bincount(seg_dif, diferencia[consecutivo] ** 2, minlength=n),
+                             np.bincount(seg_dif, minlength=n)))
+
+    seg_rr, rr_validos = segmento[valido], rr[valido]
+    cuenta = np.bincount(seg_rr, minlength=n).astype('float64')
+    suma = np.bincount(seg_rr, rr_validos, minlength=n)
+    suma2 = np.bincount(seg_rr, rr_validos ** 2, minlength=n)
+    varianza = _dividir(suma2 - _dividir(suma * suma, cuenta), cuenta - 1)
+    return rmssd, np.sqrt(np.maximum(varianza, 0.0))
+
+
+def analizar_ejercicios(ejercicios, fc_reposo=None, fc_max=None, sexo=None):
+    """
+    Analiza a la vez una lista de ejercicios (dicts de `serie_ejercicio`) y devuelve un
+    DataFrame con una fila por ejercicio y las columnas de `CAMPOS_EJERCICIO`.
+
+    `fc_reposo` y `fc_max` pueden ser un número o uno por ejercicio; sin ellos se usan
+    `FC_REPOSO_POR_DEFECTO` y el máximo observado en el ejercicio. `sexo` ('MALE' o
+    'FEMALE', como en AccessLink) elige los coeficientes del TRIMP.
+    """
+    n = len(ejercicios)
+    if n == 0:
+        return pd.DataFrame(columns=CAMPOS_EJERCICIO)
+
+    # --- Pulso: todas las muestras de todos los ejercicios en un solo array ---
+    hr, segmento, posicion, inicios = _segmentos([e['hr'] for e in ejercicios])
+    intervalo = np.array([e.get('intervalo_s') or 1.0 for e in ejercicios], dtype='float64')
+    valido = ~np.isnan(hr) & (hr > 0)
+    hr_limpio = np.where(valido, hr, 0.0)
+    peso = intervalo[segmento] / 60 * valido  # minutos que representa cada muestra válida
+
+    longitudes = np.bincount(segmento, minlength=n)
+    duracion = longitudes * intervalo / 60
+    minutos_validos = np.bincount(segmento, peso, minlength=n)
+    hr_media = _dividir(np.bincount(segmento, hr_limpio * peso, minlength=n), minutos_validos)
+    hr_maxima = np.full(n, np.nan)
+    con_muestras = longitudes > 0
+    if len(hr):
+        hr_maxima[con_muestras] = np.maximum.reduceat(np.where(valido, hr, -np.inf), inicios[con_muestras])
+        hr_maxima[np.isinf(hr_maxima)] = np.nan
+
+    reposo = _por_ejercicio(fc_reposo, n)
+    reposo[np.isnan(reposo)] = FC_REPOSO_POR_DEFECTO
+    maxima = _por_ejercicio(fc_max, n)
+    maxima = np.where(np.isnan(maxima), hr_maxima, maxima)
+
+    # --- Tiempo en zonas: zona de cada muestra y una suma por (ejercicio, zona) ---
+    fraccion = hr_limpio / maxima[segmento]
+    zona = np.digitize(fraccion, ZONAS_FC)  # 0: por debajo de la zona 1; 5: zona 5 o más
+    n_zonas = len(ZONAS_FC) + 1
+    minutos_zona = np.bincount(segmento * n_zonas + zona, peso, minlength=n * n_zonas).reshape(n, n_zonas)
+
+    # --- TRIMP de Banister ---
+    a, b = COEFICIENTES_TRIMP.get(str(sexo).upper(), COEFICIENTES_TRIMP['MALE'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        reserva = np.clip((hr_limpio - reposo[segmento]) / (maxima - reposo)[segmento], 0.0, 1.0)
+    reserva = np.nan_to_num(reserva)
+    trimp = np.bincount(segmento, peso * reserva * a * np.exp(b * reserva), minlength=n)
+    trimp[~(minutos_validos > 0)] = np.nan
+
+    # --- Recuperación: regresión del pulso en la ventana posterior al máximo (su última aparición) ---
+    pico = np.full(n, -1, dtype='int64')
+    if len(hr):
+        orden = np.lexsort((np.where(valido, hr, -np.inf), segmento))
+        ultimos = np.cumsum(longitudes)[con_muestras] - 1
+        pico[con_muestras] = posicion[orden[ultimos]]
+    segundos = (posicion - pico[segmento]) * intervalo[segmento]
+    ventana = valido & (segundos > 0) & (segundos <= VENTANA_RECUPERACION_S)
+    seg_v, x, y = segmento[ventana], segundos[ventana] / 60, hr[ventana]
+    sn = np.bincount(seg_v, minlength=n).astype('float64')
+    sx, sy = np.bincount(seg_v, x, minlength=n), np.bincount(seg_v, y, minlength=n)
+    sxx, sxy = np.bincount(seg_v, x * x, minlength=n), np.bincount(seg_v, x * y, minlength=n)
+    pendiente = _dividir(sn * sxy - sx * sy, sn * sxx - sx * sx)
+    pendiente[sn < 3] = np.nan
+
+    # --- HRV de los intervalos RR ---
+    rr, segmento_rr, _, _ = _segmentos([e['rr'] for e in ejercicios])
+    rmssd, sdnn = variabilidad_rr(rr, segmento_rr, n)
+
+    inicio = pd.to_datetime(pd.Series([e.get('inicio') for e in ejercicios]), errors='coerce')
+    df = pd.DataFrame({
+        'id': [e.get('id') for e in ejercicios],
+        'date': inicio.dt.strftime('%Y-%m-%d'),
+        'start_time': [e.get('inicio') for e in ejercicios],
+        'duration_min': duracion,
+        'hr_mean': hr_media,
+        'hr_max': hr_maxima,
+        'rmssd': rmssd,
+        'sdnn': sdnn,
+        'trimp': trimp,
+        'hr_recovery_slope': pendiente,
+    })
+    for numero in range(1, n_zonas):
+        df[f'zone{numero}_min'] = minutos_zona[:, numero]
+    df = df[CAMPOS_EJERCICIO].round(3)
+    if any('recorrido' in e for e in ejercicios):
+        recorridos = pd.DataFrame([e.get('recorrido') or {} for e in ejercicios], columns=CARACTERISTICAS_RECORRIDO)
+        df = pd.concat([df, recorridos], axis=1)
+    return df
+
+
+def resumen_diario(df, fecha='date'):
+    """Una fila por día con las columnas de `COLUMNAS_DIARIAS`."""
+    columnas = {destino: pd.NamedAgg(origen, agregacion)
+                for destino, (origen, agregacion) in COLUMNAS_DIARIAS.items() if origen in df.columns}
+    dias = pd.to_datetime(df[fecha]).dt.normalize().rename('date')
+    return df.groupby(dias).agg(**columnas).reset_index()
+
+
+def guardar_ejercicios(df, ruta=EJERCICIOS_FILENAME):
+    """Añade los ejercicios analizados al CSV (un ejercicio repetido se sustituye). Devuelve cuántos son nuevos."""
+    if df.empty:
+        return 0
+    nuevos = len(df)
+    tabla = df.astype({'id': str})
+    try:
+        existentes = pd.read_csv(ruta, dtype={'id': str})
+        nuevos = int((~tabla['id'].isin(existentes['id'])).sum())
+        tabla = pd.concat([existentes, tabla], ignore_index=True)
+    except FileNotFoundError:
+        pass
+    tabla = tabla.drop_duplicates(subset='id', keep='last').sort_values('start_time')
+    tabla.to_csv(ruta, index=False)
+    return nuevos
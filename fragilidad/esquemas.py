@@ -0,0 +1,189 @@
+# esquemas.py
+"""
+Tipos de dato explícitos para los CSV exportados de Polar y los datasets consolidados.
+
+Sin esquema, `pd.read_csv` infiere float64/object para todo y la fecha se convierte después
+con `pd.to_datetime`. Aquí cada export declara dtypes compactos (float32 para medidas que
+pueden faltar, int16 para contadores siempre presentes, category para estados e ids) y la
+fecha se parsea durante la lectura, lo que reduce aprox. a la mitad la memoria de cada tabla.
+
+Uso:
+    from fragilidad.esquemas import leer_export
+    df = leer_export('polar_sleep_summary.csv')                   # esquema deducido del nombre
+    df = leer_export('sleep.csv', 'polar_sleep_summary')          # esquema explícito
+    df = leer_export('grande.csv', 'polar_daily_activities', chunksize=100_000)
+
+El motor 'pyarrow' de pandas se usa si se pide (`motor='pyarrow'` o la variable de entorno
+FRAGILIDAD_CSV_MOTOR=pyarrow) y está instalado; la lectura por bloques siempre usa el motor C.
+"""
+import importlib.util
+import os
+
+import pandas as pd
+
+# --- Esquemas por export ---
+ESQUEMAS = {
+    'polar_sleep_summary': {
+        'fechas': ['date'],
+        'dtype': {
+            'light_sleep_min': 'float32',
+            'deep_sleep_min': 'float32',
+            'rem_sleep_min': 'float32',
+            'sleep_score': 'float32',
+            'interruptions_min': 'float32',
+        },
+    },
+    'polar_recharge_summary': {
+        'fechas': ['date'],
+        'dtype': {
+            'polar_user': 'category',
+            'heart_rate_avg': 'float32',
+            'heart_rate_variability_avg': 'float32',
+            'nightly_recharge_status': 'category',
+            'ans_charge': 'float32',
+            'ans_charge_status': 'category',
+            'beat_to_beat_avg': 'float32',
+            'breathing_rate_avg': 'float32',
+        },
+    },
+    'polar_daily_activities': {
+        'fechas': ['date'],
+        'dtype': {
+            'active-steps': 'float32',
+            'active-calories': 'float32',
+            'calories': 'float32',
+            'duration_minutes': 'float32',
+            'steps_per_minute': 'float32',
+            'calories_per_step': 'float32',
+            'active_calories_per_minute': 'float32',
+        },
+    },
+    'body_temperature_summary': {
+        'fechas': ['date'],
+        'dtype': {
+            'temp_mean': 'float32',
+            'temp_max': 'float32',
+            'temp_min': 'float32',
+            'temp_std': 'float32',
+            'temp_deviation_mean': 'float32',
+            'temp_deviation_max': 'float32',
+            'temp_amplitude': 'float32',
+            'num_samples': 'int16',
+            'duration_hours': 'float32',
+        },
+    },
+    'polar_exercise_analytics': {
+        'fechas': ['date'],
+        'dtype': {
+            'duration_min': 'float32',
+            'hr_mean': 'float32',
+            'hr_max': 'float32',
+            'rmssd': 'float32',
+            'sdnn': 'float32',
+            'trimp': 'float32',
+            'zone1_min': 'float32',
+            'zone2_min': 'float32',
+            'zone3_min': 'float32',
+            'zone4_min': 'float32',
+            'zone5_min': 'float32',
+            'hr_recovery_slope': 'float32',
+            'distance_m': 'float32',
+            'moving_min': 'float32',
+            'speed_mean_m_s': 'float32',
+            'speed_cv': 'float32',
+            'pace_min_km': 'float32',
+            'cadence_mean': 'float32',
+            'cadence_cv': 'float32',
+            'step_length_m': 'float32',
+            'stops_min': 'float32',
+            'elevation_gain_m': 'float32',
+        },
+    },
+    'polar_physical_info': {
+        'fechas': ['created'],
+        'dtype': {
+            'height': 'float32',
+            'weight': 'float32',
+            'aerobic-threshold': 'float32',
+            'anaerobic-threshold': 'float32',
+            'maximum-heart-rate': 'float32',
+            'resting-heart-rate': 'float32',
+            'vo2-max': 'float32',
+        },
+    },
+    # Datasets ya unidos (datos_consolidados, datasetRealML, dataset_preparado...)
+    'dataset_consolidado': {
+        'fechas': ['date', 'fecha_comun'],
+        'dtype': {
+            'id_usuario': 'category',
+            'age': 'float32',
+            'edad': 'float32',
+            'active-steps': 'float32',
+            'active-calories': 'float32',
+            'calories': 'float32',
+            'duration_minutes': 'float32',
+            'steps_per_minute': 'float32',
+            'calories_per_step': 'float32',
+            'active_calories_per_minute': 'float32',
+            'heart_rate_avg': 'float32',
+            'heart_rate_variability_avg': 'float32',
+            'ans_charge': 'float32',
+            'sleep_score': 'float32',
+            'light_sleep_min': 'float32',
+            'deep_sleep_min': 'float32',
+            'rem_sleep_min': 'float32',
+            'interruptions_min': 'float32',
+            'breathing_rate_avg': 'float32',
+            'temp_mean': 'float32',
+            'temp_std': 'float32',
+            'temp_amplitude': 'float32',
+        },
+    },
+}
+
+# Otros nombres de fichero que comparten esquema
+ALIAS = {
+    'polar_daily_activities_util': 'polar_daily_activities',
+    'temperatura_procesada': 'body_temperature_summary',
+    'activity': 'polar_daily_activities',
+    'recharge': 'polar_recharge_summary',
+    'sleep': 'polar_sleep_summary',
+    'temperature': 'body_temperature_summary',
+}
+
+
+def obtener_esquema(nombre):
+    """Esquema de un export a partir de su nombre lógico o del nombre del fichero."""
+    nombre = os.path.splitext(os.path.basename(nombre))[0]
+    nombre = ALIAS.get(nombre, nombre)
+    return ESQUEMAS.get(nombre, ESQUEMAS['dataset_consolidado'])
+
+
+def motor_csv(motor=None):
+    """Motor de lectura: el indicado, o FRAGILIDAD_CSV_MOTOR; 'pyarrow' solo si está instalado."""
+    motor = motor or os.environ.get('FRAGILIDAD_CSV_MOTOR', 'c')
+    if motor == 'pyarrow' and importlib.util.find_spec('pyarrow') is None:
+        return 'c'
+    return motor
+
+
+def leer_export(ruta, nombre=None, motor=None, **kwargs):
+    """
+    `pd.read_csv` con el esquema del export: dtypes compactos y fechas parseadas al leer.
+
+    Las columnas que no estén en el esquema se infieren como siempre. Acepta cualquier
+    argumento de `pd.read_csv` (usecols, chunksize...).
+    """
+    esquema = obtener_esquema(nombre or ruta)
+    columnas = pd.read_csv(ruta, nrows=0, encoding=kwargs.get('encoding')).columns
+    if kwargs.get('usecols') is not None and not callable(kwargs['usecols']):
+        columnas = [c for c in columnas if c in kwargs['usecols']]
+
+    dtype = {c: t for c, t in esquema['dtype'].items() if c in columnas}
+    dtype.update(kwargs.pop('dtype', None) or {})
+    fechas = [c for c in esquema['fechas'] if c in columnas]
+    if 'chunksize' in kwargs or 'iterator' in kwargs:
+        motor = 'c'
+
+    return pd.read_csv(ruta, dtype=dtype, parse_dates=fechas or None,
+                       engine=motor_csv(motor), **kwargs)
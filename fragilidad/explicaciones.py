@@ -0,0 +1,149 @@
+# explicaciones.py
+"""
+Por qué el modelo clasifica así cada día: contribuciones TreeSHAP de cada variable.
+
+Una única llamada al booster con `pred_contribs=True` sobre todo el DataFrame devuelve,
+para cada fila y cada clase, la contribución de cada variable más el sesgo. Su suma es el
+margen de la clase, así que las probabilidades salen de un softmax de esas sumas y no hace
+falta una segunda pasada con `predict_proba`.
+
+TreeSHAP exacto recorre cada árbol muchas más veces que una predicción. Por eso el
+resultado (probabilidades y contribuciones) se guarda en memoria junto con la huella de
+la entrada (los valores de las columnas del modelo) y la del modelo. Volver a mostrar los
+mismos datos no vuelve a evaluar los árboles.
+
+Un `ModeloONNX` (fragilidad/inferencia.py) no tiene booster: las contribuciones se
+calculan con el .joblib del que se exportó, que se carga una sola vez, si xgboost está
+instalado y ese fichero sigue a su lado sin cambios. Si no, se devuelven las probabilidades
+de ONNX y ninguna contribución.
+
+Uso:
+    probabilidades, contribuciones = explicar(pipeline, df)
+    df['factores_clave'] = factores_principales(contribuciones, probabilidades, df, columnas_modelo(pipeline))
+"""
+import hashlib
+import importlib.util
+import os
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .inferencia import ModeloONNX, columnas_modelo, huella
+
+# Resultados guardados (los más recientes); cada uno ocupa filas x clases x (variables + 1) float32
+MAXIMO_CACHE = 8
+
+_cache = OrderedDict()   # (huella del modelo, huella de la entrada) -> (probabilidades, contribuciones)
+
+
+def huella_entrada(X):
+    """SHA-256 de los nombres y valores de las columnas de `X` (no depende del índice)."""
+    h = hashlib.sha256('\x1f'.join(map(str, X.columns)).encode())
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def huella_modelo(modelo):
+    if isinstance(modelo, ModeloONNX):
+        return 'onnx:' + str(modelo.huella_pipeline or modelo.ruta)
+    booster = modelo.named_steps['classifier'].get_booster()
+    return hashlib.sha256(booster.save_raw('ubj')).hexdigest()
+
+
+def _softmax(margenes):
+    exponenciales = np.exp(margenes - margenes.max(axis=1, keepdims=True))
+    return exponenciales / exponenciales.sum(axis=1, keepdims=True)
+
+
+@lru_cache(maxsize=2)
+def _cargar_pipeline(ruta, huella_pipeline):
+    import joblib
+    return joblib.load(ruta)
+
+
+def pipeline_explicable(modelo):
+    """
+    Pipeline de XGBoost con el que explicar `modelo`: él mismo o, para un `ModeloONNX`, el
+    .joblib del que se exportó. None si no se puede cargar (falta xgboost o el fichero, o
+    se ha reentrenado desde la exportación).
+    """
+    if not isinstance(modelo, ModeloONNX):
+        return modelo
+    ruta = os.path.splitext(modelo.ruta)[0] + '.joblib'
+    if importlib.util.find_spec('xgboost') is None or not os.path.exists(ruta) or huella(ruta) != modelo.huella_pipeline:
+        return None
+    try:
+        return _cargar_pipeline(ruta, modelo.huella_pipeline)
+    except ImportError:   # xgboost sin scikit-learn
+        return None
+
+
+def calcular_contribuciones(pipeline, X):
+    """
+    (probabilidades, contribuciones) sin caché. `contribuciones` tiene forma
+    (filas, clases, variables + 1); la última posición es el sesgo.
+    """
+    import xgboost
+
+    columnas = columnas_modelo(pipeline)
+    booster = pipeline.named_steps['classifier'].get_booster()
+    contribuciones = booster.predict(xgboost.DMatrix(np.asarray(X[columnas], dtype=np.float32)),
+                                     pred_contribs=True)
+    probabilidades = _softmax(contribuciones.sum(axis=2, dtype=np.float64)).astype(np.float32)
+    return probabilidades, contribuciones
+
+
+def explicar(modelo, X):
+    """
+    Probabilidades y contribuciones de `modelo` para todas las filas de `X`, del caché si
+    ya se calcularon. Los arrays devueltos son de solo lectura, porque se comparten entre llamadas.
+    """
+    columnas = columnas_modelo(modelo)
+    clave = (huella_modelo(modelo), huella_entrada(X[columnas]))
+    if clave in _cache:
+        _cache.move_to_end(clave)
+        return _cache[clave]
+
+    pipeline = pipeline_explicable(modelo)
+    if pipeline is None:
+        resultado = (modelo.predict_proba(X), None)
+    else:
+        resultado = calcular_contribuciones(pipeline, X)
+    for array in resultado:
+        if array is not None:
+            array.flags.writeable = False
+
+    _cache[clave] = resultado
+    while len(_cache) > MAXIMO_CACHE:
+        _cache.popitem(last=False)
+    return resultado
+
+
+def contribuciones_clase(contribuciones, probabilidades, columnas):
+    """DataFrame (filas x variables) con la contribución de cada variable a la clase predicha de cada fila."""
+    predichas = probabilidades.argmax(axis=1)
+    return pd.DataFrame(contribuciones[np.arange(len(predichas)), predichas, :-1], columns=columnas)
+
+
+def factores_principales(contribuciones, probabilidades, X, columnas, n=3):
+    """
+    Texto con las `n` variables que más empujan cada fila hacia su clase predicha, con su
+    valor y su contribución, p. ej. 'deep_sleep_min=35 (+1.84); age=82 (+0.97)'.
+    """
+    hacia_clase = contribuciones_clase(contribuciones, probabilidades, columnas).to_numpy()
+    orden = np.argsort(-hacia_clase, axis=1)[:, :n]
+    valores = np.asarray(X[columnas], dtype=float)
+    textos = []
+    for fila, indices in enumerate(orden):
+        partes = [f"{columnas[i]}={round(valores[fila, i], 1):g} ({hacia_clase[fila, i]:+.2f})"
+                  for i in indices if hacia_clase[fila, i] > 0]
+        textos.append('; '.join(partes))
+    return textos
+
+
+def importancia_global(contribuciones, columnas):
+    """Media del valor absoluto de las contribuciones de cada variable (en todas las filas y clases), ordenada."""
+    media = np.abs(contribuciones[:, :, :-1]).mean(axis=(0, 1))
+    return pd.Series(media, index=columnas).sort_values(ascending=False)
@@ -0,0 +1,62 @@
+# imputacion.py
+"""
+Estadísticas de imputación calculadas sobre la población de entrenamiento.
+
+El entrenamiento guarda la mediana (columnas numéricas) o la moda (columnas de texto) de
+cada variable en un JSON junto al modelo. La limpieza de un fichero subido reutiliza esos
+valores en un único `fillna(dict)`, en vez de recalcularlos con los pocos días de un paciente.
+"""
+import json
+
+import pandas as pd
+
+ESTADISTICAS_FILENAME = 'fragility_imputation_stats.json'
+
+
+def calcular_estadisticas(df, columnas=None):
+    """Mediana de cada columna numérica y moda de las de texto."""
+    valores = {}
+    for column in (columnas or df.columns):
+        serie = df[column].dropna()
+        if serie.empty:
+            continue
+        if pd.api.types.is_numeric_dtype(serie):
+            valores[column] = float(serie.median())
+        else:
+            valores[column] = str(serie.mode()[0])
+    return valores
+
+
+def guardar_estadisticas(valores, ruta, filas=None):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'filas_entrenamiento': filas, 'valores': valores}, f, indent=2, ensure_ascii=False)
+
+
+def cargar_estadisticas(ruta):
+    """Devuelve el diccionario columna -> valor de relleno guardado por el entrenamiento."""
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)['valores']
+
+
+def imputar(df, valores):
+    """Rellena los NaN de todas las columnas conocidas en una sola pasada vectorizada."""
+    return df.fillna({column: valor for column, valor in valores.items() if column in df.columns})
+
+
+def imputar_por_bloques(input_file, output_file, valores, chunksize=100_000, parse_dates=None, dtype=None,
+                        preparar=None):
+    """
+    Versión en streaming de `imputar`: lee, rellena y escribe el fichero bloque a bloque,
+    de modo que la memoria no depende del tamaño del CSV. `preparar`, si se indica, recibe
+    cada bloque antes de imputarlo y devuelve las filas que se conservan (p. ej. la
+    validación de limpiar_dataset.py). Devuelve el número de filas escritas.
+    """
+    filas = 0
+    with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
+        bloques = pd.read_csv(input_file, chunksize=chunksize, parse_dates=parse_dates, dtype=dtype)
+        for i, bloque in enumerate(bloques):
+            if preparar is not None:
+                bloque = preparar(bloque)
+            imputar(bloque, valores).to_csv(f, header=(i == 0), index=False)
+            filas += len(bloque)
+    return filas
@@ -0,0 +1,153 @@
+# inferencia.py
+"""
+Inferencia del modelo de fragilidad con el pipeline de joblib o con su exportación a ONNX.
+
+'fragility_pipeline.joblib' solo se puede cargar con scikit-learn y xgboost (en versiones
+compatibles con las del entrenamiento) en cada proceso que predice. 'exportMLXGBoost.py
+--onnx' guarda a su lado 'fragility_pipeline.onnx': los árboles de XGBoost como un grafo
+ONNX, con las columnas de entrada en sus metadatos. Para ejecutarlo bastan numpy y
+onnxruntime (CPU).
+
+El preprocesador del pipeline solo selecciona columnas ('passthrough'), así que esa
+selección la hace `ModeloONNX` y el grafo recibe directamente la matriz float32. Los NaN
+se tratan como valores ausentes, igual que en XGBoost. Los metadatos guardan también el
+SHA-256 del .joblib exportado, para no usar un .onnx que se ha quedado atrás al reentrenar.
+
+`cargar_modelo` elige el motor según FRAGILIDAD_INFERENCIA:
+
+    auto    (por defecto) ONNX si onnxruntime está instalado y el .onnx existe junto al
+            .joblib y se exportó de él (o no se ha desplegado el .joblib)
+    onnx    siempre ONNX (error si falta el fichero o onnxruntime)
+    joblib  siempre el pipeline de scikit-learn
+
+Uso:
+    modelo = cargar_modelo('Interfaz/fragility_pipeline.joblib')
+    probabilidades = modelo.predict_proba(df)     # mismas columnas que el pipeline
+"""
+import copy
+import hashlib
+import importlib.util
+import json
+import os
+
+import numpy as np
+
+MOTORES = ('auto', 'onnx', 'joblib')
+
+# Diferencia máxima admitida entre las probabilidades de ONNX y las del pipeline
+TOLERANCIA_PARIDAD = 1e-4
+
+
+def ruta_onnx(ruta_pipeline):
+    """'fragility_pipeline.joblib' -> 'fragility_pipeline.onnx', en la misma carpeta."""
+    return os.path.splitext(ruta_pipeline)[0] + '.onnx'
+
+
+def huella(ruta):
+    """SHA-256 del fichero `ruta`."""
+    with open(ruta, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def columnas_modelo(modelo):
+    """Columnas que el modelo (pipeline o `ModeloONNX`) pasa a XGBoost, en orden."""
+    if isinstance(modelo, ModeloONNX):
+        return list(modelo.columnas)
+    return list(modelo.named_steps['preprocessor'].transformers[0][2])
+
+
+# --- Exportación ---
+
+def exportar_onnx(pipeline, ruta_pipeline):
+    """
+    Convierte el pipeline entrenado (preprocesador 'passthrough' + XGBClassifier), ya guardado
+    en `ruta_pipeline`, a ONNX y lo guarda a su lado. Devuelve la ruta del .onnx. Necesita
+    onnxmltools, solo en la máquina de entrenamiento.
+    """
+    from onnxmltools.convert import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+    from onnx import helper
+
+    transformadores = pipeline.named_steps['preprocessor'].transformers
+    if len(transformadores) != 1 or transformadores[0][1] != 'passthrough':
+        raise ValueError("Solo se puede exportar a ONNX un preprocesador que únicamente selecciona columnas")
+    columnas = columnas_modelo(pipeline)
+
+    # Con 'multi:softmax' el conversor devuelve los márgenes sin normalizar; los árboles son
+    # los mismos, así que se convierte una copia como 'multi:softprob' para obtener las
+    # probabilidades de `predict_proba`
+    clasificador = copy.deepcopy(pipeline.named_steps['classifier'])
+    if clasificador.get_params().get('objective') == 'multi:softmax':
+        clasificador.set_params(objective='multi:softprob')
+
+    modelo = convert_xgboost(clasificador, name='fragilidad',
+                             initial_types=[('input', FloatTensorType([None, len(columnas)]))])
+    helper.set_model_props(modelo, {'columnas': json.dumps(columnas), 'pipeline_sha256': huella(ruta_pipeline)})
+    ruta = ruta_onnx(ruta_pipeline)
+    with open(ruta, 'wb') as f:
+        f.write(modelo.SerializeToString())
+    return ruta
+
+
+def comprobar_paridad(pipeline, modelo, X, seed=0):
+    """
+    Mayor diferencia absoluta entre las probabilidades del pipeline y las de `modelo`, sobre
+    `X` y sobre una copia con un 10% de huecos (las ramas de valores ausentes de los árboles).
+    """
+    huecos = X.mask(np.random.default_rng(seed).random(X.shape) < 0.1)
+    return max(float(np.abs(pipeline.predict_proba(datos) - modelo.predict_proba(datos)).max())
+               for datos in (X, huecos))
+
+
+# --- Ejecución ---
+
+class ModeloONNX:
+    """Modelo exportado con `exportar_onnx`, con la misma interfaz de predicción que el pipeline."""
+
+    def __init__(self, ruta):
+        import onnxruntime
+
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(ruta)
+        self.ruta = ruta
+        self.sesion = onnxruntime.InferenceSession(ruta, providers=['CPUExecutionProvider'])
+        metadatos = self.sesion.get_modelmeta().custom_metadata_map
+        self.columnas = json.loads(metadatos['columnas'])
+        self.huella_pipeline = metadatos.get('pipeline_sha256')
+        self.entrada = self.sesion.get_inputs()[0].name
+
+    def predict_proba(self, X):
+        """Probabilidad de cada clase (Frágil, Pre-frágil, Robusto) para cada fila de `X` (DataFrame)."""
+        matriz = np.asarray(X[self.columnas], dtype=np.float32)
+        return self.sesion.run(['probabilities'], {self.entrada: matriz})[0]
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
+
+
+def _motor_pedido(motor=None):
+    motor = (motor or os.environ.get('FRAGILIDAD_INFERENCIA', 'auto')).strip().lower()
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de inferencia desconocido: {motor!r} (opciones: {', '.join(MOTORES)})")
+    return motor
+
+
+def motor_inferencia(ruta_pipeline, motor=None):
+    """Motor que usará `cargar_modelo`: el indicado o FRAGILIDAD_INFERENCIA, con 'auto' resuelto."""
+    motor = _motor_pedido(motor)
+    if motor == 'auto':
+        disponible = importlib.util.find_spec('onnxruntime') is not None and os.path.exists(ruta_onnx(ruta_pipeline))
+        motor = 'onnx' if disponible else 'joblib'
+    return motor
+
+
+def cargar_modelo(ruta_pipeline, motor=None):
+    """Carga el modelo de `ruta_pipeline` ('.joblib') o su exportación ONNX, según `motor_inferencia`."""
+    pedido = _motor_pedido(motor)
+    if motor_inferencia(ruta_pipeline, pedido) == 'onnx':
+        modelo = ModeloONNX(ruta_onnx(ruta_pipeline))
+        # En 'auto' se descarta un .onnx exportado de otro .joblib (reentrenado sin --onnx)
+        if pedido == 'onnx' or not os.path.exists(ruta_pipeline) or modelo.huella_pipeline == huella(ruta_pipeline):
+            return modelo
+    import joblib
+    return joblib.load(ruta_pipeline)
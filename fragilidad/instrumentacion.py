@@ -0,0 +1,236 @@
+# instrumentacion.py
+"""
+Temporizadores y contadores opcionales para el cliente AccessLink, los exportadores y la Interfaz.
+
+Está desactivada por defecto. En ese caso `medir` devuelve siempre el mismo contexto vacío
+e `instrumentar` llama directamente a la función, sin registrar nada.
+
+Se activa con la variable de entorno FRAGILIDAD_METRICAS (o llamando a `activar`):
+
+    FRAGILIDAD_METRICAS=log               una línea JSON por medida en el logger 'fragilidad.metricas'
+    FRAGILIDAD_METRICAS=prometheus        acumula y sirve las métricas en http://localhost:9108/metrics
+    FRAGILIDAD_METRICAS=log,prometheus    ambas cosas
+
+FRAGILIDAD_METRICAS_PUERTO cambia el puerto del endpoint y FRAGILIDAD_METRICAS_FICHERO
+vuelca las métricas en formato Prometheus al terminar el proceso (útil para los cron).
+"""
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ACTIVA = False
+
+PUERTO_POR_DEFECTO = 9108
+
+logger = logging.getLogger('fragilidad.metricas')
+
+_modos = set()
+_lock = threading.Lock()
+_temporizadores = {}   # (nombre, etiquetas) -> [número, suma, máximo]
+_contadores = {}       # (nombre, etiquetas) -> total
+_servidor = None
+
+
+class _MedidaNula(object):
+    """Contexto que no hace nada; se reutiliza siempre que la instrumentación está desactivada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_MEDIDA_NULA = _MedidaNula()
+
+
+class _Medida(object):
+
+    def __init__(self, nombre, etiquetas):
+        self.nombre = nombre
+        self.etiquetas = etiquetas
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.etiquetas['error'] = exc_type.__name__
+        registrar_tiempo(self.nombre, time.perf_counter() - self.inicio, **self.etiquetas)
+        return False
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def registrar_tiempo(nombre, segundos, **etiquetas):
+    """Acumula una duración (en segundos) para la métrica `nombre`."""
+    if not ACTIVA:
+        return
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        acumulado = _temporizadores.setdefault(clave, [0, 0.0, 0.0])
+        acumulado[0] += 1
+        acumulado[1] += segundos
+        acumulado[2] = max(acumulado[2], segundos)
+    if 'log' in _modos:
+        logger.info(json.dumps({'metrica': nombre, 'segundos': round(segundos, 6), **etiquetas},
+                               default=str, ensure_ascii=False))
+
+
+def incrementar(nombre, valor=1, **etiquetas):
+    """Suma `valor` al contador `nombre` (peticiones, bytes, filas...)."""
+    if not ACTIVA:
+        return
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+    if 'log' in _modos:
+        logger.info(json.dumps({'metrica': nombre, 'valor': valor, **etiquetas},
+                               default=str, ensure_ascii=False))
+
+
+def medir(nombre, **etiquetas):
+    """Contexto que mide la duración del bloque: `with medir('exportacion', archivo=...):`."""
+    if not ACTIVA:
+        return _MEDIDA_NULA
+    return _Medida(nombre, etiquetas)
+
+
+def instrumentar(nombre, **etiquetas):
+    """Decorador que mide cada llamada a la función con `medir(nombre, **etiquetas)`."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not ACTIVA:
+                return funcion(*args, **kwargs)
+            with _Medida(nombre, dict(etiquetas)):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+# --- Exportación ---
+
+def _formatear_etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    pares = []
+    for k, v in etiquetas:
+        v = v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{k}="{v}"')
+    return '{' + ','.join(pares) + '}'
+
+
+def exportar_prometheus():
+    """Devuelve las métricas acumuladas en el formato de texto de Prometheus."""
+    with _lock:
+        temporizadores = dict(_temporizadores)
+        contadores = dict(_contadores)
+
+    lineas = []
+    for nombre in sorted({n for n, _ in temporizadores}):
+        metrica = f'fragilidad_{nombre}_seconds'
+        lineas.append(f'# TYPE {metrica} summary')
+        for (n, etiquetas), (numero, suma, _) in sorted(temporizadores.items()):
+            if n != nombre:
+                continue
+            lineas.append(f'{metrica}_count{_formatear_etiquetas(etiquetas)} {numero}')
+            lineas.append(f'{metrica}_sum{_formatear_etiquetas(etiquetas)} {suma:.6f}')
+        lineas.append(f'# TYPE {metrica}_max gauge')
+        for (n, etiquetas), (_, _, maximo) in sorted(temporizadores.items()):
+            if n == nombre:
+                lineas.append(f'{metrica}_max{_formatear_etiquetas(etiquetas)} {maximo:.6f}')
+    for nombre in sorted({n for n, _ in contadores}):
+        metrica = f'fragilidad_{nombre}_total'
+        lineas.append(f'# TYPE {metrica} counter')
+        for (n, etiquetas), total in sorted(contadores.items()):
+            if n == nombre:
+                lineas.append(f'{metrica}{_formatear_etiquetas(etiquetas)} {total}')
+    return '\n'.join(lineas) + '\n'
+
+
+def volcar_prometheus(ruta):
+    """Escribe las métricas en un fichero (p. ej. para el textfile collector de node_exporter)."""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(exportar_prometheus())
+    os.replace(temporal, ruta)
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/metrics':
+            self.send_error(404)
+            return
+        cuerpo = exportar_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def servir_prometheus(puerto=PUERTO_POR_DEFECTO):
+    """Arranca (una sola vez) un endpoint /metrics en un hilo en segundo plano."""
+    global _servidor
+    if _servidor is None:
+        _servidor = ThreadingHTTPServer(('localhost', puerto), _ManejadorMetricas)
+        threading.Thread(target=_servidor.serve_forever, daemon=True).start()
+    return _servidor
+
+
+# --- Activación ---
+
+def activar(modos=('log',), puerto=None, fichero=None):
+    """Activa la instrumentación con los modos indicados ('log' y/o 'prometheus')."""
+    global ACTIVA
+    _modos.clear()
+    _modos.update(modos)
+    if 'log' in _modos and not logger.handlers:
+        manejador = logging.StreamHandler()
+        manejador.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(manejador)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    if 'prometheus' in _modos and puerto:
+        servir_prometheus(puerto)
+    if fichero:
+        atexit.register(volcar_prometheus, fichero)
+    ACTIVA = True
+
+
+def desactivar():
+    global ACTIVA
+    ACTIVA = False
+
+
+def reiniciar():
+    """Borra las métricas acumuladas."""
+    with _lock:
+        _temporizadores.clear()
+        _contadores.clear()
+
+
+def _configurar_desde_entorno():
+    valor = os.environ.get('FRAGILIDAD_METRICAS', '').strip().lower()
+    if not valor:
+        return
+    modos = [m.strip() for m in valor.split(',') if m.strip()]
+    puerto = int(os.environ.get('FRAGILIDAD_METRICAS_PUERTO', PUERTO_POR_DEFECTO))
+    activar(modos, puerto=puerto if 'prometheus' in modos else None,
+            fichero=os.environ.get('FRAGILIDAD_METRICAS_FICHERO'))
+
+
+_configurar_desde_entorno()
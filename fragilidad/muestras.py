@@ -0,0 +1,295 @@
+# muestras.py
+"""
+Almacén binario de las muestras de los ejercicios y de la temperatura corporal.
+
+AccessLink entrega las muestras como texto: `TrainingDataTransaction.get_samples` las manda
+como una cadena separada por comas y la temperatura como una lista de diccionarios por
+minuto. Aquí se guardan una sola vez, por usuario y por serie, en bloques binarios que se
+leen con `numpy.memmap`. Así una extracción de características posterior puede recortar
+cualquier intervalo de tiempo sin copiar los datos, sin volver a descargarlos y sin volver
+a analizar el texto.
+
+Organización en disco:
+
+    <raiz>/<usuario>/muestras/<serie>/
+        indice.jsonl     una línea por bloque (clave, inicio, n, intervalo, tipo...); solo
+                         se le añaden líneas, así que guardar un bloque no reescribe nada
+        000000.v         valores del bloque (int16 o float32)
+        000000.t         desfases en ms desde el inicio del bloque (int32); solo si el
+                         muestreo es irregular, si no se deducen de 'intervalo_ms'
+
+Un bloque es una grabación (una serie de un ejercicio, una medición de temperatura) y no
+se modifica nunca. Los valores se guardan con el tipo más estrecho que los representa
+(int16 para pulso, cadencia o potencia; float32 para el resto) y los instantes como
+desfases respecto al inicio del bloque: unas 4-10 veces menos espacio que el texto de la
+API, y todo se puede leer directamente desde el fichero.
+
+Uso:
+    almacen = AlmacenMuestras('archivos_exportados/usuarios')
+    almacen.guardar_ejercicio(user_id, exercise_summary, transaction.get_samples(url))
+    serie = almacen.leer(user_id, 'heart_rate', desde='2025-05-01', hasta='2025-05-02')
+"""
+import bisect
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+CARPETA_MUESTRAS = 'muestras'
+INDICE_FILENAME = 'indice.jsonl'
+
+# Valor de las muestras nulas en las series int16 (la API deja el hueco vacío: "97,,98")
+NULO_INT16 = np.iinfo('int16').min
+
+# 'sample-type' de AccessLink -> (nombre de la serie, tipo en disco)
+TIPOS_MUESTRA = {
+    '0': ('heart_rate', 'int16'),
+    '1': ('speed', 'float32'),
+    '2': ('cadence', 'int16'),
+    '3': ('altitude', 'float32'),
+    '4': ('power', 'int16'),
+    '5': ('power_pedaling_index', 'int16'),
+    '6': ('power_left_right_balance', 'float32'),
+    '7': ('air_pressure', 'float32'),
+    '8': ('running_cadence', 'int16'),
+    '9': ('temperature', 'float32'),
+    '10': ('distance', 'float32'),
+    '11': ('rr_interval', 'int16'),
+}
+
+SERIE_TEMPERATURA = 'body_temperature'
+
+
+class Bloque(namedtuple('Bloque', ['inicio', 'intervalo_ms', 'desfases_ms', 'valores', 'nulo'])):
+    """
+    Tramo de un bloque leído del disco. `valores` (y `desfases_ms`, si el muestreo es
+    irregular) son vistas de `numpy.memmap`: no se copia nada hasta que se usan. En las
+    series int16 las muestras nulas valen `nulo`.
+    """
+    __slots__ = ()
+
+    def tiempos(self):
+        """Instante de cada muestra (datetime64[ms])."""
+        if self.desfases_ms is None:
+            return self.inicio + np.arange(len(self.valores)) * np.timedelta64(self.intervalo_ms, 'ms')
+        return self.inicio + self.desfases_ms.astype('timedelta64[ms]')
+
+
+def _a_milisegundos(instante):
+    """Milisegundos desde 1970 de una fecha (hora local tal como la da la API, sin zona)."""
+    instante = pd.Timestamp(instante)
+    if instante.tzinfo is not None:
+        instante = instante.tz_localize(None)
+    return int(instante.value // 1_000_000)
+
+
+def texto_a_valores(texto):
+    """Convierte la cadena 'data' de AccessLink ("97,98,,99") en float64; los huecos son NaN."""
+    if not texto:
+        return np.empty(0, dtype='float64')
+    partes = texto.split(',')
+    try:
+        return np.array(partes, dtype='float64')
+    except ValueError:
+        # Hay huecos o valores no numéricos: conversión tolerante, más lenta
+        return pd.to_numeric(pd.Series(partes), errors='coerce').to_numpy(dtype='float64')
+
+
+def _codificar(valores, dtype):
+    """Pasa los valores al tipo de disco; si no caben en int16, se guardan como float32."""
+    if dtype == 'int16':
+        presentes = valores[~np.isnan(valores)]
+        if presentes.size == 0 or (np.all(presentes == np.round(presentes))
+                                   and presentes.min() > NULO_INT16 and presentes.max() <= np.iinfo('int16').max):
+            return np.where(np.isnan(valores), NULO_INT16, valores).astype('int16'), 'int16'
+    return valores.astype('float32'), 'float32'
+
+
+class AlmacenMuestras:
+    """Series de muestras por usuario, en bloques binarios de solo lectura."""
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self._indices = {}
+
+    # --- Índice de cada serie ---
+
+    def _carpeta(self, usuario, serie):
+        return os.path.join(self.raiz, str(usuario), CARPETA_MUESTRAS, serie)
+
+    def _indice(self, usuario, serie):
+        """{'bloques': registros ordenados por inicio, 'inicios': sus inicios, 'claves': claves guardadas}."""
+        carpeta = self._carpeta(usuario, serie)
+        if carpeta not in self._indices:
+            bloques = []
+            try:
+                with open(os.path.join(carpeta, INDICE_FILENAME), encoding='utf-8') as f:
+                    # Una línea cortada por una escritura interrumpida se ignora (su bloque se repetirá)
+                    for linea in f:
+                        try:
+                            bloques.append(json.loads(linea))
+                        except ValueError:
+                            pass
+            except FileNotFoundError:
+                pass
+            bloques.sort(key=lambda bloque: bloque['inicio'])
+            self._indices[carpeta] = {'bloques': bloques, 'inicios': [bloque['inicio'] for bloque in bloques],
+                                      'claves': {bloque['clave'] for bloque in bloques}}
+        return self._indices[carpeta]
+
+    def series(self, usuario):
+        """Nombres de las series guardadas para el usuario."""
+        carpeta = os.path.join(self.raiz, str(usuario), CARPETA_MUESTRAS)
+        if not os.path.isdir(carpeta):
+            return []
+        return sorted(nombre for nombre in os.listdir(carpeta)
+                      if os.path.exists(os.path.join(carpeta, nombre, INDICE_FILENAME)))
+
+    # --- Escritura ---
+
+    def guardar(self, usuario, serie, clave, inicio, valores, intervalo_ms=None, desfases_ms=None, dtype='float32'):
+        """
+        Guarda una grabación como un bloque nuevo de la serie.
+
+        `clave` identifica la grabación (p. ej. la URL del ejercicio): si ya está guardada no
+        se vuelve a escribir y se devuelve False. El instante de cada muestra es `inicio` más
+        `intervalo_ms` por su posición (muestreo regular) o más su `desfases_ms`.
+        """
+        indice = self._indice(usuario, serie)
+        if clave in indice['claves']:
+            return False
+        valores = np.asarray(valores, dtype='float64')
+        if desfases_ms is None and not intervalo_ms:
+            raise ValueError(f"La serie '{serie}' necesita 'intervalo_ms' o 'desfases_ms'.")
+
+        carpeta = self._carpeta(usuario, serie)
+        os.makedirs(carpeta, exist_ok=True)
+        nombre = f"{len(indice['claves']):06d}"
+        registro = {'clave': clave, 'archivo': nombre, 'inicio': _a_milisegundos(inicio),
+                    'n': int(len(valores)), 'intervalo_ms': None}
+        if desfases_ms is None:
+            registro['intervalo_ms'] = int(intervalo_ms)
+            duracion = int(intervalo_ms) * max(len(valores) - 1, 0)
+        else:
+            desfases = np.asarray(desfases_ms, dtype='int64')
+            if len(desfases) != len(valores):
+                raise ValueError(f"La serie '{serie}' tiene {len(valores)} valores y {len(desfases)} desfases.")
+            # Los desfases se guardan ordenados para poder buscar los tramos con searchsorted
+            orden = np.argsort(desfases, kind='stable')
+            desfases, valores = desfases[orden], valores[orden]
+            desfases.astype('int32').tofile(os.path.join(carpeta, nombre + '.t'))
+            duracion = int(desfases[-1]) if len(desfases) else 0
+        registro['fin'] = registro['inicio'] + duracion
+
+        codificados, registro['dtype'] = _codificar(valores, dtype)
+        codificados.tofile(os.path.join(carpeta, nombre + '.v'))
+
+        # El registro se añade cuando los ficheros del bloque ya están escritos
+        with open(os.path.join(carpeta, INDICE_FILENAME), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro) + '\n')
+        indice['claves'].add(clave)
+        posicion = bisect.bisect_right(indice['inicios'], registro['inicio'])
+        indice['inicios'].insert(posicion, registro['inicio'])
+        indice['bloques'].insert(posicion, registro)
+        return True
+
+    def guardar_ejercicio(self, usuario, ejercicio, muestras):
+        """
+        Guarda las series de un ejercicio. `ejercicio` es el resumen de `get_exercise_summary`
+        y `muestras` las respuestas de `get_samples` ({'sample-type', 'recording-rate', 'data'}).
+        Devuelve los nombres de las series nuevas.
+        """
+        guardadas = []
+        inicio = ejercicio['start-time']
+        for muestra in muestras:
+            serie, dtype = TIPOS_MUESTRA.get(str(muestra.get('sample-type')), (None, None))
+            if serie is None:
+                continue
+            valores = texto_a_valores(muestra.get('data'))
+            intervalo_ms, desfases = int(muestra.get('recording-rate') or 0) * 1000, None
+            if not intervalo_ms:
+                # Sin frecuencia fija (intervalos RR): cada latido ocurre al acabar los anteriores
+                desfases = np.concatenate([[0], np.cumsum(np.nan_to_num(valores[:-1]))]) if len(valores) else []
+            clave = f"{ejercicio.get('id', inicio)}/{serie}"
+            if self.guardar(usuario, serie, clave, inicio, valores, intervalo_ms, desfases, dtype):
+                guardadas.append(serie)
+        return guardadas
+
+    def guardar_temperatura(self, usuario, medicion):
+        """Guarda las muestras de una medición de temperatura corporal ('samples' de biosensing)."""
+        valores, desfases = muestras_temperatura(medicion)
+        if not len(valores):
+            return False
+        clave = f"{medicion.get('source_device_id', '')}/{medicion.get('start_time')}"
+        return self.guardar(usuario, SERIE_TEMPERATURA, clave, medicion['start_time'],
+                            valores, desfases_ms=desfases, dtype='float32')
+
+    # --- Lectura ---
+
+    def bloques(self, usuario, serie, desde=None, hasta=None):
+        """
+        Tramos de los bloques que caen en [desde, hasta), en orden de tiempo, como vistas de
+        `numpy.memmap` sobre los ficheros (sin copiar ni decodificar nada).
+        """
+        desde = _a_milisegundos(desde) if desde is not None else None
+        hasta = _a_milisegundos(hasta) if hasta is not None else None
+        carpeta = self._carpeta(usuario, serie)
+        indice = self._indice(usuario, serie)
+        # Los bloques están ordenados por inicio: los que empiezan en `hasta` o después sobran
+        ultimo = len(indice['bloques']) if hasta is None else bisect.bisect_left(indice['inicios'], hasta)
+        for bloque in indice['bloques'][:ultimo]:
+            if bloque['n'] == 0 or (desde is not None and bloque['fin'] < desde):
+                continue
+            valores = np.memmap(os.path.join(carpeta, bloque['archivo'] + '.v'),
+                                dtype=bloque['dtype'], mode='r', shape=(bloque['n'],))
+            desfases = None
+            if bloque['intervalo_ms']:
+                # Muestreo regular: las posiciones del tramo salen de una división
+                paso = bloque['intervalo_ms']
+                i = 0 if desde is None else max(0, -(-(desde - bloque['inicio']) // paso))
+                j = bloque['n'] if hasta is None else min(bloque['n'], max(0, -(-(hasta - bloque['inicio']) // paso)))
+            else:
+                desfases = np.memmap(os.path.join(carpeta, bloque['archivo'] + '.t'),
+                                     dtype='int32', mode='r', shape=(bloque['n'],))
+                i = 0 if desde is None else int(np.searchsorted(desfases, desde - bloque['inicio'], side='left'))
+                j = bloque['n'] if hasta is None else int(np.searchsorted(desfases, hasta - bloque['inicio'], side='left'))
+            if i >= j:
+                continue
+            inicio = np.datetime64(bloque['inicio'], 'ms')
+            nulo = NULO_INT16 if bloque['dtype'] == 'int16' else None
+            if desfases is None:
+                inicio = inicio + np.timedelta64(i * bloque['intervalo_ms'], 'ms')
+                yield Bloque(inicio, bloque['intervalo_ms'], None, valores[i:j], nulo)
+            else:
+                yield Bloque(inicio, None, desfases[i:j], valores[i:j], nulo)
+
+    def leer(self, usuario, serie, desde=None, hasta=None):
+        """
+        Serie de pandas (float64, índice de fechas) con las muestras en [desde, hasta).
+        A diferencia de `bloques`, copia y decodifica los datos (las muestras nulas son NaN).
+        """
+        indices, valores = [], []
+        for bloque in self.bloques(usuario, serie, desde, hasta):
+            indices.append(bloque.tiempos())
+            decodificados = bloque.valores.astype('float64')
+            if bloque.nulo is not None:
+                decodificados[bloque.valores == bloque.nulo] = np.nan
+            valores.append(decodificados)
+        if not valores:
+            return pd.Series(dtype='float64', index=pd.DatetimeIndex([]), name=serie)
+        return pd.Series(np.concatenate(valores), index=pd.DatetimeIndex(np.concatenate(indices)), name=serie)
+
+
+def muestras_temperatura(medicion):
+    """
+    (valores, desfases en ms) de una medición de temperatura corporal. Acepta los nombres
+    de campo en snake_case y en camelCase que usa la API; sin desfase, el de la muestra es 0.
+    """
+    muestras = medicion.get('samples') or []
+    valores = np.array([m.get('temperature_celsius', m.get('temperatureCelsius', np.nan)) for m in muestras],
+                       dtype='float64')
+    desfases = np.array([m.get('recording_time_delta_milliseconds', m.get('recordingTimeDeltaMilliseconds')) or 0
+                         for m in muestras], dtype='int64')
+    return valores, desfases
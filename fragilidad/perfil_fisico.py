@@ -0,0 +1,94 @@
+# perfil_fisico.py
+"""
+Información física de los usuarios (altura, peso, umbrales, FC máxima y en reposo, VO2max).
+
+Polar solo entrega un registro nuevo cuando el usuario cambia su perfil, así que se guardan
+todos en 'polar_physical_info.csv' (uno por fila, ordenados por 'created') y a cada día se
+le asigna el último perfil conocido en esa fecha con `pd.merge_asof`, sin volver a la API.
+
+Uso:
+    perfiles = leer_perfiles('polar_physical_info.csv')
+    df = unir_perfil_fisico(df, perfiles, fecha='fecha_comun', por='user_id_polar')
+"""
+import os
+
+import pandas as pd
+
+from .esquemas import leer_export
+
+PERFIL_FILENAME = 'polar_physical_info.csv'
+
+# Columnas del CSV, en el orden en que se exportan
+CAMPOS_PERFIL = [
+    'id', 'created', 'polar-user', 'transaction-id', 'height', 'weight',
+    'aerobic-threshold', 'anaerobic-threshold', 'maximum-heart-rate',
+    'resting-heart-rate', 'vo2-max'
+]
+
+# Medidas que se añaden a cada día
+COLUMNAS_PERFIL = [
+    'height', 'weight', 'aerobic-threshold', 'anaerobic-threshold',
+    'maximum-heart-rate', 'resting-heart-rate', 'vo2-max'
+]
+
+
+def guardar_perfiles(registros, ruta):
+    """
+    Añade los registros de información física (tal como los devuelve la API) al CSV.
+    Los ids repetidos se sustituyen por la versión nueva. Devuelve el número de registros nuevos.
+    """
+    nuevos = pd.DataFrame(list(registros))
+    if nuevos.empty:
+        return 0
+    nuevos = nuevos.reindex(columns=CAMPOS_PERFIL)
+
+    tabla = nuevos
+    añadidos = len(nuevos)
+    if os.path.exists(ruta):
+        existentes = pd.read_csv(ruta)
+        añadidos = (~nuevos['id'].isin(existentes['id'])).sum()
+        tabla = pd.concat([existentes, nuevos], ignore_index=True)
+
+    tabla = tabla.drop_duplicates(subset='id', keep='last').sort_values(['polar-user', 'created'])
+    tabla.to_csv(ruta, index=False)
+    return int(añadidos)
+
+
+def leer_perfiles(ruta=PERFIL_FILENAME):
+    """
+    Lee los perfiles como tabla as-of: 'fecha_perfil' (día del registro) ordenada y
+    'user_id_polar' (id numérico sacado de la URL de 'polar-user').
+    """
+    perfiles = leer_export(ruta, 'polar_physical_info')
+    perfiles['user_id_polar'] = pd.to_numeric(
+        perfiles['polar-user'].astype(str).str.rsplit('/', n=1).str[-1], errors='coerce')
+    creado = perfiles['created']
+    if creado.dt.tz is not None:
+        creado = creado.dt.tz_localize(None)
+    perfiles['fecha_perfil'] = creado.dt.normalize().astype('datetime64[ns]')
+    return perfiles.sort_values(['fecha_perfil', 'created']).reset_index(drop=True)
+
+
+def unir_perfil_fisico(df, perfiles, fecha='fecha_comun', por=None, columnas=COLUMNAS_PERFIL):
+    """
+    Añade a cada fila de `df` las `columnas` del último perfil registrado en su fecha o antes.
+
+    `por` es la columna que identifica al usuario en ambas tablas (p. ej. 'user_id_polar');
+    sin ella se usa el mismo historial de perfiles para todas las filas. El orden de `df`
+    se conserva. Las filas sin una fecha válida se devuelven con las `columnas` vacías.
+    """
+    columnas = [c for c in columnas if c in perfiles.columns]
+    derecha = perfiles[['fecha_perfil'] + ([por] if por else []) + columnas].dropna(subset=['fecha_perfil'])
+
+    izquierda = df.reset_index(drop=True)
+    izquierda['_orden'] = izquierda.index
+    izquierda['_fecha'] = pd.to_datetime(izquierda[fecha], errors='coerce').astype('datetime64[ns]')
+    # merge_asof no admite NaT en la clave: solo se unen las filas con fecha
+    sin_fecha = izquierda['_fecha'].isna()
+    validas = izquierda[~sin_fecha].sort_values('_fecha', kind='stable')
+
+    unido = pd.merge_asof(validas, derecha, left_on='_fecha', right_on='fecha_perfil',
+                          by=por, direction='backward')
+    if sin_fecha.any():
+        unido = pd.concat([unido, izquierda[sin_fecha]], ignore_index=True)
+    return unido.sort_values('_orden').drop(columns=['_orden', '_fecha', 'fecha_perfil']).reset_index(drop=True)
@@ -0,0 +1,225 @@
+# recorridos.py
+"""
+Lectura en streaming de los recorridos GPX y TCX de los ejercicios y características de
+marcha y ritmo.
+
+`TrainingDataTransaction.get_gpx` / `get_tcx` devuelven el documento XML entero, y
+construir su árbol completo para un paseo de varias horas ocupa decenas de MB. Aquí se
+recorre con `xml.etree.ElementTree.iterparse`. Cada punto se copia a arrays de numpy
+preasignados (que crecen al doble si se llenan) y se elimina del árbol en cuanto se ha
+leído, así que la memoria no depende de la duración del ejercicio, solo de las columnas
+de salida. Con `get_tcx(url, stream=True)` el documento ni siquiera se guarda como texto:
+se analiza a medida que llega.
+
+El resultado es un dict de columnas ('time' en datetime64[ms] UTC, 'lat', 'lon',
+'altitude', 'distance', 'hr', 'cadence'; NaN donde el punto no trae el dato), y
+`caracteristicas_recorrido` calcula sobre él la velocidad, el ritmo, la cadencia, la
+longitud de paso, las paradas y el desnivel en una sola pasada vectorizada.
+
+Uso:
+    recorrido = leer_tcx(transaction.get_tcx(url, stream=True))
+    recorrido = leer_gpx('paseo.gpx')
+    caracteristicas = caracteristicas_recorrido(recorrido)
+"""
+import io
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_RECORRIDO = ('lat', 'lon', 'altitude', 'distance', 'hr', 'cadence')
+
+# Etiqueta (sin espacio de nombres) -> columna, para cada formato. En GPX la posición va
+# en los atributos 'lat'/'lon' de <trkpt>; pulso y cadencia, en la extensión de Garmin.
+CAMPOS_TCX = {
+    'LatitudeDegrees': 'lat',
+    'LongitudeDegrees': 'lon',
+    'AltitudeMeters': 'altitude',
+    'DistanceMeters': 'distance',
+    'Cadence': 'cadence',
+    'RunCadence': 'cadence',
+}
+CAMPOS_GPX = {
+    'ele': 'altitude',
+    'hr': 'hr',
+    'cad': 'cadence',
+}
+
+# Columnas de `caracteristicas_recorrido`
+CARACTERISTICAS_RECORRIDO = [
+    'distance_m', 'moving_min', 'speed_mean_m_s', 'speed_cv', 'pace_min_km',
+    'cadence_mean', 'cadence_cv', 'step_length_m', 'stops_min', 'elevation_gain_m',
+]
+
+# Por debajo de esta velocidad (m/s) se considera que la persona está parada
+VELOCIDAD_PARADA = 0.3
+
+# Capacidad inicial de los arrays (puntos); se duplica cuando se llena
+CAPACIDAD_INICIAL = 4096
+
+_ZONA_HORARIA = re.compile(r'([+-]\d{2}:?\d{2})$')
+
+
+def _nombre(etiqueta):
+    """Nombre local de una etiqueta '{espacio}nombre'."""
+    return etiqueta.rpartition('}')[2]
+
+
+def _milisegundos(texto):
+    """Milisegundos desde 1970 (UTC) de una fecha ISO 8601 ('...Z', con desfase o sin zona)."""
+    texto = texto.strip()
+    if texto.endswith('Z'):
+        texto = texto[:-1]
+    elif _ZONA_HORARIA.search(texto):
+        return pd.Timestamp(texto).tz_convert('UTC').tz_localize(None).value // 1_000_000
+    return np.datetime64(texto, 'ms').astype('int64')
+
+
+class _Columnas:
+    """Arrays preasignados por columna; `añadir` escribe un punto y duplica la capacidad si hace falta."""
+
+    def __init__(self, capacidad=CAPACIDAD_INICIAL):
+        self.n = 0
+        self.tiempo = np.empty(capacidad, dtype='int64')
+        self.valores = {columna: np.empty(capacidad, dtype='float64') for columna in COLUMNAS_RECORRIDO}
+
+    def añadir(self, tiempo, punto):
+        if self.n == len(self.tiempo):
+            self.tiempo = np.resize(self.tiempo, 2 * self.n)
+            self.valores = {columna: np.resize(array, 2 * self.n) for columna, array in self.valores.items()}
+        self.tiempo[self.n] = tiempo
+        for columna, array in self.valores.items():
+            array[self.n] = punto.get(columna, np.nan)
+        self.n += 1
+
+    def resultado(self):
+        recorrido = {'time': self.tiempo[:self.n].astype('datetime64[ms]')}
+        recorrido.update({columna: array[:self.n].copy() for columna, array in self.valores.items()})
+        return recorrido
+
+
+def _origen(documento):
+    """Un objeto de fichero binario para iterparse: ruta, texto, bytes o fichero ya abierto."""
+    if isinstance(documento, bytes):
+        return io.BytesIO(documento)
+    if isinstance(documento, str) and documento.lstrip('\ufeff \t\r\n').startswith('<'):
+        return io.BytesIO(documento.encode('utf-8'))
+    return documento
+
+
+def _leer(documento, punto_etiqueta, campos, posicion_en_atributos):
+    columnas = _Columnas()
+    padres = []
+    punto, tiempo = None, None
+    nombres = {}  # etiqueta -> nombre local; hay pocas etiquetas distintas y se repiten en cada punto
+    for evento, elemento in ET.iterparse(_origen(documento), events=('start', 'end')):
+        nombre = nombres.get(elemento.tag)
+        if nombre is None:
+            nombre = nombres[elemento.tag] = _nombre(elemento.tag)
+        if evento == 'start':
+            padres.append(elemento)
+            if nombre == punto_etiqueta:
+                punto, tiempo = {}, None
+                if posicion_en_atributos:
+                    punto['lat'] = float(elemento.get('lat', 'nan'))
+                    punto['lon'] = float(elemento.get('lon', 'nan'))
+            continue
+
+        padres.pop()
+        if punto is not None and nombre != punto_etiqueta:
+            texto = (elemento.text or '').strip()
+            if nombre == 'time' or nombre == 'Time':
+                tiempo = _milisegundos(texto) if texto else None
+            elif nombre == 'Value' and padres and _nombre(padres[-1].tag) == 'HeartRateBpm':
+                punto['hr'] = float(texto)
+            elif nombre in campos and texto:
+                punto[campos[nombre]] = float(texto)
+        elif nombre == punto_etiqueta:
+            if tiempo is not None:
+                columnas.añadir(tiempo, punto)
+            punto = None
+            # El punto ya está copiado: se quita del árbol para que la memoria no crezca
+            if padres:
+                padres[-1].remove(elemento)
+        elif not padres:
+            elemento.clear()
+    return columnas.resultado()
+
+
+def leer_tcx(documento):
+    """Puntos (<Trackpoint>) de un TCX como dict de columnas. `documento`: ruta, texto, bytes o fichero."""
+    return _leer(documento, 'Trackpoint', CAMPOS_TCX, posicion_en_atributos=False)
+
+
+def leer_gpx(documento):
+    """Puntos (<trkpt>) de un GPX como dict de columnas. `documento`: ruta, texto, bytes o fichero."""
+    return _leer(documento, 'trkpt', CAMPOS_GPX, posicion_en_atributos=True)
+
+
+def _distancia_haversine(lat, lon):
+    """Distancia (m) entre puntos consecutivos."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    a = (np.sin(np.diff(lat) / 2) ** 2
+         + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2)
+    return 2 * 6_371_000 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def caracteristicas_recorrido(recorrido):
+    """
+    Características de marcha y ritmo de un recorrido (dict de `leer_tcx` / `leer_gpx`):
+
+    - distance_m, moving_min: distancia total y minutos en movimiento.
+    - speed_mean_m_s, speed_cv: velocidad media en movimiento y su coeficiente de variación.
+    - pace_min_km: ritmo medio en movimiento.
+    - cadence_mean, cadence_cv: cadencia media (tal como la da el dispositivo) y su variación,
+      un indicador de la regularidad de la marcha.
+    - step_length_m: metros por paso (distancia en movimiento / pasos según la cadencia).
+    - stops_min: minutos parado (velocidad < `VELOCIDAD_PARADA`) entre dos puntos.
+    - elevation_gain_m: desnivel positivo acumulado.
+    """
+    tiempo = recorrido['time'].astype('int64') / 1000.0
+    caracteristicas = dict.fromkeys(CARACTERISTICAS_RECORRIDO, np.nan)
+    if len(tiempo) < 2:
+        return caracteristicas
+
+    dt = np.diff(tiempo)
+    # Distancia entre puntos: la acumulada del dispositivo si la hay; si no, por GPS
+    distancia = recorrido['distance']
+    if np.isfinite(distancia).sum() >= 2:
+        distancia = pd.Series(distancia).ffill().to_numpy()
+        tramo = np.nan_to_num(np.diff(distancia), nan=0.0)
+    else:
+        tramo = np.nan_to_num(_distancia_haversine(recorrido['lat'], recorrido['lon']), nan=0.0)
+    tramo = np.maximum(tramo, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        velocidad = np.where(dt > 0, tramo / dt, np.nan)
+    movimiento = velocidad >= VELOCIDAD_PARADA
+    segundos_mov = dt[movimiento].sum()
+    metros_mov = tramo[movimiento].sum()
+
+    caracteristicas['distance_m'] = tramo.sum()
+    caracteristicas['moving_min'] = segundos_mov / 60
+    caracteristicas['stops_min'] = dt[(velocidad < VELOCIDAD_PARADA) & (dt > 0)].sum() / 60
+    if segundos_mov > 0:
+        caracteristicas['speed_mean_m_s'] = metros_mov / segundos_mov
+        caracteristicas['speed_cv'] = np.std(velocidad[movimiento]) / np.mean(velocidad[movimiento])
+    if metros_mov > 0:
+        caracteristicas['pace_min_km'] = segundos_mov / 60 / (metros_mov / 1000)
+
+    # Cadencia de cada tramo en movimiento (la del punto en que acaba)
+    cadencia = recorrido['cadence'][1:]
+    con_cadencia = movimiento & (cadencia > 0)
+    if con_cadencia.any():
+        caracteristicas['cadence_mean'] = np.mean(cadencia[con_cadencia])
+        caracteristicas['cadence_cv'] = np.std(cadencia[con_cadencia]) / caracteristicas['cadence_mean']
+        pasos = (cadencia[con_cadencia] * dt[con_cadencia] / 60).sum()
+        if pasos > 0:
+            caracteristicas['step_length_m'] = tramo[con_cadencia].sum() / pasos
+
+    altitud = recorrido['altitude'][np.isfinite(recorrido['altitude'])]
+    if len(altitud) >= 2:
+        caracteristicas['elevation_gain_m'] = np.maximum(np.diff(altitud), 0).sum()
+    return {clave: (round(float(valor), 3) if np.isfinite(valor) else np.nan)
+            for clave, valor in caracteristicas.items()}
@@ -0,0 +1,43 @@
+# reduccion.py
+"""
+Reducción "una fila por día" de los resúmenes de actividad de Polar.
+
+La API entrega varias capturas intradía del resumen de actividad de un mismo día (cada
+sincronización del reloj genera una nueva, con los contadores acumulados hasta ese
+momento). Tanto el exportador como la unión de datos externos se quedan con la captura
+de más 'active-steps' de cada día; esta es la implementación común, sobre DataFrames.
+"""
+import pandas as pd
+
+
+def maximo_por_dia(df, valor='active-steps', fecha='date', claves=(), orden=None):
+    """
+    Devuelve una fila por día (y por `claves`, p. ej. el usuario): la de mayor `valor`.
+
+    A igualdad de `valor` gana la fila más reciente según la columna `orden` (p. ej. 'created');
+    sin `orden` (o si `df` no tiene esa columna), la que aparece antes en `df`. Los valores
+    nulos cuentan como los más bajos.
+
+    Se conserva el índice original, de modo que el resultado sirve también para seleccionar
+    los registros ganadores de otra estructura.
+    """
+    grupos = list(claves) + [fecha]
+    columnas = [valor] + ([orden] if orden and orden in df.columns else [])
+    ordenado = df.sort_values(columnas, ascending=False, kind='stable', na_position='last')
+    return ordenado.drop_duplicates(subset=grupos, keep='first').sort_values(grupos, kind='stable')
+
+
+def maximo_por_dia_en_bloques(bloques, valor='active-steps', fecha='date', claves=(), orden=None):
+    """
+    Igual que `maximo_por_dia`, pero sobre un iterable de DataFrames (p. ej. `read_csv(chunksize=...)`).
+
+    Cada bloque se reduce al llegar y se combina con lo acumulado, así que las capturas
+    superadas nunca se guardan: la memoria depende del número de días, no de capturas.
+    """
+    acumulado = None
+    for bloque in bloques:
+        if acumulado is not None:
+            # Lo acumulado va primero para que, sin `orden`, los empates los gane lo ya visto
+            bloque = pd.concat([acumulado, bloque], ignore_index=True)
+        acumulado = maximo_por_dia(bloque, valor=valor, fecha=fecha, claves=claves, orden=orden)
+    return acumulado
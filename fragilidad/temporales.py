@@ -0,0 +1,236 @@
+# temporales.py
+"""
+Características temporales por usuario: media, desviación y pendiente de los últimos 7, 14
+y 28 días de pasos, HRV, puntuación de sueño y amplitud de temperatura.
+
+La fragilidad es una tendencia, así que además del valor del día interesa su evolución.
+Todas las ventanas son de calendario (incluyen el propio día y los días sin datos no la
+alargan) y todos los estadísticos salen de seis sumas: número de días, Σy, Σy², Σx, Σx² y
+Σxy, con x el día en que se tomó el valor. Eso permite dos caminos con el mismo resultado:
+
+- `calcular_temporales`: para un historial completo (entrenamiento, un fichero subido),
+  con sumas móviles vectorizadas por usuario.
+- `HistorialTemporal`: estado por usuario que se actualiza al añadir un día nuevo en
+  O(1) (se suma el día que entra y se restan los que salen de la ventana), sin volver a
+  recorrer el historial en cada predicción.
+
+Uso:
+    df = calcular_temporales(df, usuario='id_usuario', fecha='fecha_comun')
+
+    historial = HistorialTemporal.desde_dataframe(df)
+    fila = historial.añadir_dia('usuario_1', '2025-05-01', {'active-steps': 8000, ...})
+"""
+import math
+import pickle
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# columna de origen -> prefijo de las características
+VARIABLES_TEMPORALES = {
+    'active-steps': 'active_steps',
+    'heart_rate_variability_avg': 'hrv',
+    'sleep_score': 'sleep_score',
+    'temp_amplitude': 'temp_amplitude',
+}
+
+VENTANAS_DIAS = (7, 14, 28)
+
+ESTADISTICOS = ('mean', 'std', 'slope')
+
+COLUMNAS_TEMPORALES = [
+    f"{prefijo}_{estadistico}_{dias}d"
+    for prefijo in VARIABLES_TEMPORALES.values()
+    for dias in VENTANAS_DIAS
+    for estadistico in ESTADISTICOS
+]
+
+
+def _estadisticos(n, sy, syy, sx, sxx, sxy):
+    """
+    Media, desviación típica (muestral, como `rolling().std()`) y pendiente por día a partir
+    de las sumas. Funciona igual con escalares que con arrays de numpy.
+    """
+    n, sy, syy, sx, sxx, sxy = (np.asarray(v, dtype='float64') for v in (n, sy, syy, sx, sxx, sxy))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(n > 0, sy / n, np.nan)
+        varianza = np.where(n > 1, (syy - sy * sy / n) / (n - 1), np.nan)
+        denominador = n * sxx - sx * sx
+        pendiente = np.where(denominador > 0, (n * sxy - sx * sy) / denominador, np.nan)
+    return media, np.sqrt(np.maximum(varianza, 0.0)), pendiente
+
+
+# --- Cálculo sobre un historial completo ---
+
+def calcular_temporales(df, usuario='id_usuario', fecha='fecha_comun', recalcular=False):
+    """
+    Añade las columnas de `COLUMNAS_TEMPORALES` a `df` (las que falten, salvo `recalcular`).
+
+    Sin columna `usuario` toda la tabla se trata como un solo usuario. El orden de las
+    filas se conserva. Modifica y devuelve `df`.
+    """
+    variables = {columna: prefijo for columna, prefijo in VARIABLES_TEMPORALES.items()
+                 if columna in df.columns and (recalcular or any(
+                     f"{prefijo}_{e}_{d}d" not in df.columns for d in VENTANAS_DIAS for e in ESTADISTICOS))}
+    if not variables or df.empty:
+        return df
+
+    # Se trabaja por posición (índice 0..n-1), así da igual que el índice de `df` tenga repetidos
+    claves = [usuario] if usuario and usuario in df.columns else []
+    tabla = df[claves + list(variables)].reset_index(drop=True)
+    tabla['_fecha'] = pd.to_datetime(df[fecha], errors='coerce').dt.normalize().to_numpy()
+    tabla = tabla.dropna(subset=['_fecha'])
+    if tabla.empty:
+        return df
+    codigo = pd.factorize(tabla[usuario])[0] if claves else np.zeros(len(tabla), dtype='int64')
+    dia = ((tabla['_fecha'] - tabla['_fecha'].min()).dt.days).to_numpy()
+    orden = np.lexsort((dia, codigo))
+    posiciones = tabla.index.to_numpy()[orden]
+    codigo, dia = codigo[orden], dia[orden]
+
+    # x: días desde el primer día de cada usuario (la pendiente no depende del origen)
+    primera_fila = np.maximum.accumulate(np.where(np.r_[True, codigo[1:] != codigo[:-1]], np.arange(len(dia)), 0))
+    x = (dia - dia[primera_fila]).astype('float64')
+
+    # Clave creciente (usuario, día): el comienzo de cada ventana se busca con searchsorted y
+    # las sumas móviles salen de restar dos posiciones de la suma acumulada
+    clave = codigo.astype('int64') * (int(dia.max()) + 2 * max(VENTANAS_DIAS) + 1) + dia
+
+    for columna, prefijo in variables.items():
+        y = pd.to_numeric(tabla[columna], errors='coerce').to_numpy(dtype='float64')[orden]
+        presente = ~np.isnan(y)
+        y = np.where(presente, y, 0.0)
+        xp = np.where(presente, x, 0.0)
+        sumandos = np.column_stack([presente.astype('float64'), y, y * y, xp, xp * x, x * y])
+        acumulado = np.vstack([np.zeros((1, sumandos.shape[1])), np.cumsum(sumandos, axis=0)])
+        fin = np.arange(1, len(clave) + 1)
+        for dias in VENTANAS_DIAS:
+            inicio = np.searchsorted(clave, clave - dias, side='right')
+            sumas = acumulado[fin] - acumulado[inicio]
+            for estadistico, valores in zip(ESTADISTICOS, _estadisticos(*sumas.T)):
+                columna_df = np.full(len(df), np.nan)
+                columna_df[posiciones] = valores
+                df[f"{prefijo}_{estadistico}_{dias}d"] = columna_df
+    return df
+
+
+# --- Actualización incremental ---
+
+class VentanaMovil:
+    """Sumas de una variable en los últimos `dias` días de calendario."""
+
+    def __init__(self, dias):
+        self.dias = dias
+        self.puntos = deque()
+        self.n = self.sy = self.syy = self.sx = self.sxx = self.sxy = 0.0
+
+    def _sumar(self, x, y, signo):
+        self.n += signo
+        self.sy += signo * y
+        self.syy += signo * y * y
+        self.sx += signo * x
+        self.sxx += signo * x * x
+        self.sxy += signo * x * y
+
+    def añadir(self, x, y):
+        """Avanza la ventana hasta el día `x` y, si `y` no es nulo, lo incluye."""
+        while self.puntos and self.puntos[0][0] <= x - self.dias:
+            self._sumar(*self.puntos.popleft(), -1)
+        if y is not None and not math.isnan(y):
+            self.puntos.append((x, y))
+            self._sumar(x, y, 1)
+
+    def quitar_ultimo(self, x):
+        """Deshace el valor añadido para el día `x` (para poder reemplazar el último día)."""
+        if self.puntos and self.puntos[-1][0] == x:
+            self._sumar(*self.puntos.pop(), -1)
+        if not self.puntos:
+            # Sin puntos, las sumas vuelven a cero exacto (evita arrastrar error de redondeo)
+            self.n = self.sy = self.syy = self.sx = self.sxx = self.sxy = 0.0
+
+    def estadisticos(self):
+        """(media, desviación, pendiente) de la ventana; las mismas fórmulas que `_estadisticos`, en escalar."""
+        n, sy, sx = self.n, self.sy, self.sx
+        media = sy / n if n > 0 else math.nan
+        std = math.sqrt(max((self.syy - sy * sy / n) / (n - 1), 0.0)) if n > 1 else math.nan
+        denominador = n * self.sxx - sx * sx
+        pendiente = (n * self.sxy - sx * sy) / denominador if denominador > 0 else math.nan
+        return media, std, pendiente
+
+
+class HistorialTemporal:
+    """
+    Estado de las ventanas de cada usuario. `añadir_dia` cuesta O(1) por variable y ventana
+    (amortizado) y devuelve las características de ese día.
+
+    Los días deben llegar en orden; el último día añadido puede volver a enviarse con
+    valores nuevos (p. ej. cuando llega una captura de actividad más completa) y se reemplaza.
+    """
+
+    def __init__(self, variables=VARIABLES_TEMPORALES, ventanas=VENTANAS_DIAS):
+        self.variables = dict(variables)
+        self.ventanas = tuple(ventanas)
+        self.usuarios = {}
+
+    def _estado(self, usuario, fecha):
+        if usuario not in self.usuarios:
+            self.usuarios[usuario] = {
+                'origen': fecha,
+                'ultima': None,
+                'ventanas': {(columna, dias): VentanaMovil(dias) for columna in self.variables for dias in self.ventanas},
+            }
+        return self.usuarios[usuario]
+
+    def añadir_dia(self, usuario, fecha, valores):
+        """Añade los `valores` (columna -> valor) del día `fecha` del usuario y devuelve sus características."""
+        self.avanzar(usuario, fecha, valores)
+        return self.caracteristicas(usuario)
+
+    def avanzar(self, usuario, fecha, valores):
+        """Como `añadir_dia`, pero sin calcular las características (solo actualiza las ventanas)."""
+        fecha = pd.Timestamp(fecha).normalize()
+        estado = self._estado(usuario, fecha)
+        x = float((fecha - estado['origen']).days)
+        if estado['ultima'] is not None and fecha < estado['ultima']:
+            raise ValueError(f"El día {fecha.date()} es anterior al último añadido para '{usuario}' "
+                             f"({estado['ultima'].date()}); recalcule el historial con desde_dataframe.")
+        reemplazo = fecha == estado['ultima']
+        for (columna, _), ventana in estado['ventanas'].items():
+            if reemplazo:
+                ventana.quitar_ultimo(x)
+            valor = valores.get(columna)
+            ventana.añadir(x, None if valor is None or pd.isna(valor) else float(valor))
+        estado['ultima'] = fecha
+
+    def caracteristicas(self, usuario):
+        """Características del último día añadido del usuario (columna -> valor)."""
+        estado = self.usuarios[usuario]
+        fila = {}
+        for (columna, dias), ventana in estado['ventanas'].items():
+            prefijo = self.variables[columna]
+            for estadistico, valor in zip(ESTADISTICOS, ventana.estadisticos()):
+                fila[f"{prefijo}_{estadistico}_{dias}d"] = valor
+        return fila
+
+    @classmethod
+    def desde_dataframe(cls, df, usuario='id_usuario', fecha='fecha_comun', **kwargs):
+        """Construye el estado recorriendo un historial (una fila por día y usuario)."""
+        historial = cls(**kwargs)
+        claves = [usuario] if usuario and usuario in df.columns else []
+        columnas = [c for c in historial.variables if c in df.columns]
+        ordenado = df.assign(_fecha=pd.to_datetime(df[fecha], errors='coerce')).dropna(subset=['_fecha'])
+        ordenado = ordenado.sort_values(claves + ['_fecha'], kind='stable')
+        ids = ordenado[usuario].tolist() if claves else [None] * len(ordenado)
+        for id_usuario, dia, valores in zip(ids, ordenado['_fecha'], ordenado[columnas].to_dict('records')):
+            historial.avanzar(id_usuario, dia, valores)
+        return historial
+
+    def guardar(self, ruta):
+        with open(ruta, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def cargar(ruta):
+        with open(ruta, 'rb') as f:
+            return pickle.load(f)
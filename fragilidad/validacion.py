@@ -0,0 +1,141 @@
+# validacion.py
+"""
+Comprobación de los datos subidos antes de unir, imputar o predecir.
+
+Sin ella, una fecha escrita como texto, unos minutos negativos o una frecuencia cardíaca
+imposible llegan hasta `predict_proba`, que falla o, peor, devuelve una clase sin sentido,
+después de haber pagado ya la unión y la imputación. `validar` hace una sola pasada por
+columnas con máscaras de NumPy (O(n)):
+
+- convierte cada variable a número; lo que no se puede convertir es 'no_numerico';
+- marca los valores fuera de su rango fisiológico (RANGOS) como 'fuera_de_rango';
+- descarta las filas con 'fecha_invalida' y las que repiten un día ya visto ('fecha_duplicada',
+  se conserva la primera).
+
+Con modo='marcar' (por defecto) los valores no numéricos o fuera de rango pasan a NaN, de
+modo que el paso siguiente los trata como cualquier hueco (prepararDF.py descarta el día,
+limpiar_dataset.py lo imputa y XGBoost lo trata como ausente). Con modo='rechazar' se
+descarta la fila entera.
+
+Uso:
+    resultado = validar(df)
+    if resultado.faltan: ...               # columnas que no están en df
+    df = resultado.datos                   # filas que se conservan, ya convertidas
+    print(resultado.informe)               # columna, motivo, filas y un ejemplo de cada problema
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# --- Rangos admitidos (mínimo y máximo incluidos) de las variables del modelo ---
+# Amplios a propósito: solo deben descartar lo que no puede ser una medida de un día real
+RANGOS = {
+    'age': (18, 120),
+    'active-steps': (0, 100_000),
+    'active-calories': (0, 10_000),
+    'calories': (0, 15_000),
+    'duration_minutes': (0, 1440),
+    'heart_rate_avg': (25, 220),
+    'heart_rate_variability_avg': (0, 300),
+    'ans_charge': (-100, 100),
+    'sleep_score': (0, 100),
+    'light_sleep_min': (0, 1440),
+    'deep_sleep_min': (0, 1440),
+    'rem_sleep_min': (0, 1440),
+    'interruptions_min': (0, 1440),
+    'breathing_rate_avg': (4, 60),
+    'temp_amplitude': (0, 15),
+}
+
+MODOS_VALIDACION = ('marcar', 'rechazar')
+
+COLUMNAS_INFORME = ['columna', 'motivo', 'filas', 'ejemplo']
+
+
+class Validacion(namedtuple('Validacion', ['datos', 'informe', 'faltan', 'descartadas'])):
+    """
+    Resultado de `validar`: las filas conservadas, un DataFrame con una fila por (columna,
+    motivo) encontrado, las columnas que faltan y el número de filas descartadas.
+    """
+    __slots__ = ()
+
+    @property
+    def valida(self):
+        """Si se puede seguir: no falta ninguna columna y queda al menos una fila."""
+        return not self.faltan and len(self.datos) > 0
+
+
+def _problema(informe, columna, motivo, mascara, originales):
+    filas = int(mascara.sum())
+    if filas:
+        informe.append((columna, motivo, filas, str(originales[mascara.argmax()])))
+
+
+def validar(df, columnas=None, fecha='date', modo='marcar'):
+    """
+    Comprueba `columnas` (por defecto todas las de RANGOS) y la columna `fecha` de `df`.
+    Con `fecha=None` no se comprueban fechas. Devuelve un `Validacion`; si falta alguna
+    columna no se comprueba nada y `datos` es `df` sin cambios.
+    """
+    if modo not in MODOS_VALIDACION:
+        raise ValueError(f"Modo de validación desconocido: {modo!r} (usa uno de {MODOS_VALIDACION})")
+    columnas = list(RANGOS) if columnas is None else list(columnas)
+    requeridas = ([fecha] if fecha else []) + columnas
+    faltan = [columna for columna in requeridas if columna not in df.columns]
+    if faltan:
+        return Validacion(df, pd.DataFrame(columns=COLUMNAS_INFORME), faltan, 0)
+
+    informe = []
+    descartar = np.zeros(len(df), dtype=bool)
+    convertidas = {}
+
+    # --- Fechas: no interpretables y días repetidos ---
+    if fecha:
+        originales = df[fecha].to_numpy()
+        fechas = df[fecha]
+        if not pd.api.types.is_datetime64_any_dtype(fechas):
+            fechas = pd.to_datetime(fechas, errors='coerce')
+            convertidas[fecha] = fechas
+        invalidas = fechas.isna().to_numpy()
+        duplicadas = fechas.dt.normalize().duplicated().to_numpy() & ~invalidas
+        _problema(informe, fecha, 'fecha_invalida', invalidas, originales)
+        _problema(informe, fecha, 'fecha_duplicada', duplicadas, originales)
+        descartar |= invalidas | duplicadas
+
+    # --- Variables: conversión a número y rango ---
+    for columna in columnas:
+        serie = df[columna]
+        originales = serie.to_numpy()
+        numerica = serie if pd.api.types.is_numeric_dtype(serie) else pd.to_numeric(serie, errors='coerce')
+        valores = numerica.to_numpy(dtype=np.float64, na_value=np.nan)
+        no_numerico = np.isnan(valores) & serie.notna().to_numpy()
+        minimo, maximo = RANGOS.get(columna, (-np.inf, np.inf))
+        with np.errstate(invalid='ignore'):
+            fuera = (valores < minimo) | (valores > maximo)
+        _problema(informe, columna, 'no_numerico', no_numerico, originales)
+        _problema(informe, columna, 'fuera_de_rango', fuera, originales)
+
+        malos = no_numerico | fuera
+        if modo == 'rechazar':
+            descartar |= malos
+        elif fuera.any():
+            # np.where copia: to_numpy puede devolver una vista de la columna de df
+            convertidas[columna] = np.where(fuera, np.nan, valores)
+        if numerica is not serie and columna not in convertidas:
+            convertidas[columna] = valores
+        if columna in convertidas and pd.api.types.is_float_dtype(serie):
+            convertidas[columna] = convertidas[columna].astype(serie.dtype)   # p. ej. float32 de esquemas.py
+
+    datos = df.assign(**convertidas) if convertidas else df
+    if descartar.any():
+        datos = datos[~descartar]
+    return Validacion(datos, pd.DataFrame(informe, columns=COLUMNAS_INFORME), [], int(descartar.sum()))
+
+
+def resumen_validacion(resultado):
+    """Texto de una línea con lo encontrado, p. ej. para un print o un aviso de la Interfaz."""
+    if resultado.faltan:
+        return f"Faltan columnas: {resultado.faltan}"
+    problemas = ', '.join(f"{fila.columna} {fila.motivo} ({fila.filas})" for fila in resultado.informe.itertuples())
+    return f"{resultado.descartadas} filas descartadas; {problemas or 'sin problemas'}"
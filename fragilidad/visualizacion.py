@@ -0,0 +1,85 @@
+# visualizacion.py
+"""
+Reducción en el servidor de los resultados que pinta la Interfaz.
+
+Con historiales de varios años, enviar cada día a `st.line_chart` y `st.dataframe` hace que
+el tamaño de la página y el tiempo de dibujado crezcan con el historial. Antes de pintar:
+
+- `resumen_semanal`: una fila por semana, con la clase más frecuente, la probabilidad media
+  de cada clase y el número de días;
+- `reducir_lttb`: como mucho `puntos` días de las curvas de probabilidad, elegidos con
+  Largest-Triangle-Three-Buckets, que conserva los picos y cambios de tendencia;
+- `paginar`: un trozo de tamaño fijo de una tabla.
+
+Así lo que llega al navegador tiene un tamaño acotado, sea cual sea la longitud del historial.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def indices_lttb(x, y, puntos):
+    """
+    Posiciones de los `puntos` valores de la serie (x, y) que elige Largest-Triangle-Three-Buckets.
+    Siempre incluye el primero y el último. `x` debe ser creciente.
+    """
+    n = len(y)
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # puntos - 2 cubos entre el segundo y el penúltimo valor
+    limites = np.linspace(1, n - 1, puntos - 1).astype(np.int64)
+    indices = np.empty(puntos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(puntos - 2):
+        inicio, fin = limites[i], limites[i + 1]
+        # Vértice fijo del triángulo: la media del cubo siguiente (el último valor para el último cubo)
+        siguiente = slice(fin, limites[i + 2] if i + 2 < len(limites) else n)
+        media_x, media_y = x[siguiente].mean(), y[siguiente].mean()
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fin] - y[anterior])
+                       - (x[anterior] - x[inicio:fin]) * (media_y - y[anterior]))
+        anterior = inicio + int(areas.argmax())
+        indices[i + 1] = anterior
+    return indices
+
+
+def reducir_lttb(df, columnas, puntos, fecha='date'):
+    """
+    Filas de `df` (ordenado por `fecha`) que conservan la forma de cada curva de `columnas`:
+    la unión de los puntos LTTB de cada una, así que devuelve como mucho len(columnas) * puntos filas.
+    """
+    if len(df) <= puntos:
+        return df
+    x = pd.to_datetime(df[fecha]).to_numpy().astype('datetime64[s]').astype(np.int64)
+    elegidos = np.unique(np.concatenate([indices_lttb(x, df[columna].to_numpy(), puntos) for columna in columnas]))
+    return df.iloc[elegidos]
+
+
+def resumen_semanal(df, columnas, etiqueta='predicted_frailty', fecha='date'):
+    """
+    Una fila por semana (lunes a domingo, indexada por el lunes): la `etiqueta` más frecuente,
+    la media de `columnas` y el número de días con predicción.
+    """
+    semana = pd.to_datetime(df[fecha]).dt.to_period('W-SUN').dt.start_time.rename('semana')
+    grupos = df.groupby(semana, sort=True)
+    resumen = grupos[columnas].mean()
+    # Moda sin una lambda por grupo: se cuentan (semana, clase) y se toma la mayor
+    conteos = df.groupby([semana, df[etiqueta]]).size().unstack(fill_value=0)
+    resumen.insert(0, etiqueta, conteos.idxmax(axis=1))
+    resumen['dias'] = grupos.size()
+    return resumen
+
+
+def numero_paginas(filas, por_pagina):
+    return max(1, math.ceil(filas / por_pagina))
+
+
+def paginar(df, pagina, por_pagina):
+    """(filas de la página `pagina`, empezando en 1, número total de páginas)."""
+    paginas = numero_paginas(len(df), por_pagina)
+    pagina = min(max(1, int(pagina)), paginas)
+    return df.iloc[(pagina - 1) * por_pagina:pagina * por_pagina], paginas